@@ -1,14 +1,24 @@
+import abc
+import base64
+import hashlib
+import hmac
 import json
 import os
 import sqlite3
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import urlencode, quote
 
 import httpx
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from fastapi.responses import RedirectResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from db import get_db
+from db import DB_PATH, get_db
+from metrics import cache_requests, cache_evictions, timed_upstream
 
 
 router = APIRouter(tags=["auth"])
@@ -17,12 +27,210 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 OAUTH_REDIRECT_URI = os.getenv("OAUTH_REDIRECT_URI", "http://localhost:8000/callback/google")
 
-GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
-GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_AUTH_URL = os.getenv("GOOGLE_AUTH_URL", "https://accounts.google.com/o/oauth2/v2/auth")
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_OAUTH_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo")
 
-# state -> app_redirect_uri (앱으로 리다이렉트할 URI)
-_oauth_states: dict[str, str | None] = {}
+# 세션 토큰 서명 키, 없으면 프로세스마다 임의 생성 (재시작하면 기존 토큰 무효)
+SESSION_SECRET = (os.getenv("SESSION_SECRET") or secrets.token_urlsafe(32)).encode()
+SESSION_TOKEN_TTL_SECONDS = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", "900"))
+REFRESH_TOKEN_TTL_SECONDS = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# 예전 클라이언트가 보내는 Google access token -> user id 캐시 (전환 기간용)
+LEGACY_TOKEN_CACHE_SIZE = int(os.getenv("LEGACY_TOKEN_CACHE_SIZE", "1024"))
+LEGACY_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("LEGACY_TOKEN_CACHE_TTL_SECONDS", "300"))
+
+# OAuth state 저장소: memory(단일 프로세스) | sqlite(여러 워커가 DB 파일 공유)
+OAUTH_STATE_STORE = os.getenv("OAUTH_STATE_STORE", "memory")
+OAUTH_STATE_TTL_SECONDS = float(os.getenv("OAUTH_STATE_TTL_SECONDS", "600"))
+MAX_OAUTH_STATES = int(os.getenv("MAX_OAUTH_STATES", "10000"))
+
+
+class RequestRefreshToken(BaseModel):
+    refresh_token: str
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+_JWT_HEADER = _b64url_encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+def encode_session_token(user_id: int, token_type: str, ttl_seconds: int) -> str:
+    """HS256 JWT 발급 (sub=user id, typ=access|refresh)"""
+    now = int(time.time())
+    payload = {"sub": str(user_id), "typ": token_type, "iat": now, "exp": now + ttl_seconds}
+    signing_input = f"{_JWT_HEADER}.{_b64url_encode(json.dumps(payload, separators=(',', ':')).encode())}"
+    signature = hmac.new(SESSION_SECRET, signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64url_encode(signature)}"
+
+
+def decode_session_token(token: str, token_type: str) -> int | None:
+    """서명/만료/종류를 로컬에서 검증하고 user id 반환, 유효하지 않으면 None"""
+    try:
+        header, payload, signature = token.split(".")
+        if header != _JWT_HEADER:
+            return None
+        expected = hmac.new(SESSION_SECRET, f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64url_decode(signature)):
+            return None
+        claims = json.loads(_b64url_decode(payload))
+        if claims["typ"] != token_type or claims["exp"] < time.time():
+            return None
+        return int(claims["sub"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _issue_session(user_id: int) -> dict:
+    return {
+        "session_token": encode_session_token(user_id, "access", SESSION_TOKEN_TTL_SECONDS),
+        "refresh_token": encode_session_token(user_id, "refresh", REFRESH_TOKEN_TTL_SECONDS),
+        "expires_in": SESSION_TOKEN_TTL_SECONDS,
+    }
+
+
+class LegacyTokenCache:
+    """Google access token -> user id LRU 캐시"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> int | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                cache_requests.inc(cache="legacy_token", result="miss")
+                return None
+            cached_at, user_id = entry
+            if time.monotonic() - cached_at > self.ttl_seconds:
+                del self._entries[token]
+                cache_requests.inc(cache="legacy_token", result="miss")
+                return None
+            self._entries.move_to_end(token)
+            cache_requests.inc(cache="legacy_token", result="hit")
+            return user_id
+
+    def put(self, token: str, user_id: int) -> None:
+        with self._lock:
+            self._entries[token] = (time.monotonic(), user_id)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                cache_evictions.inc(cache="legacy_token")
+
+
+_legacy_tokens = LegacyTokenCache(LEGACY_TOKEN_CACHE_SIZE, LEGACY_TOKEN_CACHE_TTL_SECONDS)
+
+
+class OAuthStateStore(abc.ABC):
+    """
+    로그인 시작 ~ 콜백 사이의 state -> app_redirect_uri 저장소
+    state는 한 번만 꺼낼 수 있고 TTL이 지나면 사라짐
+    """
+
+    @abc.abstractmethod
+    def put(self, state: str, redirect_uri: str | None) -> None: ...
+
+    @abc.abstractmethod
+    def pop(self, state: str) -> tuple[bool, str | None]:
+        """(찾았는지, app_redirect_uri)"""
+
+
+class MemoryOAuthStateStore(OAuthStateStore):
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        # TTL이 모두 같으므로 삽입 순서 = 만료 순서
+        self._states: OrderedDict[str, tuple[float, str | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._states:
+            state, (expires_at, _) = next(iter(self._states.items()))
+            if expires_at > now and len(self._states) <= self.max_size:
+                break
+            del self._states[state]
+
+    def put(self, state: str, redirect_uri: str | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._states[state] = (now + self.ttl_seconds, redirect_uri)
+            self._evict(now)
+
+    def pop(self, state: str) -> tuple[bool, str | None]:
+        with self._lock:
+            entry = self._states.pop(state, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return False, None
+        return True, entry[1]
+
+
+class SQLiteOAuthStateStore(OAuthStateStore):
+    """oauth_states 테이블 사용, 같은 DB 파일을 쓰는 모든 워커에서 콜백 처리 가능"""
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_size: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def put(self, state: str, redirect_uri: str | None) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM oauth_states WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT INTO oauth_states (state, redirect_uri, expires_at) VALUES (?, ?, ?)",
+                (state, redirect_uri, now + self.ttl_seconds),
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM oauth_states").fetchone()[0] - self.max_size
+            if overflow > 0:
+                conn.execute(
+                    """DELETE FROM oauth_states WHERE state IN (
+                           SELECT state FROM oauth_states ORDER BY expires_at LIMIT ?
+                       )""",
+                    (overflow,),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def pop(self, state: str) -> tuple[bool, str | None]:
+        conn = self._connect()
+        try:
+            # 꺼내기와 삭제를 한 문장으로 처리해서 같은 state로 두 번 로그인할 수 없음
+            row = conn.execute(
+                "DELETE FROM oauth_states WHERE state = ? AND expires_at > ? RETURNING redirect_uri",
+                (state, time.time()),
+            ).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if row is None:
+            return False, None
+        return True, row[0]
+
+
+def create_oauth_state_store() -> OAuthStateStore:
+    if OAUTH_STATE_STORE == "memory":
+        return MemoryOAuthStateStore(OAUTH_STATE_TTL_SECONDS, MAX_OAUTH_STATES)
+    if OAUTH_STATE_STORE == "sqlite":
+        return SQLiteOAuthStateStore(DB_PATH, OAUTH_STATE_TTL_SECONDS, MAX_OAUTH_STATES)
+    raise RuntimeError(f"Unknown OAUTH_STATE_STORE: {OAUTH_STATE_STORE}")
+
+
+_oauth_states = create_oauth_state_store()
 
 
 @router.get("/auth/google")
@@ -33,13 +241,13 @@ async def auth_google(
     Google OAuth 로그인 시작
 
     - redirect_uri가 없으면 JSON 응답
-    - redirect_uri가 있으면 앱으로 리다이렉트 (openroute://callback?user=...&access_token=...)
+    - redirect_uri가 있으면 앱으로 리다이렉트 (openroute://callback?user=...&session_token=...&refresh_token=...)
     """
     if not GOOGLE_CLIENT_ID:
         raise HTTPException(status_code=500, detail="Google OAuth not configured")
 
     state = secrets.token_urlsafe(32)
-    _oauth_states[state] = redirect_uri
+    await run_in_threadpool(_oauth_states.put, state, redirect_uri)
 
     params = {
         "client_id": GOOGLE_CLIENT_ID,
@@ -68,13 +276,12 @@ async def callback_google(
     if not code or not state:
         raise HTTPException(status_code=400, detail="Missing code or state")
 
-    if state not in _oauth_states:
+    found, app_redirect_uri = await run_in_threadpool(_oauth_states.pop, state)
+    if not found:
         raise HTTPException(status_code=400, detail="Invalid state")
 
-    app_redirect_uri = _oauth_states.pop(state)
-
     async with httpx.AsyncClient() as client:
-        token_response = await client.post(
+        token_response = await timed_upstream("oauth", client.post(
             GOOGLE_TOKEN_URL,
             data={
                 "client_id": GOOGLE_CLIENT_ID,
@@ -83,7 +290,7 @@ async def callback_google(
                 "grant_type": "authorization_code",
                 "redirect_uri": OAUTH_REDIRECT_URI,
             },
-        )
+        ))
 
         if token_response.status_code != 200:
             if app_redirect_uri:
@@ -93,10 +300,10 @@ async def callback_google(
         tokens = token_response.json()
         access_token = tokens.get("access_token")
 
-        userinfo_response = await client.get(
+        userinfo_response = await timed_upstream("oauth", client.get(
             GOOGLE_USERINFO_URL,
             headers={"Authorization": f"Bearer {access_token}"},
-        )
+        ))
 
         if userinfo_response.status_code != 200:
             if app_redirect_uri:
@@ -133,6 +340,9 @@ async def callback_google(
             "INSERT OR IGNORE INTO user_badges (user_id, badge_name) VALUES (?, ?)",
             (user_id, "첫 발걸음"),
         )
+    # 비동기 핸들러라 쓰기 잠금을 응답 뒤까지 잡고 있으면 다른 로그인이 이벤트 루프를 막고 기다림
+    # 바로 이어지는 /auth/me가 새 사용자를 볼 수 있도록 여기서 커밋
+    db.commit()
 
     user = db.execute(
         "SELECT * FROM users WHERE id = ?",
@@ -140,11 +350,17 @@ async def callback_google(
     ).fetchone()
 
     user_data = dict(user)
+    session = _issue_session(user_id)
+    _legacy_tokens.put(access_token, user_id)
 
     # 앱으로 리다이렉트
     if app_redirect_uri:
         user_json = quote(json.dumps(user_data, ensure_ascii=False))
-        redirect_url = f"{app_redirect_uri}?user={user_json}&access_token={access_token}"
+        redirect_url = (
+            f"{app_redirect_uri}?user={user_json}&access_token={access_token}"
+            f"&session_token={session['session_token']}&refresh_token={session['refresh_token']}"
+            f"&expires_in={session['expires_in']}"
+        )
         return RedirectResponse(url=redirect_url)
 
     # 웹에서는 JSON 응답
@@ -152,36 +368,75 @@ async def callback_google(
         "message": "Login successful",
         "user": user_data,
         "access_token": access_token,
+        **session,
     }
 
 
-@router.get("/auth/me")
-async def get_current_user(
-    request: Request,
-    db: sqlite3.Connection = Depends(get_db),
-):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Not authenticated")
+@router.post("/auth/refresh")
+def refresh_session(req: RequestRefreshToken, db: sqlite3.Connection = Depends(get_db)) -> dict:
+    """refresh_token으로 새 세션 토큰 발급 (refresh_token도 함께 교체)"""
+    user_id = decode_session_token(req.refresh_token, "refresh")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    user = db.execute("SELECT id FROM users WHERE id = ?", (user_id,)).fetchone()
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    return _issue_session(user_id)
 
-    access_token = auth_header.split(" ")[1]
+
+async def _resolve_user_id(token: str, db: sqlite3.Connection) -> int:
+    # 서버가 발급한 세션 토큰은 외부 호출 없이 검증
+    user_id = decode_session_token(token, "access")
+    if user_id is not None:
+        return user_id
+    if token.startswith(f"{_JWT_HEADER}."):
+        # 서버 토큰인데 만료/위조된 경우 Google에 물어볼 필요 없음
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    # 전환 기간: Google access token
+    user_id = _legacy_tokens.get(token)
+    if user_id is not None:
+        return user_id
 
     async with httpx.AsyncClient() as client:
-        response = await client.get(
+        response = await timed_upstream("oauth", client.get(
             GOOGLE_USERINFO_URL,
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
+            headers={"Authorization": f"Bearer {token}"},
+        ))
 
         if response.status_code != 200:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
 
         userinfo = response.json()
 
-    google_id = userinfo.get("id")
+    user = db.execute(
+        "SELECT id FROM users WHERE google_id = ?",
+        (userinfo.get("id"),),
+    ).fetchone()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    _legacy_tokens.put(token, user["id"])
+    return user["id"]
+
+
+@router.get("/auth/me")
+async def get_current_user(
+    request: Request,
+    db: sqlite3.Connection = Depends(get_db),
+):
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    user_id = await _resolve_user_id(auth_header.split(" ")[1], db)
 
     user = db.execute(
-        "SELECT * FROM users WHERE google_id = ?",
-        (google_id,),
+        "SELECT * FROM users WHERE id = ?",
+        (user_id,),
     ).fetchone()
 
     if not user:
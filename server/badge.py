@@ -1,11 +1,12 @@
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Callable
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 
 from db import get_db
+from leaderboard import record_points
 
 
 router = APIRouter(prefix="/badge", tags=["badge"])
@@ -23,11 +24,26 @@ BADGE_INFO = {
 }
 
 
+# 사용자 활동으로 증가하는 카운터 (users 테이블 컬럼)
+COUNTER_FIELDS = ("obstacles_reported", "photos_uploaded", "verifications", "stairs_reported", "elevators_reported")
+
+# 카운터와 무관하게 활동이 있을 때마다 다시 확인할 뱃지용 가상 필드
+ACTIVITY_FIELD = "activity"
+
+
 class Badge:
-    def __init__(self, name: str, description: str, condition: Callable[[sqlite3.Row], bool]):
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        condition: Callable[[sqlite3.Row], bool],
+        fields: tuple[str, ...] = (),
+    ):
         self.name = name
         self.description = description
         self.condition = condition
+        # 이 필드가 바뀔 때만 조건을 다시 평가
+        self.fields = fields
 
     def check(self, user: sqlite3.Row) -> bool:
         return self.condition(user)
@@ -46,37 +62,89 @@ def _check_one_year(user: sqlite3.Row) -> bool:
 
 BADGES = [
     Badge("첫 발걸음", BADGE_INFO["첫 발걸음"], lambda u: True),
-    Badge("눈 밝은 시민", BADGE_INFO["눈 밝은 시민"], lambda u: u["obstacles_reported"] >= 1),
-    Badge("불꽃 튀는 루틴", BADGE_INFO["불꽃 튀는 루틴"], lambda u: u["consecutive_days"] >= 7),
-    Badge("길잡이", BADGE_INFO["길잡이"], lambda u: u["obstacles_reported"] >= 10),
-    Badge("오늘은 내가 거리의 수호자", BADGE_INFO["오늘은 내가 거리의 수호자"], lambda u: u["obstacles_reported"] >= 30),
-    Badge("계단 스카우트", BADGE_INFO["계단 스카우트"], lambda u: u["stairs_reported"] >= 1),
-    Badge("든든한 동행자", BADGE_INFO["든든한 동행자"], _check_one_year),
-    Badge("엘리베이터 가이드", BADGE_INFO["엘리베이터 가이드"], lambda u: u["elevators_reported"] >= 1),
+    Badge("눈 밝은 시민", BADGE_INFO["눈 밝은 시민"], lambda u: u["obstacles_reported"] >= 1, ("obstacles_reported",)),
+    Badge("불꽃 튀는 루틴", BADGE_INFO["불꽃 튀는 루틴"], lambda u: u["consecutive_days"] >= 7, ("consecutive_days",)),
+    Badge("길잡이", BADGE_INFO["길잡이"], lambda u: u["obstacles_reported"] >= 10, ("obstacles_reported",)),
+    Badge("오늘은 내가 거리의 수호자", BADGE_INFO["오늘은 내가 거리의 수호자"], lambda u: u["obstacles_reported"] >= 30, ("obstacles_reported",)),
+    Badge("계단 스카우트", BADGE_INFO["계단 스카우트"], lambda u: u["stairs_reported"] >= 1, ("stairs_reported",)),
+    Badge("든든한 동행자", BADGE_INFO["든든한 동행자"], _check_one_year, (ACTIVITY_FIELD,)),
+    Badge("엘리베이터 가이드", BADGE_INFO["엘리베이터 가이드"], lambda u: u["elevators_reported"] >= 1, ("elevators_reported",)),
 ]
 
 
-def evaluate_badges(user: sqlite3.Row, db: sqlite3.Connection) -> list[str]:
-    user_id = user["id"]
+def _award_badges(db: sqlite3.Connection, user: sqlite3.Row, badges: Iterable[Badge]) -> list[str]:
     earned = []
-
-    existing = db.execute(
-        "SELECT badge_name FROM user_badges WHERE user_id = ?",
-        (user_id,),
-    ).fetchall()
-    existing_names = {row["badge_name"] for row in existing}
-
-    for badge in BADGES:
-        if badge.name not in existing_names and badge.check(user):
-            db.execute(
-                "INSERT INTO user_badges (user_id, badge_name) VALUES (?, ?)",
-                (user_id, badge.name),
-            )
+    for badge in badges:
+        if not badge.check(user):
+            continue
+        cursor = db.execute(
+            "INSERT OR IGNORE INTO user_badges (user_id, badge_name) VALUES (?, ?)",
+            (user["id"], badge.name),
+        )
+        if cursor.rowcount:
             earned.append(badge.name)
-
     return earned
 
 
+def evaluate_badges(user: sqlite3.Row, db: sqlite3.Connection) -> list[str]:
+    return _award_badges(db, user, BADGES)
+
+
+def record_user_activity(
+    db: sqlite3.Connection,
+    user_id: int | None,
+    increments: dict[str, int],
+    report: bool = False,
+    location: tuple[float, float] | None = None,
+) -> list[str]:
+    """
+    사용자 카운터를 한 번의 UPDATE로 갱신하고, 바뀐 필드에 걸린 뱃지만 평가
+    호출한 쪽의 쓰기와 같은 트랜잭션에서 실행되며 새로 얻은 뱃지 이름을 반환
+
+    - report=True면 연속 제보일(consecutive_days)도 함께 갱신
+    - 리더보드 점수도 같은 트랜잭션에서 누적 (location이 있으면 지역 랭킹 포함)
+    """
+    if user_id is None:
+        return []
+
+    assignments = []
+    params: list = []
+    for field, amount in increments.items():
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"Unknown counter: {field}")
+        assignments.append(f"{field} = {field} + ?")
+        params.append(amount)
+
+    changed = set(increments) | {ACTIVITY_FIELD}
+    if report:
+        today = date.today().isoformat()
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        assignments.append(
+            """consecutive_days = CASE
+                   WHEN last_report_date = ? THEN consecutive_days
+                   WHEN last_report_date = ? THEN consecutive_days + 1
+                   ELSE 1
+               END"""
+        )
+        assignments.append("last_report_date = ?")
+        params.extend([today, yesterday, today])
+        changed.add("consecutive_days")
+
+    if assignments:
+        user = db.execute(
+            f"UPDATE users SET {', '.join(assignments)} WHERE id = ? RETURNING *",
+            (*params, user_id),
+        ).fetchone()
+    else:
+        user = db.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+    if user is None:
+        return []
+
+    record_points(db, user_id, increments, location)
+    return _award_badges(db, user, (badge for badge in BADGES if changed.intersection(badge.fields)))
+
+
 class RequestCreateUser(BaseModel):
     username: str
 
@@ -0,0 +1,150 @@
+"""벤치마크 스크립트 공용 도구 (프로세스 실행, 포트, 백분위수)"""
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import httpx
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVER_DIR = BENCH_DIR.parent
+# 서울 시청 주변
+CENTER_LAT, CENTER_LNG = 37.5665, 126.9780
+
+
+def write_osm_grid(path: Path, half_size_m: float = 3000, spacing_m: float = 40, steps_ratio: float = 0.05, seed: int = 1) -> int:
+    """
+    중심 주변에 격자 도로망 OSM XML을 만듦 (engine=local 벤치마크용), 노드 수 반환
+    가로/세로 줄마다 이름 있는 도로, 일부 구간은 highway=steps
+    """
+    rng = random.Random(seed)
+    d_lat = spacing_m / 111320
+    d_lng = spacing_m / (111320 * math.cos(math.radians(CENTER_LAT)))
+    count = int(half_size_m * 2 / spacing_m) + 1
+    origin_lat = CENTER_LAT - d_lat * (count // 2)
+    origin_lng = CENTER_LNG - d_lng * (count // 2)
+
+    def node_id(row: int, col: int) -> int:
+        return row * count + col + 1
+
+    way_id = 1
+    with path.open("w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        for row in range(count):
+            for col in range(count):
+                f.write(f'<node id="{node_id(row, col)}" lat="{origin_lat + row * d_lat:.7f}" lon="{origin_lng + col * d_lng:.7f}"/>\n')
+        for horizontal in (True, False):
+            for line in range(count):
+                for start in range(count - 1):
+                    a = node_id(line, start) if horizontal else node_id(start, line)
+                    b = node_id(line, start + 1) if horizontal else node_id(start + 1, line)
+                    highway = "steps" if rng.random() < steps_ratio else ("residential" if line % 5 else "secondary")
+                    name = f"{'가로' if horizontal else '세로'}{line}길"
+                    f.write(
+                        f'<way id="{way_id}"><nd ref="{a}"/><nd ref="{b}"/>'
+                        f'<tag k="highway" v="{highway}"/><tag k="name" v="{name}"/></way>\n'
+                    )
+                    way_id += 1
+        f.write("</osm>\n")
+    return count * count
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy")
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def summarize(latencies: list[float], errors: int, duration: float) -> dict:
+    """지연 시간 목록(초) -> 처리량과 백분위수(ms)"""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": len(values) / duration if duration else 0.0,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+
+def tile_paths(count: int, zoom: int = 16) -> list[str]:
+    # 서울 부근 z16 타일 블록
+    base_x, base_y = 55880, 25390
+    side = int(count ** 0.5) + 1
+    return [f"/maps/tiles/{zoom}/{base_x + i % side}/{base_y + i // side}.png" for i in range(count)]
+
+
+def mock_env(mock_url: str) -> dict[str, str]:
+    """모든 Google API를 대역 서버로 돌리는 환경 변수"""
+    return {
+        "GOOGLE_MAPS_API_KEY": "bench",
+        "GOOGLE_CLIENT_ID": "bench",
+        "GOOGLE_CLIENT_SECRET": "bench",
+        "GOOGLE_TILE_API_BASE": mock_url,
+        "GOOGLE_MAPS_API_BASE": mock_url,
+        "GOOGLE_AUTH_URL": f"{mock_url}/o/oauth2/v2/auth",
+        "GOOGLE_OAUTH_TOKEN_URL": f"{mock_url}/token",
+        "GOOGLE_USERINFO_URL": f"{mock_url}/oauth2/v2/userinfo",
+    }
+
+
+@contextmanager
+def mock_google(port: int, options: list[str] = ()) -> Iterator[str]:
+    """mock_google.py를 띄우고 기본 URL을 돌려줌"""
+    process = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "mock_google.py"), "--port", str(port), *options],
+        cwd=SERVER_DIR,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_healthy(f"{url}/_mock/stats")
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@contextmanager
+def app_server(env: dict[str, str], server_dir: Path = SERVER_DIR, port: int | None = None) -> Iterator[str]:
+    """server_dir의 main.py를 띄우고 기본 URL을 돌려줌 (env는 os.environ 위에 덮어씀)"""
+    port = port or free_port()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=server_dir,
+        env={**os.environ, "HOST": "127.0.0.1", "PORT": str(port), **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_healthy(f"{url}/health")
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
@@ -0,0 +1,303 @@
+"""
+벤치마크용 Google API 대역 서버 (Map Tiles, Places, Directions, OAuth)
+
+서버를 이 주소로 향하게 하려면:
+    GOOGLE_TILE_API_BASE=http://127.0.0.1:9100
+    GOOGLE_MAPS_API_BASE=http://127.0.0.1:9100
+    GOOGLE_OAUTH_TOKEN_URL=http://127.0.0.1:9100/token
+    GOOGLE_USERINFO_URL=http://127.0.0.1:9100/oauth2/v2/userinfo
+
+지연/오류 주입 (API별: tiles, tile_session, places, directions, oauth)
+    python bench/mock_google.py --port 9100 --latency-ms 40 --jitter-ms 10 --error-rate 0.01 --slow-rate 0.02 --slow-ms 800
+    curl -X POST localhost:9100/_mock/config -d '{"api": "tiles", "latency_ms": 200}'
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import secrets
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse, RedirectResponse
+from pydantic import BaseModel
+
+
+APIS = ("tiles", "tile_session", "places", "directions", "oauth")
+
+
+class FaultConfig(BaseModel):
+    latency_ms: float = float(os.getenv("MOCK_LATENCY_MS", "0"))
+    jitter_ms: float = float(os.getenv("MOCK_JITTER_MS", "0"))
+    # 이 비율만큼 error_status로 응답
+    error_rate: float = float(os.getenv("MOCK_ERROR_RATE", "0"))
+    error_status: int = 503
+    # 이 비율만큼 slow_ms를 추가로 지연 (꼬리 지연 재현)
+    slow_rate: float = float(os.getenv("MOCK_SLOW_RATE", "0"))
+    slow_ms: float = float(os.getenv("MOCK_SLOW_MS", "1000"))
+
+
+class RequestUpdateConfig(FaultConfig):
+    api: str | None = None  # 없으면 전체
+
+
+_configs: dict[str, FaultConfig] = {api: FaultConfig() for api in APIS}
+_stats: dict[str, dict[str, int]] = {api: {"requests": 0, "errors": 0} for api in APIS}
+
+
+async def _inject(api: str) -> Response | None:
+    """지연을 주고, 오류를 내야 하면 오류 응답 반환"""
+    config = _configs[api]
+    _stats[api]["requests"] += 1
+
+    delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+    if config.slow_rate and random.random() < config.slow_rate:
+        delay += config.slow_ms
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+    if config.error_rate and random.random() < config.error_rate:
+        _stats[api]["errors"] += 1
+        return JSONResponse({"error": "injected"}, status_code=config.error_status)
+    return None
+
+
+def _solid_png(seed: int, size: int = 256) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # 실제 지도 타일처럼 적은 색의 면과 도로 선으로 구성 (타일마다 배치가 달라야 캐시/변환 테스트가 현실적임)
+    rng = random.Random(seed)
+    palette = [(232, 234, 237), (200, 230, 201), (170, 218, 255), (245, 240, 225), (255, 255, 255)]
+    blocks = [[rng.choice(palette) for _ in range(size // 32)] for _ in range(size // 32)]
+    rows = []
+    for y in range(size):
+        row = bytearray(b"\x00")
+        for x in range(size):
+            if (x + seed * 7) % 64 < 3 or (y + seed * 5) % 96 < 4:
+                row += bytes((255, 242, 175))
+            else:
+                row += bytes(blocks[y // 32][x // 32])
+        rows.append(bytes(row))
+    rows = b"".join(rows)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+# 타일 변형을 미리 몇 개만 만들어 두고 돌려씀
+TILE_VARIANTS = [_solid_png(seed) for seed in range(8)]
+
+
+def _encode_polyline(points: list[tuple[float, float]]) -> str:
+    result = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        for value, prev in ((round(lat * 1e5), prev_lat), (round(lng * 1e5), prev_lng)):
+            delta = value - prev
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                result.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            result.append(chr(delta + 63))
+        prev_lat, prev_lng = round(lat * 1e5), round(lng * 1e5)
+    return "".join(result)
+
+
+def _parse_latlng(value: str) -> tuple[float, float]:
+    if value.startswith("place_id:"):
+        # place_id마다 서울 시청 근처의 고정 좌표
+        digest = hashlib.sha256(value.encode()).digest()
+        return 37.5665 + (digest[0] - 128) / 10000, 126.9780 + (digest[1] - 128) / 10000
+    lat, lng = value.split(",")
+    return float(lat), float(lng)
+
+
+def _mock_route(origin: tuple[float, float], destination: tuple[float, float], offset: float, points: int = 80) -> dict:
+    path = []
+    for i in range(points + 1):
+        t = i / points
+        # 대안 경로는 가운데가 옆으로 휘어짐
+        bend = offset * 4 * t * (1 - t)
+        path.append((
+            origin[0] + (destination[0] - origin[0]) * t + bend,
+            origin[1] + (destination[1] - origin[1]) * t - bend,
+        ))
+
+    step_size = max(1, points // 8)
+    steps = []
+    for start in range(0, points, step_size):
+        segment = path[start:start + step_size + 1]
+        steps.append({
+            "html_instructions": "직진",
+            "distance": {"text": "100 m", "value": 100},
+            "duration": {"text": "2분", "value": 80},
+            "start_location": {"lat": segment[0][0], "lng": segment[0][1]},
+            "end_location": {"lat": segment[-1][0], "lng": segment[-1][1]},
+            "polyline": {"points": _encode_polyline(segment)},
+        })
+
+    distance = len(steps) * 100
+    return {
+        "summary": f"mock route {offset:+.4f}",
+        "legs": [{
+            "distance": {"text": f"{distance} m", "value": distance},
+            "duration": {"text": f"{distance // 75}분", "value": distance * 4 // 5},
+            "start_address": "출발지",
+            "end_address": "도착지",
+            "start_location": {"lat": origin[0], "lng": origin[1]},
+            "end_location": {"lat": destination[0], "lng": destination[1]},
+            "steps": steps,
+        }],
+        "overview_polyline": {"points": _encode_polyline(path)},
+    }
+
+
+def _mock_place(index: int, query: str) -> dict:
+    rng = random.Random(f"{query}:{index}")
+    return {
+        "place_id": f"mock_{hashlib.md5(f'{query}:{index}'.encode()).hexdigest()[:16]}",
+        "name": f"{query} {index + 1}",
+        "formatted_address": f"서울특별시 중구 세종대로 {index + 1}",
+        "vicinity": f"세종대로 {index + 1}",
+        "geometry": {"location": {"lat": 37.5665 + rng.uniform(-0.01, 0.01), "lng": 126.9780 + rng.uniform(-0.01, 0.01)}},
+        "types": ["point_of_interest", "establishment"],
+        "rating": round(rng.uniform(3, 5), 1),
+        "user_ratings_total": rng.randrange(10, 2000),
+        "opening_hours": {"open_now": rng.random() < 0.7, "weekday_text": []},
+    }
+
+
+app = FastAPI(title="Mock Google APIs")
+
+
+@app.post("/_mock/config")
+async def update_config(req: RequestUpdateConfig) -> dict:
+    values = req.model_dump(exclude={"api"}, exclude_unset=True)
+    for api in ([req.api] if req.api else APIS):
+        _configs[api] = _configs[api].model_copy(update=values)
+    return {api: config.model_dump() for api, config in _configs.items()}
+
+
+@app.get("/_mock/stats")
+async def get_stats() -> dict:
+    return _stats
+
+
+@app.post("/_mock/reset")
+async def reset_stats() -> dict:
+    for counts in _stats.values():
+        counts.update(requests=0, errors=0)
+    return _stats
+
+
+# --- Map Tiles ---
+
+@app.post("/v1/createSession")
+async def create_session():
+    if (error := await _inject("tile_session")) is not None:
+        return error
+    expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+    return {"session": secrets.token_urlsafe(16), "expiry": expiry.isoformat().replace("+00:00", "Z")}
+
+
+@app.get("/v1/2dtiles/{z}/{x}/{y}")
+async def tile(z: int, x: int, y: int) -> Response:
+    if (error := await _inject("tiles")) is not None:
+        return error
+    return Response(content=TILE_VARIANTS[(x * 31 + y * 17 + z) % len(TILE_VARIANTS)], media_type="image/png")
+
+
+# --- Places ---
+
+@app.get("/maps/api/place/{endpoint}/json")
+async def places(
+    endpoint: str,
+    query: str | None = None,
+    input: str | None = None,
+    keyword: str | None = None,
+    place_id: str | None = None,
+):
+    if (error := await _inject("places")) is not None:
+        return error
+
+    if endpoint == "autocomplete":
+        text = input or ""
+        return {"status": "OK", "predictions": [
+            {
+                "place_id": place["place_id"],
+                "description": f"{place['name']}, {place['formatted_address']}",
+                "structured_formatting": {"main_text": place["name"], "secondary_text": place["formatted_address"]},
+                "types": place["types"],
+            }
+            for place in (_mock_place(i, text) for i in range(5))
+        ]}
+    if endpoint == "details":
+        return {"status": "OK", "result": _mock_place(0, place_id or "")}
+    if endpoint in ("textsearch", "nearbysearch"):
+        return {"status": "OK", "results": [_mock_place(i, query or keyword or "장소") for i in range(20)]}
+    return {"status": "INVALID_REQUEST"}
+
+
+# --- Directions ---
+
+@app.get("/maps/api/directions/json")
+async def directions(origin: str, destination: str, alternatives: str | None = None):
+    if (error := await _inject("directions")) is not None:
+        return error
+
+    start, end = _parse_latlng(origin), _parse_latlng(destination)
+    offsets = (0.0, 0.0015, -0.0015) if alternatives == "true" else (0.0,)
+    return {"status": "OK", "routes": [_mock_route(start, end, offset) for offset in offsets]}
+
+
+# --- OAuth ---
+
+@app.get("/o/oauth2/v2/auth")
+async def oauth_authorize(redirect_uri: str, state: str) -> RedirectResponse:
+    return RedirectResponse(f"{redirect_uri}?code=mock-{secrets.token_hex(8)}&state={state}")
+
+
+@app.post("/token")
+async def oauth_token():
+    if (error := await _inject("oauth")) is not None:
+        return error
+    return {"access_token": f"ya29.mock-{secrets.token_hex(16)}", "expires_in": 3599, "token_type": "Bearer"}
+
+
+@app.get("/oauth2/v2/userinfo")
+async def oauth_userinfo():
+    if (error := await _inject("oauth")) is not None:
+        return error
+    # 벤치마크에서는 로그인마다 새 사용자
+    user = secrets.token_hex(6)
+    return {"id": f"mock-{user}", "email": f"{user}@example.com", "name": f"bench-{user}", "picture": None}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Google API 대역 서버")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--error-status", type=int)
+    parser.add_argument("--slow-rate", type=float)
+    parser.add_argument("--slow-ms", type=float)
+    args = parser.parse_args()
+
+    overrides = {
+        key: value for key, value in vars(args).items()
+        if key != "port" and value is not None
+    }
+    for api in APIS:
+        _configs[api] = _configs[api].model_copy(update=overrides)
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
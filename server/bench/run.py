@@ -0,0 +1,400 @@
+"""
+대역 Google API를 상대로 한 부하 시나리오 벤치마크
+
+mock_google.py와 서버를 띄우고 시나리오마다 동시 사용자 N명이 duration초 동안 요청을 반복
+요청 단위로 처리량과 p50/p95/p99를, 대역 서버 기준으로 업스트림 호출 수를 기록
+
+    cd server && python bench/run.py --duration 15 --concurrency 32 --output results.json
+    python bench/run.py --workloads tiles_pan,directions --latency-ms 80 --jitter-ms 40 --slow-rate 0.02
+    python bench/run.py --baseline results.json            # 저장된 결과와 비교
+    python bench/run.py --revisions HEAD~3,HEAD            # 두 리비전을 git worktree로 띄워 비교
+
+시나리오
+    tiles_pan     지도를 이리저리 끌 때처럼 5x4 타일을 한꺼번에 요청
+    autocomplete  검색어를 한 글자씩 입력하며 자동완성 요청
+    directions    장애물이 촘촘히 깔린 경로에 대한 도보 길찾기
+    viewport      장애물이 몰린 지역에서 지도를 조금씩 옮기며 영역 조회
+    reports       장애물 제보와 검증을 동시에
+    login         OAuth 로그인 왕복 후 /auth/me
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from common import CENTER_LAT, CENTER_LNG, SERVER_DIR, app_server, free_port, mock_env, mock_google, summarize, write_osm_grid
+
+
+# 서울 부근 z16 타일 블록
+TILE_ZOOM = 16
+TILE_BASE_X, TILE_BASE_Y = 55880, 25390
+TILE_AREA = 200
+VIEWPORT_COLUMNS, VIEWPORT_ROWS = 5, 4
+
+AUTOCOMPLETE_WORDS = ["서울역", "시청", "광화문", "경복궁", "남대문시장", "명동성당", "을지로입구", "종각역", "덕수궁", "청계천"]
+
+# 길찾기 출발/도착 쌍 (대역 서버는 두 점을 잇는 직선 경로를 돌려줌)
+ROUTE_PAIRS = [
+    ((37.5547, 126.9707), (37.5700, 126.9830)),
+    ((37.5600, 126.9700), (37.5650, 126.9900)),
+    ((37.5720, 126.9760), (37.5580, 126.9850)),
+    ((37.5640, 126.9680), (37.5660, 126.9940)),
+]
+# 경로 하나당 경로 근처(약 20m 이내)에 뿌릴 장애물 수
+OBSTACLES_PER_ROUTE = 2000
+
+WORKLOAD_NAMES = ("tiles_pan", "autocomplete", "directions", "viewport", "reports", "login")
+# 지도 화면 하나 크기 (도)
+VIEWPORT_SPAN = 0.01
+
+
+@dataclass
+class Recorder:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    # 응답의 X-Cache 값별 개수 (타일)
+    cache: dict[str, int] = field(default_factory=dict)
+    response_bytes: int = 0
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, ok: tuple[int, ...] = (200,), **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            return None
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+        if response.status_code not in ok:
+            self.errors += 1
+        self.response_bytes += len(response.content)
+        cache_status = response.headers.get("x-cache")
+        if cache_status:
+            self.cache[cache_status] = self.cache.get(cache_status, 0) + 1
+        return response
+
+
+@dataclass
+class Context:
+    """시나리오가 공유하는 시드 데이터와 옵션"""
+    place_ids: list[int]
+    user_ids: list[int]
+    think_seconds: float
+    engine: str = "google"
+
+
+Workload = Callable[[httpx.AsyncClient, Recorder, random.Random, dict, Context], Awaitable[None]]
+
+
+async def tiles_pan(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, state: dict, ctx: Context) -> None:
+    x = state.setdefault("x", TILE_BASE_X + rng.randrange(TILE_AREA))
+    y = state.setdefault("y", TILE_BASE_Y + rng.randrange(TILE_AREA))
+    # 한 방향으로 한 칸씩 끌다가 가끔 방향을 바꿈
+    if "dx" not in state or rng.random() < 0.2:
+        state["dx"], state["dy"] = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1), (1, -1), (-1, 1)])
+    state["x"] = min(max(x + state["dx"], TILE_BASE_X), TILE_BASE_X + TILE_AREA)
+    state["y"] = min(max(y + state["dy"], TILE_BASE_Y), TILE_BASE_Y + TILE_AREA)
+
+    headers = {
+        "X-Client-Id": state.setdefault("client_id", f"bench-{rng.getrandbits(32):08x}"),
+        # 브라우저가 이미지 요청에 붙이는 값
+        "Accept": "image/avif,image/webp,*/*",
+    }
+    await asyncio.gather(*(
+        rec.request(client, "GET", f"/maps/tiles/{TILE_ZOOM}/{state['x'] + dx}/{state['y'] + dy}.png", headers=headers)
+        for dx in range(VIEWPORT_COLUMNS)
+        for dy in range(VIEWPORT_ROWS)
+    ))
+    await asyncio.sleep(ctx.think_seconds)
+
+
+async def autocomplete(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, state: dict, ctx: Context) -> None:
+    word = rng.choice(AUTOCOMPLETE_WORDS)
+    location = f"{CENTER_LAT + rng.uniform(-0.01, 0.01):.5f},{CENTER_LNG + rng.uniform(-0.01, 0.01):.5f}"
+    for length in range(1, len(word) + 1):
+        await rec.request(client, "GET", "/places/autocomplete", params={"input": word[:length], "location": location, "radius": 3000})
+        await asyncio.sleep(ctx.think_seconds)
+
+
+async def directions(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, state: dict, ctx: Context) -> None:
+    origin, destination = rng.choice(ROUTE_PAIRS)
+    if rng.random() < 0.5:
+        origin, destination = destination, origin
+    await rec.request(client, "POST", "/directions/walking", json={
+        "origin_latitude": origin[0],
+        "origin_longitude": origin[1],
+        "destination_latitude": destination[0],
+        "destination_longitude": destination[1],
+        "engine": ctx.engine,
+    })
+    await asyncio.sleep(ctx.think_seconds)
+
+
+async def viewport(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, state: dict, ctx: Context) -> None:
+    # 장애물이 몰린 경로 주변을 조금씩 옮겨 가며 조회
+    lat = state.setdefault("lat", CENTER_LAT + rng.uniform(-0.01, 0.01))
+    lng = state.setdefault("lng", CENTER_LNG + rng.uniform(-0.01, 0.01))
+    state["lat"] = min(max(lat + rng.uniform(-0.002, 0.002), CENTER_LAT - 0.015), CENTER_LAT + 0.015)
+    state["lng"] = min(max(lng + rng.uniform(-0.002, 0.002), CENTER_LNG - 0.015), CENTER_LNG + 0.015)
+    await rec.request(client, "POST", "/warning/viewport", json={
+        "sw_latitude": state["lat"] - VIEWPORT_SPAN / 2,
+        "sw_longitude": state["lng"] - VIEWPORT_SPAN / 2,
+        "ne_latitude": state["lat"] + VIEWPORT_SPAN / 2,
+        "ne_longitude": state["lng"] + VIEWPORT_SPAN / 2,
+        "type": rng.choice([None, None, "Stair"]),
+    })
+    await asyncio.sleep(ctx.think_seconds)
+
+
+async def reports(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, state: dict, ctx: Context) -> None:
+    user_id = state.setdefault("user_id", rng.choice(ctx.user_ids))
+    if rng.random() < 0.6:
+        response = await rec.request(client, "POST", "/warning/add_place", json={
+            "user_id": user_id,
+            "name": "bench report",
+            "latitude": CENTER_LAT + rng.uniform(-0.02, 0.02),
+            "longitude": CENTER_LNG + rng.uniform(-0.02, 0.02),
+            "description": "",
+            "type": rng.choice(["Stuff", "Stair", "EV"]),
+        })
+        if response is not None and response.status_code == 200:
+            place_id = response.json().get("id")
+            if place_id is not None:
+                ctx.place_ids.append(place_id)
+    else:
+        # 자기 제보나 이미 검증한 장소는 400이 정상 응답
+        await rec.request(
+            client, "POST", f"/warning/verify/{rng.choice(ctx.place_ids)}", ok=(200, 400),
+            json={"user_id": user_id, "is_valid": rng.random() < 0.8},
+        )
+    await asyncio.sleep(ctx.think_seconds)
+
+
+async def login(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, state: dict, ctx: Context) -> None:
+    response = await rec.request(client, "GET", "/auth/google", ok=(302, 307))
+    if response is None or "location" not in response.headers:
+        return
+    oauth_state = parse_qs(urlparse(response.headers["location"]).query).get("state", [""])[0]
+
+    response = await rec.request(client, "GET", "/callback/google", params={"code": "bench", "state": oauth_state})
+    if response is None or response.status_code != 200:
+        return
+    token = response.json().get("session_token") or response.json().get("access_token")
+
+    await rec.request(client, "GET", "/auth/me", headers={"Authorization": f"Bearer {token}"})
+    await asyncio.sleep(ctx.think_seconds)
+
+
+WORKLOADS: dict[str, Workload] = {
+    "tiles_pan": tiles_pan,
+    "autocomplete": autocomplete,
+    "directions": directions,
+    "viewport": viewport,
+    "reports": reports,
+    "login": login,
+}
+
+
+def _seed(base_url: str, places: int, users: int) -> Context:
+    """장애물(경로 주변 밀집 + 전역 무작위)과 사용자를 미리 넣음"""
+    rng = random.Random(0)
+    rows = []
+    for origin, destination in ROUTE_PAIRS:
+        for _ in range(OBSTACLES_PER_ROUTE):
+            t = rng.random()
+            rows.append({
+                "latitude": origin[0] + (destination[0] - origin[0]) * t + rng.uniform(-0.0002, 0.0002),
+                "longitude": origin[1] + (destination[1] - origin[1]) * t + rng.uniform(-0.0002, 0.0002),
+            })
+    for _ in range(places):
+        rows.append({
+            "latitude": CENTER_LAT + rng.uniform(-0.03, 0.03),
+            "longitude": CENTER_LNG + rng.uniform(-0.03, 0.03),
+        })
+    body = "".join(
+        json.dumps({"name": f"bench-{i}", "description": "", "type": rng.choice(["Stuff", "Stair", "EV"]), **row}) + "\n"
+        for i, row in enumerate(rows)
+    )
+
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        user_ids = [client.post("/badge/user", json={"username": f"bench-{i}"}).json()["id"] for i in range(users)]
+        response = client.post(
+            "/warning/bulk/import",
+            params={"format": "ndjson", "user_id": user_ids[0], "dedupe_radius": 0},
+            files={"file": ("seed.ndjson", io.BytesIO(body.encode()), "application/x-ndjson")},
+        )
+        response.raise_for_status()
+        exported = client.get("/warning/bulk/export", params={"format": "ndjson"}).text
+        place_ids = [json.loads(line)["id"] for line in exported.splitlines() if line.strip()]
+
+    return Context(place_ids=place_ids, user_ids=user_ids, think_seconds=0.0)
+
+
+async def _run_workload(base_url: str, workload: Workload, ctx: Context, concurrency: int, duration: float, warmup: float) -> dict:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=concurrency * VIEWPORT_COLUMNS * VIEWPORT_ROWS)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        async def user(seed: int, until: float, recorder: Recorder) -> None:
+            rng = random.Random(seed)
+            state: dict = {}
+            while time.monotonic() < until:
+                await workload(client, recorder, rng, state, ctx)
+
+        if warmup > 0:
+            until = time.monotonic() + warmup
+            await asyncio.gather(*(user(seed, until, Recorder()) for seed in range(concurrency)))
+
+        started = time.monotonic()
+        await asyncio.gather(*(user(seed, started + duration, rec) for seed in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    summary = summarize(rec.latencies, rec.errors, elapsed)
+    if rec.cache:
+        summary["cache"] = rec.cache
+        summary["response_bytes"] = rec.response_bytes
+    return summary
+
+
+def run_suite(args: argparse.Namespace, server_dir: Path = SERVER_DIR) -> dict:
+    mock_options = [
+        f"--{name.replace('_', '-')}={value}"
+        for name in ("latency_ms", "jitter_ms", "error_rate", "slow_rate", "slow_ms")
+        if (value := getattr(args, name)) is not None
+    ]
+    results = {}
+
+    with mock_google(free_port(), mock_options) as mock_url, tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **mock_env(mock_url),
+            "WORKERS": str(args.workers),
+            "DB_PATH": str(Path(tmp) / "bench.db"),
+            "SHARED_CACHE_PATH": str(Path(tmp) / "cache.db") if args.workers > 1 else "",
+            "WARNING_PLACE_IMG_PATH": str(Path(tmp) / "images"),
+        }
+        if args.engine == "local":
+            osm_path = Path(tmp) / "grid.osm"
+            write_osm_grid(osm_path)
+            env["ROUTING_OSM_PATH"] = str(osm_path)
+        with app_server(env, server_dir) as base_url:
+            ctx = _seed(base_url, args.places, max(args.concurrency, 2))
+            ctx.think_seconds = args.think_ms / 1000
+            ctx.engine = args.engine
+
+            for name in args.workloads:
+                httpx.post(f"{mock_url}/_mock/reset")
+                print(f"[bench] {name} ...", file=sys.stderr)
+                summary = asyncio.run(_run_workload(base_url, WORKLOADS[name], ctx, args.concurrency, args.duration, args.warmup))
+                upstream = httpx.get(f"{mock_url}/_mock/stats").json()
+                summary["upstream_calls"] = {api: counts["requests"] for api, counts in upstream.items() if counts["requests"]}
+                results[name] = summary
+
+    return results
+
+
+def _git(*command: str, cwd: Path = SERVER_DIR) -> str:
+    return subprocess.run(["git", *command], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def run_revision(args: argparse.Namespace, revision: str) -> dict:
+    """리비전을 임시 worktree로 꺼내 그 서버 코드로 실행 (부하 생성기와 대역 서버는 현재 트리 것)"""
+    repo = Path(_git("rev-parse", "--show-toplevel"))
+    server_subdir = SERVER_DIR.relative_to(repo)
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "tree"
+        _git("worktree", "add", "--detach", str(worktree), revision, cwd=repo)
+        try:
+            return run_suite(args, worktree / server_subdir)
+        finally:
+            _git("worktree", "remove", "--force", str(worktree), cwd=repo)
+
+
+def _report(results: dict) -> None:
+    print(f"{'workload':<14} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  upstream")
+    for name, s in results.items():
+        upstream = " ".join(f"{api}={count}" for api, count in s.get("upstream_calls", {}).items())
+        if s.get("cache"):
+            upstream += "  cache " + " ".join(f"{status}={count}" for status, count in sorted(s["cache"].items()))
+            upstream += f"  {s['response_bytes'] / max(1, s['requests']):.0f} B/resp"
+        print(f"{name:<14} {s['rps']:>9.1f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['errors']:>7}  {upstream}")
+
+
+def _compare(base: dict, head: dict, base_label: str, head_label: str) -> None:
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\n{base_label} -> {head_label}")
+    print(f"{'workload':<14} {'req/s':>18} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    for name in head:
+        if name not in base:
+            continue
+        old, new = base[name], head[name]
+        cells = [
+            f"{change(old[key], new[key]):>8} ({new[key]:>7.1f})"
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(f"{name:<14} " + " ".join(f"{cell:>18}" for cell in cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="부하 시나리오 벤치마크")
+    parser.add_argument("--workloads", default=",".join(WORKLOAD_NAMES), help=f"쉼표로 구분 ({', '.join(WORKLOAD_NAMES)})")
+    parser.add_argument("--duration", type=float, default=10, help="시나리오별 측정 시간 (초)")
+    parser.add_argument("--warmup", type=float, default=2, help="측정 전 예열 시간 (초)")
+    parser.add_argument("--concurrency", type=int, default=16, help="시나리오별 동시 사용자 수")
+    parser.add_argument("--think-ms", type=float, default=0, help="사용자 동작 사이 대기 시간")
+    parser.add_argument("--workers", type=int, default=1, help="서버 워커 프로세스 수")
+    parser.add_argument("--engine", choices=["google", "local"], default="google", help="directions 시나리오의 경로 탐색 엔진 (local은 격자 OSM 도로망 사용)")
+    parser.add_argument("--places", type=int, default=5000, help="전역에 흩뿌릴 장애물 수")
+    parser.add_argument("--latency-ms", type=float, help="대역 서버 기본 지연")
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--slow-rate", type=float)
+    parser.add_argument("--slow-ms", type=float)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--revisions", help="비교할 git 리비전 두 개 (예: main,HEAD)")
+    args = parser.parse_args()
+
+    args.workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    if args.latency_ms is None:
+        args.latency_ms = 30  # 실제 Google API에 가까운 기본값
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "revisions")}
+
+    if args.revisions:
+        base_rev, head_rev = args.revisions.split(",")
+        runs = {rev: run_revision(args, rev) for rev in (base_rev, head_rev)}
+        for rev, results in runs.items():
+            print(f"\n[{rev}] {_git('rev-parse', '--short', rev)}")
+            _report(results)
+        _compare(runs[base_rev], runs[head_rev], base_rev, head_rev)
+        output = {"config": config, "revisions": runs}
+    else:
+        results = run_suite(args)
+        _report(results)
+        output = {"config": config, "revision": _git("rev-parse", "--short", "HEAD"), "results": results}
+        if args.baseline:
+            baseline = json.loads(Path(args.baseline).read_text())
+            _compare(baseline["results"], results, args.baseline, "current")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(output, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+워커 수에 따른 처리량 측정
+
+mock_google.py를 업스트림으로 띄우고 WORKERS=1,2,4...로 서버를 재시작하며
+타일 프록시(캐시 적중)와 뷰포트 조회를 섞어서 부하를 줌
+
+    cd server && python bench/worker_scaling.py --workers 1,2,4 --duration 10
+
+부하 생성기도 같은 머신의 코어를 쓰므로 코어 수의 절반 정도까지가 의미 있는 범위
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from common import CENTER_LAT, CENTER_LNG, app_server, free_port, mock_google, percentile, tile_paths
+
+
+def _viewport_body(rng: random.Random) -> dict:
+    lat = CENTER_LAT + rng.uniform(-0.02, 0.02)
+    lng = CENTER_LNG + rng.uniform(-0.02, 0.02)
+    return {
+        "sw_latitude": lat - 0.005,
+        "sw_longitude": lng - 0.005,
+        "ne_latitude": lat + 0.005,
+        "ne_longitude": lng + 0.005,
+    }
+
+
+async def _load(base_url: str, paths: list[str], viewport_ratio: float, concurrency: int, duration: float, seed: int):
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=10, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    if rng.random() < viewport_ratio:
+                        response = await client.post("/warning/viewport", json=_viewport_body(rng))
+                    else:
+                        response = await client.get(rng.choice(paths))
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def _client_process(args: tuple) -> tuple[list[float], int]:
+    return asyncio.run(_load(*args))
+
+
+def _seed_places(base_url: str, count: int) -> None:
+    rng = random.Random(0)
+    with httpx.Client(base_url=base_url, timeout=10) as client:
+        user_id = client.post("/badge/user", json={"username": "bench"}).json()["id"]
+        for i in range(count):
+            client.post("/warning/add_place", json={
+                "user_id": user_id,
+                "name": f"bench-{i}",
+                "latitude": CENTER_LAT + rng.uniform(-0.03, 0.03),
+                "longitude": CENTER_LNG + rng.uniform(-0.03, 0.03),
+                "description": "",
+                "type": rng.choice(["Stuff", "Stair", "EV"]),
+                "duplicate_policy": "ignore",
+            })
+
+
+def run(worker_counts: list[int], duration: float, concurrency: int, clients: int, tiles: int, places: int, viewport_ratio: float) -> None:
+    results = []
+    with mock_google(free_port()) as mock_url:
+        paths = tile_paths(tiles)
+
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {
+                    "WORKERS": str(workers),
+                    "DB_PATH": str(Path(tmp) / "bench.db"),
+                    "SHARED_CACHE_PATH": str(Path(tmp) / "cache.db"),
+                    "GOOGLE_MAPS_API_KEY": "bench",
+                    "GOOGLE_TILE_API_BASE": mock_url,
+                }
+                with app_server(env) as base_url:
+                    _seed_places(base_url, places)
+                    # 공유 캐시 채우기
+                    with httpx.Client(base_url=base_url, timeout=10) as client:
+                        for path in paths:
+                            client.get(path)
+
+                    per_client = max(1, concurrency // clients)
+                    jobs = [(base_url, paths, viewport_ratio, per_client, duration, seed) for seed in range(clients)]
+                    with multiprocessing.Pool(clients) as pool:
+                        outputs = pool.map(_client_process, jobs)
+
+            latencies = sorted(latency for output in outputs for latency in output[0])
+            errors = sum(output[1] for output in outputs)
+            results.append((workers, len(latencies) / duration, percentile(latencies, 0.5), percentile(latencies, 0.99), errors))
+
+    base_rps = results[0][1] if results else 0
+    print(f"\ncores={os.cpu_count()} duration={duration}s concurrency={concurrency} clients={clients} viewport_ratio={viewport_ratio}")
+    print(f"{'workers':>7} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8}")
+    for workers, rps, p50, p99, errors in results:
+        print(f"{workers:>7} {rps:>10.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>7} {rps / base_rps:>7.2f}x")
+
+
+if __name__ == "__main__":
+    cpu = os.cpu_count() or 1
+    default_workers = [n for n in (1, 2, 4, 8, 16) if n <= max(1, cpu // 2)]
+
+    parser = argparse.ArgumentParser(description="워커 수별 처리량 측정")
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="예: 1,2,4")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=max(1, cpu // 2), help="부하 생성 프로세스 수")
+    parser.add_argument("--tiles", type=int, default=400, help="서로 다른 타일 수")
+    parser.add_argument("--places", type=int, default=500, help="미리 넣을 장애물 수")
+    parser.add_argument("--viewport-ratio", type=float, default=0.3, help="뷰포트 조회 비율")
+    args = parser.parse_args()
+
+    run(
+        [int(n) for n in args.workers.split(",")],
+        args.duration, args.concurrency, args.clients, args.tiles, args.places, args.viewport_ratio,
+    )
@@ -0,0 +1,429 @@
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, Literal, TextIO
+
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from db import DB_PATH, init_db
+from events import broadcast_resync
+from geo import haversine_distance, meters_to_latitude_degrees, meters_to_longitude_degrees
+from snapshot import place_snapshot
+
+
+router = APIRouter(prefix="/warning/bulk", tags=["warning"])
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+BULK_DEDUPE_RADIUS_METERS = float(os.getenv("BULK_DEDUPE_RADIUS_METERS", "5"))
+BULK_READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+PLACE_TYPES = ("Stuff", "Stair", "EV")
+BulkFormat = Literal["csv", "geojson", "ndjson"]
+PlaceType = Literal["Stuff", "Stair", "EV"]
+
+EXPORT_COLUMNS = ("id", "user_id", "name", "latitude", "longitude", "description", "type", "has_image", "verification_count", "duplicate_of", "created_at", "updated_at")
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "geojson": "application/geo+json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class BadRecord(ValueError):
+    """
+    읽을 수 없는 레코드 하나
+    리더가 예외를 던지는 대신 내보내서 그 레코드만 건너뛰고 계속 읽음
+    """
+
+
+class ImportAborted(ValueError):
+    """파일 구조가 깨져서 중간에 멈춤 (그 앞까지는 반영됨)"""
+
+    def __init__(self, message: str, result: dict):
+        super().__init__(message)
+        self.result = result
+
+
+def _iter_csv(stream: TextIO) -> Iterator[dict]:
+    yield from csv.DictReader(stream)
+
+
+def _iter_ndjson(stream: TextIO) -> Iterator[dict | BadRecord]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield BadRecord(str(e))
+            continue
+        yield record if isinstance(record, dict) else BadRecord("Record is not a JSON object")
+
+
+def _iter_geojson(stream: TextIO) -> Iterator[dict | BadRecord]:
+    """
+    FeatureCollection을 통째로 읽지 않고 features 배열의 원소를 하나씩 디코딩
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = stream.read(BULK_READ_SIZE)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(chars: str) -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    # "features" 키와 배열 시작 위치 찾기
+    while True:
+        index = buffer.find('"features"', pos)
+        if index >= 0:
+            pos = index + len('"features"')
+            break
+        if not fill():
+            raise ValueError("GeoJSON has no features array")
+    skip(" \t\r\n:")
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("GeoJSON features is not an array")
+    pos += 1
+
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of GeoJSON")
+        if buffer[pos] == "]":
+            return
+        try:
+            feature, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof or not fill():
+                raise
+            continue
+        pos = end
+        try:
+            yield _feature_to_record(feature)
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+            yield BadRecord(str(e))
+
+
+def _feature_to_record(feature: dict) -> dict:
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        raise ValueError("Only Point geometries are supported")
+    longitude, latitude = geometry["coordinates"][:2]
+    record = dict(feature.get("properties") or {})
+    record["latitude"] = latitude
+    record["longitude"] = longitude
+    return record
+
+
+READERS = {
+    "csv": _iter_csv,
+    "geojson": _iter_geojson,
+    "ndjson": _iter_ndjson,
+}
+
+
+def _normalize_record(record: dict, default_type: str | None) -> tuple[str, float, float, str, str]:
+    latitude = float(record.get("latitude", record.get("lat")))
+    longitude = float(record.get("longitude", record.get("lng", record.get("lon"))))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or math.isnan(latitude + longitude):
+        raise ValueError("Coordinates out of range")
+
+    place_type = default_type or record.get("type") or "Stuff"
+    if place_type not in PLACE_TYPES:
+        raise ValueError(f"Unknown type: {place_type}")
+
+    name = str(record.get("name") or place_type)
+    description = str(record.get("description") or "")
+    return place_type, latitude, longitude, name, description
+
+
+class _DedupeGrid:
+    """
+    반경 안에 같은 타입의 점이 있는지 검사하는 메모리 격자
+    청크마다 DB에 반경 질의를 던지는 대신 시작할 때 한 번 읽어 메모리에서 검사
+    """
+
+    def __init__(self, radius: float):
+        self.radius = radius
+        self.cell = max(meters_to_latitude_degrees(radius), 1e-7)
+        self._cells: dict[tuple[str, int, int], list[tuple[float, float]]] = {}
+
+    def _key(self, place_type: str, latitude: float, longitude: float) -> tuple[str, int, int]:
+        return place_type, math.floor(latitude / self.cell), math.floor(longitude / self.cell)
+
+    def add(self, place_type: str, latitude: float, longitude: float) -> None:
+        self._cells.setdefault(self._key(place_type, latitude, longitude), []).append((latitude, longitude))
+
+    def contains_near(self, place_type: str, latitude: float, longitude: float) -> bool:
+        _, row, col = self._key(place_type, latitude, longitude)
+        # 경도 1도는 위도 1도보다 짧으므로 경도 방향으로 셀을 더 봐야 함
+        col_span = math.ceil(meters_to_longitude_degrees(self.radius, latitude) / self.cell)
+        for d_row in (-1, 0, 1):
+            for d_col in range(-col_span, col_span + 1):
+                for lat, lng in self._cells.get((place_type, row + d_row, col + d_col), ()):
+                    if haversine_distance(latitude, longitude, lat, lng) <= self.radius:
+                        return True
+        return False
+
+
+def import_places(
+    stream: TextIO,
+    fmt: BulkFormat,
+    default_type: str | None = None,
+    user_id: int | None = None,
+    dedupe_radius: float = BULK_DEDUPE_RADIUS_METERS,
+    db_path: str = DB_PATH,
+) -> dict:
+    """
+    대량 임포트
+    - 청크 단위 executemany + 청크마다 커밋
+    - 좌표 인덱스는 유지 (동시에 들어오는 조회가 풀스캔으로 떨어지지 않도록)
+    - 사용자 카운터/연속 제보일은 갱신하지 않음
+    - 읽을 수 없는 레코드는 건너뛰고 skipped/errors에 기록
+    - 파일 구조가 깨지면 그 앞까지 반영하고 ImportAborted
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    imported = duplicates = skipped = 0
+    errors: list[str] = []
+
+    try:
+        dedupe = _DedupeGrid(dedupe_radius) if dedupe_radius > 0 else None
+        if dedupe is not None:
+            for place_type, latitude, longitude in conn.execute(
+                "SELECT type, latitude, longitude FROM warning_places"
+            ):
+                dedupe.add(place_type, latitude, longitude)
+
+        def flush(batch: list[tuple]) -> None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM warning_places").fetchone()[0]
+            conn.executemany(
+                """INSERT INTO warning_places
+                   (user_id, name, latitude, longitude, description, type)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                batch,
+            )
+            conn.execute(
+                """INSERT INTO place_changes (place_id, change_type)
+                   SELECT id, 'add' FROM warning_places WHERE id > ? ORDER BY id""",
+                (last_id,),
+            )
+            conn.commit()
+
+        batch: list[tuple] = []
+        aborted = None
+        try:
+            for line_no, record in enumerate(READERS[fmt](stream), start=1):
+                try:
+                    if isinstance(record, BadRecord):
+                        raise record
+                    place_type, latitude, longitude, name, description = _normalize_record(record, default_type)
+                except (TypeError, ValueError, KeyError) as e:
+                    skipped += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(f"record {line_no}: {e}")
+                    continue
+
+                if dedupe is not None:
+                    if dedupe.contains_near(place_type, latitude, longitude):
+                        duplicates += 1
+                        continue
+                    dedupe.add(place_type, latitude, longitude)
+
+                batch.append((user_id, name, latitude, longitude, description, place_type))
+                if len(batch) >= BULK_CHUNK_SIZE:
+                    flush(batch)
+                    imported += len(batch)
+                    batch = []
+        except ValueError as e:
+            # 파일 구조가 깨짐 (잘린 GeoJSON, 잘못된 인코딩 등): 그 앞까지만 반영
+            aborted = str(e)
+
+        if batch:
+            flush(batch)
+            imported += len(batch)
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if imported:
+            conn.execute("ANALYZE warning_places")
+        cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM place_changes").fetchone()[0]
+        conn.commit()
+        conn.close()
+
+    if imported:
+        place_snapshot.expect(cursor)
+        broadcast_resync(cursor)
+
+    result = {
+        "imported": imported,
+        "duplicates": duplicates,
+        "skipped": skipped,
+        "errors": errors,
+        "cursor": cursor,
+    }
+    if aborted is not None:
+        raise ImportAborted(aborted, result)
+    return result
+
+
+def _chunked(parts: Iterable[str], size: int = BULK_READ_SIZE) -> Iterator[str]:
+    buffer: list[str] = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _export_rows(fmt: BulkFormat, rows: Iterable[sqlite3.Row]) -> Iterator[str]:
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(tuple(row))
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+    elif fmt == "ndjson":
+        for row in rows:
+            yield json.dumps(dict(row), ensure_ascii=False) + "\n"
+    else:
+        yield '{"type": "FeatureCollection", "features": [\n'
+        first = True
+        for row in rows:
+            place = dict(row)
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [place.pop("longitude"), place.pop("latitude")]},
+                "properties": place,
+            }
+            yield ("" if first else ",\n") + json.dumps(feature, ensure_ascii=False)
+            first = False
+        yield "\n]}\n"
+
+
+def export_places(fmt: BulkFormat, db_path: str = DB_PATH) -> Iterator[str]:
+    """커서를 그대로 순회하므로 테이블 크기와 무관하게 메모리 사용량 일정"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM warning_places ORDER BY id")
+        yield from _chunked(_export_rows(fmt, rows))
+    finally:
+        conn.close()
+
+
+@router.post("/import")
+async def bulk_import_places(
+    file: UploadFile = File(...),
+    format: BulkFormat = Query(..., description="csv, geojson, ndjson"),
+    type: PlaceType | None = Query(None, description="모든 행에 적용할 타입 (없으면 행의 type 사용)"),
+    user_id: int | None = Query(None, description="제보자로 기록할 사용자 ID"),
+    dedupe_radius: float = Query(BULK_DEDUPE_RADIUS_METERS, ge=0, description="중복으로 볼 반경 (미터, 0이면 끔)"),
+) -> dict:
+    """
+    장애물 대량 임포트 (공공 데이터 등)
+    업로드 파일을 스트리밍으로 읽어 청크 단위로 삽입
+    """
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        result = await run_in_threadpool(import_places, stream, format, type, user_id, dedupe_radius)
+    except ImportAborted as e:
+        # 앞부분은 이미 반영됐으므로 몇 건이 들어갔는지 함께 알려줌
+        raise HTTPException(status_code=400, detail={"message": f"Invalid {format} data: {e}", **e.result})
+    except (ValueError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {format} data: {e}")
+    except sqlite3.OperationalError as e:
+        print(f"[DB Error] bulk_import: {e}")
+        raise HTTPException(status_code=500, detail=f"Database operational error: {e}")
+    finally:
+        stream.detach()
+
+    return {"message": "Bulk import completed", **result}
+
+
+@router.get("/export")
+def bulk_export_places(
+    format: BulkFormat = Query("ndjson", description="csv, geojson, ndjson"),
+) -> StreamingResponse:
+    """전체 장애물 스냅샷을 스트리밍으로 내보냄"""
+    return StreamingResponse(
+        export_places(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="warning_places.{format}"'},
+    )
+
+
+def _detect_format(path: Path) -> BulkFormat:
+    suffix = path.suffix.lower().lstrip(".")
+    if suffix == "json":
+        return "geojson"
+    if suffix == "jsonl":
+        return "ndjson"
+    if suffix not in READERS:
+        raise SystemExit(f"Cannot detect format from {path.name}, use --format")
+    return suffix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="warning_places 대량 임포트/익스포트")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("path", type=Path)
+    import_parser.add_argument("--format", choices=list(READERS))
+    import_parser.add_argument("--type", choices=PLACE_TYPES)
+    import_parser.add_argument("--user-id", type=int)
+    import_parser.add_argument("--dedupe-radius", type=float, default=BULK_DEDUPE_RADIUS_METERS)
+
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("path", type=Path)
+    export_parser.add_argument("--format", choices=list(READERS))
+
+    args = parser.parse_args()
+    init_db()
+    fmt = args.format or _detect_format(args.path)
+
+    if args.command == "import":
+        with args.path.open(encoding="utf-8-sig", newline="") as f:
+            try:
+                result = import_places(f, fmt, args.type, args.user_id, args.dedupe_radius)
+            except ImportAborted as e:
+                print(json.dumps({"aborted": str(e), **e.result}, ensure_ascii=False, indent=2))
+                raise SystemExit(1)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        with args.path.open("w", encoding="utf-8", newline="") as f:
+            for chunk in export_places(fmt):
+                f.write(chunk)
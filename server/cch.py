@@ -0,0 +1,559 @@
+"""
+CCH (Customizable Contraction Hierarchies)
+
+- 준비 (비용과 무관): 좌표 기반 중첩 분할(nested dissection)로 노드 순서를 정하고,
+  순서대로 노드를 없애며 생기는 지름길(shortcut)을 모두 추가해 상향 그래프를 만듦
+- 커스터마이징 (비용 반영): 아래쪽 삼각형 (x, u, v)마다 u-x-v가 u-v보다 짧으면 갱신
+- 부분 커스터마이징: 비용이 바뀐 구간의 호(arc)와 그 호에 기대는 위쪽 호만 다시 계산
+- 질의: 출발/도착 노드에서 제거 트리(elimination tree) 조상만 따라 올라가며 완화, 우선순위 큐 없음
+
+노드 번호는 모두 순위(rank) 기준이라 "위쪽" = 번호가 큼
+호 a는 낮은 노드 → heads[a] 방향이 up_weights[a], 반대 방향이 down_weights[a]
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable
+
+# 이 크기 이하 조각은 더 나누지 않음
+LEAF_SIZE = 8
+# 분할 방향 (동, 북, 북동, 남동)
+SPLIT_DIRECTIONS = ((1.0, 0.0), (0.0, 1.0), (1.0, 1.0), (1.0, -1.0))
+# 순위 기준 노드 번호가 없음을 나타냄 (제거 트리 뿌리, 원래 구간인 호)
+NONE = -1
+
+# 구간 id -> 현재 비용 (math.inf면 지나갈 수 없음)
+EdgeCost = Callable[[int], float]
+
+
+def _zeros(typecode: str, size: int) -> array:
+    return array(typecode, bytes(size * array(typecode).itemsize))
+
+
+def nested_dissection_order(lat, lng, offsets, targets) -> array:
+    """
+    노드 순서 (순위 -> 노드)
+    좌표를 여러 방향으로 반씩 나눠 경계 노드(분리자)가 가장 적은 쪽을 고르고,
+    두 조각을 먼저 번호 매긴 뒤 분리자를 가장 높은 순위에 둠
+    """
+    count = len(lat)
+    if count == 0:
+        return array("i")
+    mid_lat = math.radians(sum(lat) / count)
+    ys = [value * 111320 for value in lat]
+    xs = [value * 111320 * math.cos(mid_lat) for value in lng]
+    neighbors = [targets[offsets[node]:offsets[node + 1]] for node in range(count)]
+
+    side = _zeros("i", count)
+    stamp = 0
+    order = array("i")
+    # (노드 목록, 분리자) 스택, 분리자는 두 조각을 다 처리한 뒤 순서에 붙음
+    stack: list[tuple[list[int] | None, list[int] | None]] = [(list(range(count)), None)]
+    while stack:
+        nodes, separator = stack.pop()
+        if nodes is None:
+            order.extend(separator)
+            continue
+        if len(nodes) <= LEAF_SIZE:
+            order.extend(nodes)
+            continue
+
+        best = None
+        for dx, dy in SPLIT_DIRECTIONS:
+            ranked = sorted(nodes, key=lambda node: xs[node] * dx + ys[node] * dy)
+            half = len(ranked) // 2
+            left, right = ranked[:half], ranked[half:]
+            stamp += 2
+            for node in left:
+                side[node] = stamp
+            for node in right:
+                side[node] = stamp + 1
+            left_border = [node for node in left if any(side[other] == stamp + 1 for other in neighbors[node])]
+            right_border = [node for node in right if any(side[other] == stamp for other in neighbors[node])]
+            if len(left_border) <= len(right_border):
+                candidate = (len(left_border), left, right, left_border, True)
+            else:
+                candidate = (len(right_border), left, right, right_border, False)
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+            if best[0] == 0:
+                break
+
+        _, left, right, border, border_on_left = best
+        stamp += 2
+        for node in border:
+            side[node] = stamp
+        if border_on_left:
+            left = [node for node in left if side[node] != stamp]
+        else:
+            right = [node for node in right if side[node] != stamp]
+        stack.append((None, border))
+        stack.append((right, None))
+        stack.append((left, None))
+
+    return order
+
+
+def _tight(via: float, current: float) -> bool:
+    # 가중치는 float32로 저장되므로 반올림 오차만큼 여유를 둠
+    return via <= current * (1 + 1e-6) + 1e-6
+
+
+class ContractionHierarchy:
+    """
+    노드 순서와 지름길 구조(비용과 무관)에 구간 비용을 입힌 것
+    update/query는 호출하는 쪽에서 한 번에 하나씩만 부름 (routing의 graph.lock)
+    """
+
+    ARRAYS = (
+        "order", "ranks", "parents", "up_offsets", "heads", "down_offsets", "down_tails", "down_arcs",
+        "arc_edge_offsets", "arc_edges", "edge_arcs", "up_weights", "down_weights", "up_mids", "down_mids",
+        "up_pruned", "down_pruned",
+    )
+
+    def __init__(self, **arrays):
+        # order: 순위 -> 노드, ranks: 노드 -> 순위, parents: 제거 트리 부모
+        # heads[up_offsets[r]:up_offsets[r + 1]]: 순위 r에서 올라가는 호의 머리 (오름차순)
+        # down_tails/down_arcs[down_offsets[r]:...]: 순위 r로 올라오는 호의 꼬리와 호 id (꼬리 오름차순)
+        # arc_edges[arc_edge_offsets[a]:...]: 호 a에 해당하는 원래 구간 (올라가는 방향이면 e, 내려가면 ~e)
+        # edge_arcs: 원래 구간 -> 호
+        # up_mids/down_mids: 지름길이 거쳐 가는 아래쪽 노드, NONE이면 원래 구간
+        # up_pruned/down_pruned: 더 위의 노드를 거쳐도 같은 비용이라 질의에서 건너뛰는 호
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        # 질의용 (머리, 비용, 호) 목록, 노드를 처음 지날 때 만들고 비용이 바뀌면 버림
+        self._upward: list[list[tuple[int, float, int]] | None] = [None] * len(self.order)
+        self._downward: list[list[tuple[int, float, int]] | None] = [None] * len(self.order)
+        # 질의 중 거리/직전 호 (질의가 끝나면 거리는 inf로 되돌림)
+        self._forward = [math.inf] * len(self.order)
+        self._backward = [math.inf] * len(self.order)
+        self._forward_via = [NONE] * len(self.order)
+        self._backward_via = [NONE] * len(self.order)
+
+    @property
+    def arc_count(self) -> int:
+        return len(self.heads)
+
+    def arrays(self) -> dict[str, array]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def build(cls, lat, lng, offsets, targets, cost: EdgeCost) -> "ContractionHierarchy":
+        order = nested_dissection_order(lat, lng, offsets, targets)
+        count = len(order)
+        ranks = _zeros("i", count)
+        for rank, node in enumerate(order):
+            ranks[node] = rank
+
+        # 순위 순서로 노드를 없애며, 남은 위쪽 이웃끼리 모두 잇는 지름길을 부모(가장 낮은 위쪽 이웃)에 넘김
+        upward: list[set[int] | None] = [set() for _ in range(count)]
+        for node in range(count):
+            low = ranks[node]
+            for edge in range(offsets[node], offsets[node + 1]):
+                high = ranks[targets[edge]]
+                if low < high:
+                    upward[low].add(high)
+                elif high < low:
+                    upward[high].add(low)
+        parents = array("i", [NONE]) * count
+        for rank in range(count):
+            above = upward[rank]
+            if above:
+                parent = min(above)
+                parents[rank] = parent
+                upward[parent].update(above)
+                upward[parent].discard(parent)
+
+        up_offsets = _zeros("i", count + 1)
+        heads = array("i")
+        for rank in range(count):
+            heads.extend(sorted(upward[rank]))
+            up_offsets[rank + 1] = len(heads)
+            upward[rank] = None
+        arc_count = len(heads)
+
+        incoming: list[list[tuple[int, int]]] = [[] for _ in range(count)]
+        for rank in range(count):
+            for arc in range(up_offsets[rank], up_offsets[rank + 1]):
+                incoming[heads[arc]].append((rank, arc))
+        down_offsets = _zeros("i", count + 1)
+        down_tails, down_arcs = array("i"), array("i")
+        for rank in range(count):
+            for tail, arc in incoming[rank]:
+                down_tails.append(tail)
+                down_arcs.append(arc)
+            down_offsets[rank + 1] = len(down_arcs)
+        del incoming
+
+        hierarchy = cls(
+            order=order, ranks=ranks, parents=parents, up_offsets=up_offsets, heads=heads,
+            down_offsets=down_offsets, down_tails=down_tails, down_arcs=down_arcs,
+            arc_edge_offsets=_zeros("i", arc_count + 1), arc_edges=array("i"), edge_arcs=_zeros("i", len(targets)),
+            up_weights=_zeros("f", arc_count), down_weights=_zeros("f", arc_count),
+            up_mids=_zeros("i", arc_count), down_mids=_zeros("i", arc_count),
+            up_pruned=_zeros("B", arc_count), down_pruned=_zeros("B", arc_count),
+        )
+
+        # 원래 구간을 호에 배정 (호마다 묶어서 CSR로)
+        per_arc: list[list[int]] = [[] for _ in range(arc_count)]
+        for node in range(count):
+            low = ranks[node]
+            for edge in range(offsets[node], offsets[node + 1]):
+                high = ranks[targets[edge]]
+                if low == high:
+                    continue
+                if low < high:
+                    arc = hierarchy.find_arc(low, high)
+                    per_arc[arc].append(edge)
+                else:
+                    arc = hierarchy.find_arc(high, low)
+                    per_arc[arc].append(~edge)
+                hierarchy.edge_arcs[edge] = arc
+        for arc, edges in enumerate(per_arc):
+            hierarchy.arc_edges.extend(edges)
+            hierarchy.arc_edge_offsets[arc + 1] = len(hierarchy.arc_edges)
+        del per_arc
+
+        hierarchy.customize(cost)
+        return hierarchy
+
+    def find_arc(self, low: int, high: int) -> int:
+        start, end = self.up_offsets[low], self.up_offsets[low + 1]
+        arc = bisect_left(self.heads, high, start, end)
+        if arc == end or self.heads[arc] != high:
+            raise KeyError((low, high))
+        return arc
+
+    def tail_of(self, arc: int) -> int:
+        return bisect_right(self.up_offsets, arc) - 1
+
+    def _input_weights(self, arc: int, cost: EdgeCost) -> tuple[float, float]:
+        up = down = math.inf
+        for signed in self.arc_edges[self.arc_edge_offsets[arc]:self.arc_edge_offsets[arc + 1]]:
+            if signed >= 0:
+                up = min(up, cost(signed))
+            else:
+                down = min(down, cost(~signed))
+        return up, down
+
+    def customize(self, cost: EdgeCost) -> None:
+        """
+        전체 커스터마이징: 모든 아래쪽 삼각형을 순위 순서로 한 번씩 봄
+        끝난 뒤 같은 삼각형을 한 번 더 돌며, 중간 노드를 거쳐도 비용이 같은 호를 질의에서 뺌
+        """
+        heads, up_offsets = self.heads, self.up_offsets
+        up_weights, down_weights = self.up_weights, self.down_weights
+        up_mids, down_mids = self.up_mids, self.down_mids
+        up_pruned, down_pruned = self.up_pruned, self.down_pruned
+        for arc in range(self.arc_count):
+            up_weights[arc], down_weights[arc] = self._input_weights(arc, cost)
+            up_mids[arc] = down_mids[arc] = NONE
+
+        for low in range(len(self.order)):
+            start, end = up_offsets[low], up_offsets[low + 1]
+            for first in range(start, end):
+                middle = heads[first]
+                to_low, from_low = down_weights[first], up_weights[first]
+                cursor = up_offsets[middle]
+                for second in range(first + 1, end):
+                    high = heads[second]
+                    # 위쪽 이웃끼리는 반드시 호가 있으므로 병합하듯 앞으로만 찾음
+                    while heads[cursor] != high:
+                        cursor += 1
+                    # middle -> low -> high
+                    candidate = to_low + up_weights[second]
+                    if candidate < up_weights[cursor]:
+                        up_weights[cursor] = candidate
+                        up_mids[cursor] = low
+                    # high -> low -> middle
+                    candidate = down_weights[second] + from_low
+                    if candidate < down_weights[cursor]:
+                        down_weights[cursor] = candidate
+                        down_mids[cursor] = low
+
+        for arc in range(self.arc_count):
+            up_pruned[arc] = up_weights[arc] == math.inf
+            down_pruned[arc] = down_weights[arc] == math.inf
+        for low in range(len(self.order)):
+            start, end = up_offsets[low], up_offsets[low + 1]
+            for first in range(start, end):
+                middle = heads[first]
+                from_low, to_low = up_weights[first], down_weights[first]
+                cursor = up_offsets[middle]
+                for second in range(first + 1, end):
+                    high = heads[second]
+                    while heads[cursor] != high:
+                        cursor += 1
+                    # low -> middle -> high가 low -> high만큼 짧으면 질의는 middle을 거쳐도 됨
+                    if _tight(from_low + up_weights[cursor], up_weights[second]):
+                        up_pruned[second] = 1
+                    if _tight(down_weights[cursor] + to_low, down_weights[second]):
+                        down_pruned[second] = 1
+
+        self._upward = [None] * len(self.order)
+        self._downward = [None] * len(self.order)
+
+    def _recompute(self, arc: int, low: int, high: int, cost: EdgeCost) -> tuple[float, int, float, int]:
+        """호 하나의 비용을 원래 구간과 아래쪽 삼각형에서 처음부터 다시 계산 (비용이 늘어날 때도 맞도록)"""
+        up, down = self._input_weights(arc, cost)
+        up_mid = down_mid = NONE
+        down_tails, down_arcs = self.down_tails, self.down_arcs
+        up_weights, down_weights = self.up_weights, self.down_weights
+
+        # low와 high 둘 다로 올라오는 아래쪽 노드 (꼬리가 정렬돼 있으므로 병합)
+        i, i_end = self.down_offsets[low], self.down_offsets[low + 1]
+        j, j_end = self.down_offsets[high], self.down_offsets[high + 1]
+        while i < i_end and j < j_end:
+            a, b = down_tails[i], down_tails[j]
+            if a < b:
+                i += 1
+            elif b < a:
+                j += 1
+            else:
+                to_low, to_high = down_arcs[i], down_arcs[j]
+                candidate = down_weights[to_low] + up_weights[to_high]
+                if candidate < up:
+                    up, up_mid = candidate, a
+                candidate = down_weights[to_high] + up_weights[to_low]
+                if candidate < down:
+                    down, down_mid = candidate, a
+                i += 1
+                j += 1
+        return up, up_mid, down, down_mid
+
+    def _still_pruned(self, arc: int) -> tuple[bool, bool]:
+        """건너뛰던 호가 여전히 중간 노드를 거치는 경로로 대신할 수 있는지 (올라가는 방향, 내려가는 방향)"""
+        heads, down_tails, down_arcs = self.heads, self.down_tails, self.down_arcs
+        up_weights, down_weights = self.up_weights, self.down_weights
+        low, high = self.tail_of(arc), heads[arc]
+        up_ok = up_weights[arc] == math.inf
+        down_ok = down_weights[arc] == math.inf
+
+        # low의 위쪽 이웃 중 high보다 낮은 것(= arc 앞쪽) ∩ high의 아래쪽 이웃
+        i = self.up_offsets[low]
+        j, j_end = self.down_offsets[high], self.down_offsets[high + 1]
+        while i < arc and j < j_end and not (up_ok and down_ok):
+            a, b = heads[i], down_tails[j]
+            if a < b:
+                i += 1
+            elif b < a:
+                j += 1
+            else:
+                upper = down_arcs[j]
+                up_ok = up_ok or _tight(up_weights[i] + up_weights[upper], up_weights[arc])
+                down_ok = down_ok or _tight(down_weights[upper] + down_weights[i], down_weights[arc])
+                i += 1
+                j += 1
+        return up_ok, down_ok
+
+    def update(self, edges: list[int], cost: EdgeCost) -> int:
+        """
+        비용이 바뀐 구간만 부분 커스터마이징, 다시 계산한 호 수 반환
+        호 (low, high)가 바뀌면 low의 다른 위쪽 이웃 z와 high 사이 호만 영향을 받으므로
+        아래쪽 끝 순위 순서로 퍼뜨림
+        질의에서 건너뛰던 호는 대신하던 경로가 길어졌으면 다시 살림 (새로 건너뛰는 호는 전체 커스터마이징 때만 정함)
+        """
+        heads, up_offsets = self.heads, self.up_offsets
+        up_weights, down_weights = self.up_weights, self.down_weights
+        up_pruned, down_pruned = self.up_pruned, self.down_pruned
+        queue: list[tuple[int, int]] = []
+        queued: set[int] = set()
+        for edge in edges:
+            arc = self.edge_arcs[edge]
+            if arc not in queued:
+                queued.add(arc)
+                queue.append((self.tail_of(arc), arc))
+        heapq.heapify(queue)
+
+        recomputed = 0
+        changed_tails: set[int] = set()
+        recheck: set[int] = set()
+        while queue:
+            low, arc = heapq.heappop(queue)
+            queued.discard(arc)
+            high = heads[arc]
+            up, up_mid, down, down_mid = self._recompute(arc, low, high, cost)
+            recomputed += 1
+            old_up, old_down = up_weights[arc], down_weights[arc]
+            up_weights[arc], down_weights[arc] = up, down
+            self.up_mids[arc], self.down_mids[arc] = up_mid, down_mid
+            new_up, new_down = up_weights[arc], down_weights[arc]
+            if new_up == old_up and new_down == old_down:
+                continue
+
+            changed_tails.add(low)
+            up_changed, down_changed = new_up != old_up, new_down != old_down
+            if (new_up < old_up or new_down < old_down) and (up_pruned[arc] or down_pruned[arc]):
+                recheck.add(arc)
+
+            # high와 low의 다른 위쪽 이웃 peer 사이 호 (peer가 낮으면 high로 올라오는 호, 높으면 high에서 올라가는 호)
+            down_tails, down_arcs = self.down_tails, self.down_arcs
+            below, above = self.down_offsets[high], up_offsets[high]
+            for other in range(up_offsets[low], up_offsets[low + 1]):
+                peer = heads[other]
+                if peer == high:
+                    continue
+                if peer < high:
+                    while down_tails[below] != peer:
+                        below += 1
+                    dependent = down_arcs[below]
+                    current_out, current_in = down_weights[dependent], up_weights[dependent]
+                else:
+                    while heads[above] != peer:
+                        above += 1
+                    dependent = above
+                    current_out, current_in = up_weights[dependent], down_weights[dependent]
+                    # low -> high -> peer 로 대신하던 호 (low, peer), 그 삼각형이 최단이었는데 길어졌으면 다시 확인
+                    if (
+                        (up_pruned[other] and new_up > old_up and _tight(old_up + current_out, up_weights[other]))
+                        or (down_pruned[other] and new_down > old_down and _tight(current_in + old_down, down_weights[other]))
+                    ):
+                        recheck.add(other)
+
+                # high -> low -> peer, peer -> low -> high 경로가 더 짧아졌거나, 최단이었는데 길어진 경우만 다시 계산
+                affected = False
+                if down_changed:
+                    out = up_weights[other]
+                    affected = new_down + out < current_out or (new_down > old_down and _tight(old_down + out, current_out))
+                if up_changed and not affected:
+                    into = down_weights[other]
+                    affected = into + new_up < current_in or (new_up > old_up and _tight(into + old_up, current_in))
+                if not affected:
+                    continue
+                if dependent not in queued:
+                    queued.add(dependent)
+                    heapq.heappush(queue, (min(high, peer), dependent))
+
+            if new_up > old_up or new_down > old_down:
+                # lower -> low -> high 로 대신하던 호 (lower, high)
+                i, i_end = self.down_offsets[low], self.down_offsets[low + 1]
+                j, j_end = self.down_offsets[high], self.down_offsets[high + 1]
+                while i < i_end and j < j_end:
+                    a, b = down_tails[i], down_tails[j]
+                    if a < b:
+                        i += 1
+                    elif b < a:
+                        j += 1
+                    else:
+                        part, target = down_arcs[i], down_arcs[j]
+                        if (
+                            (up_pruned[target] and new_up > old_up and _tight(up_weights[part] + old_up, up_weights[target]))
+                            or (down_pruned[target] and new_down > old_down and _tight(old_down + down_weights[part], down_weights[target]))
+                        ):
+                            recheck.add(target)
+                        i += 1
+                        j += 1
+
+        for arc in recheck:
+            up_ok, down_ok = self._still_pruned(arc)
+            if (up_pruned[arc] and not up_ok) or (down_pruned[arc] and not down_ok):
+                up_pruned[arc] = up_pruned[arc] and up_ok
+                down_pruned[arc] = down_pruned[arc] and down_ok
+                changed_tails.add(self.tail_of(arc))
+        for tail in changed_tails:
+            self._upward[tail] = self._downward[tail] = None
+        return recomputed
+
+    def _query_arcs(self, node: int, upward: bool) -> list[tuple[int, float, int]]:
+        start, end = self.up_offsets[node], self.up_offsets[node + 1]
+        heads = self.heads
+        if upward:
+            weights, pruned = self.up_weights, self.up_pruned
+        else:
+            weights, pruned = self.down_weights, self.down_pruned
+        arcs = [(heads[arc], weights[arc], arc) for arc in range(start, end) if not pruned[arc]]
+        (self._upward if upward else self._downward)[node] = arcs
+        return arcs
+
+    def query(self, source: int, target: int) -> tuple[float, list[tuple[int, bool]]]:
+        """
+        (비용, 호 경로) 반환, 경로가 없으면 비용이 inf
+        호 경로는 (호, 올라가는 방향인지) 목록이고 unpack으로 원래 구간으로 풂
+        """
+        parents, upward, downward = self.parents, self._upward, self._downward
+        forward, backward = self._forward, self._backward
+        forward_via, backward_via = self._forward_via, self._backward_via
+        source, target = self.ranks[source], self.ranks[target]
+        forward[source] = backward[target] = 0.0
+        forward_node, backward_node = source, target
+        best, meeting = math.inf, NONE
+        top = len(self.order)
+
+        # 두 조상 사슬을 순위 순서로 함께 올라감, 공통 조상에서만 만날 수 있음
+        # 이미 찾은 경로보다 먼 노드에서는 더 퍼뜨리지 않음
+        while forward_node != NONE or backward_node != NONE:
+            f = forward_node if forward_node != NONE else top
+            b = backward_node if backward_node != NONE else top
+            node = f if f < b else b
+            if f == b:
+                total = forward[node] + backward[node]
+                if total < best:
+                    best, meeting = total, node
+            if f == node:
+                distance = forward[node]
+                if distance < best:
+                    for head, weight, arc in upward[node] or self._query_arcs(node, True):
+                        candidate = distance + weight
+                        if candidate < forward[head]:
+                            forward[head] = candidate
+                            forward_via[head] = arc
+                forward_node = parents[node]
+            if b == node:
+                distance = backward[node]
+                if distance < best:
+                    for head, weight, arc in downward[node] or self._query_arcs(node, False):
+                        candidate = distance + weight
+                        if candidate < backward[head]:
+                            backward[head] = candidate
+                            backward_via[head] = arc
+                backward_node = parents[node]
+
+        path: list[tuple[int, bool]] = []
+        if meeting != NONE:
+            node = meeting
+            while node != source:
+                arc = forward_via[node]
+                path.append((arc, True))
+                node = self.tail_of(arc)
+            path.reverse()
+            node = meeting
+            while node != target:
+                arc = backward_via[node]
+                path.append((arc, False))
+                node = self.tail_of(arc)
+
+        # 올라가며 바꾼 거리는 모두 두 조상 사슬 위에 있으므로 그것만 되돌림
+        for node in (source, target):
+            while node != NONE:
+                forward[node] = backward[node] = math.inf
+                node = parents[node]
+        return best, path
+
+    def unpack(self, path: list[tuple[int, bool]], cost: EdgeCost) -> list[int]:
+        """호 경로를 원래 구간 목록으로 풂 (지름길은 거쳐 가는 노드의 두 호로 재귀적으로 나눔)"""
+        edges: list[int] = []
+        stack = list(reversed(path))
+        while stack:
+            arc, upward = stack.pop()
+            mid = self.up_mids[arc] if upward else self.down_mids[arc]
+            if mid == NONE:
+                best_edge, best_cost = NONE, math.inf
+                for signed in self.arc_edges[self.arc_edge_offsets[arc]:self.arc_edge_offsets[arc + 1]]:
+                    if (signed >= 0) == upward:
+                        edge = signed if upward else ~signed
+                        edge_cost = cost(edge)
+                        if best_edge == NONE or edge_cost < best_cost:
+                            best_edge, best_cost = edge, edge_cost
+                edges.append(best_edge)
+                continue
+            low, high = self.tail_of(arc), self.heads[arc]
+            to_low, to_high = self.find_arc(mid, low), self.find_arc(mid, high)
+            if upward:
+                # low -> mid -> high, 스택이라 뒤쪽부터 넣음
+                stack.append((to_high, True))
+                stack.append((to_low, False))
+            else:
+                stack.append((to_low, True))
+                stack.append((to_high, False))
+        return edges
@@ -1,6 +1,9 @@
 import os
 import sqlite3
-from typing import Generator
+import time
+from typing import Callable, Generator
+
+from metrics import db_connections_open, db_connections_opened, db_query_duration
 
 DB_PATH = os.getenv("DB_PATH", "app.db")
 
@@ -8,6 +11,8 @@ DB_PATH = os.getenv("DB_PATH", "app.db")
 def init_db() -> None:
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     try:
+        # 여러 워커 프로세스가 같은 파일을 쓸 때 읽기가 쓰기를 기다리지 않도록
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,7 +39,9 @@ def init_db() -> None:
                 description TEXT NOT NULL,
                 type TEXT DEFAULT 'Stuff',
                 has_image INTEGER DEFAULT 0,
+                image_hash TEXT,
                 verification_count INTEGER DEFAULT 0,
+                duplicate_of INTEGER REFERENCES warning_places(id),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
@@ -42,6 +49,13 @@ def init_db() -> None:
             CREATE INDEX IF NOT EXISTS idx_warning_places_coords
                 ON warning_places(latitude, longitude);
 
+            CREATE TABLE IF NOT EXISTS place_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                place_id INTEGER REFERENCES warning_places(id),
+                change_type TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
             CREATE TABLE IF NOT EXISTS verifications (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER REFERENCES users(id),
@@ -57,6 +71,26 @@ def init_db() -> None:
                 earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 PRIMARY KEY (user_id, badge_name)
             );
+
+            -- scope: all / week:YYYY-Www / month:YYYY-MM / area:row:col
+            CREATE TABLE IF NOT EXISTS leaderboard_scores (
+                scope TEXT NOT NULL,
+                user_id INTEGER REFERENCES users(id),
+                score INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, user_id)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_scores_rank
+                ON leaderboard_scores(scope, score DESC, user_id);
+
+            CREATE TABLE IF NOT EXISTS oauth_states (
+                state TEXT PRIMARY KEY,
+                redirect_uri TEXT,
+                expires_at REAL NOT NULL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_oauth_states_expires
+                ON oauth_states(expires_at);
         """)
 
         # 기존 테이블에 누락된 컬럼 추가 (마이그레이션)
@@ -67,7 +101,9 @@ def init_db() -> None:
             ("users", "last_report_date", "TEXT"),
             ("warning_places", "type", "TEXT DEFAULT 'Stuff'"),
             ("warning_places", "has_image", "INTEGER DEFAULT 0"),
+            ("warning_places", "image_hash", "TEXT"),
             ("warning_places", "verification_count", "INTEGER DEFAULT 0"),
+            ("warning_places", "duplicate_of", "INTEGER REFERENCES warning_places(id)"),
         ]
 
         for table, column, col_type in migrations:
@@ -75,14 +111,67 @@ def init_db() -> None:
                 conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
             except sqlite3.OperationalError:
                 pass  # 이미 존재함
+
+        # 변경 로그가 생기기 전의 장소들을 초기 커서에 포함
+        has_changes = conn.execute("SELECT 1 FROM place_changes LIMIT 1").fetchone()
+        if has_changes is None:
+            conn.execute(
+                """INSERT INTO place_changes (place_id, change_type)
+                   SELECT id, 'add' FROM warning_places ORDER BY id"""
+            )
         conn.commit()
     finally:
         conn.close()
 
 
+def _statement_kind(sql: str) -> str:
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    문장 종류(SELECT/INSERT/...)별 실행 시간을 기록하는 연결
+    커밋된 뒤에만 실행할 후속 작업(이벤트 발행 등)을 모아둘 수 있음
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._after_commit: list[Callable[[], None]] = []
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """다음 커밋이 성공하면 실행, 롤백되면 버림"""
+        self._after_commit.append(callback)
+
+    def commit(self) -> None:
+        super().commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self) -> None:
+        super().rollback()
+        self._after_commit.clear()
+
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            db_query_duration.observe(time.perf_counter() - started, statement=_statement_kind(sql))
+
+    def executemany(self, sql: str, parameters, /) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            db_query_duration.observe(time.perf_counter() - started, statement=_statement_kind(sql))
+
+
 def get_db() -> Generator[sqlite3.Connection, None, None]:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
+    db_connections_opened.inc()
+    db_connections_open.inc()
     try:
         yield conn
         conn.commit()
@@ -91,3 +180,4 @@ def get_db() -> Generator[sqlite3.Connection, None, None]:
         raise
     finally:
         conn.close()
+        db_connections_open.dec()
@@ -1,19 +1,24 @@
 import os
-import math
 from typing import Literal
 
 import httpx
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import sqlite3
 
 from db import get_db
+from routing import ROUTING_WALKING_SPEED, LocalRoute, NoRoute, find_route
+from snapshot import fetch_places, place_snapshot
+from tracing import span
+from upstream import get_guard
 
 
 router = APIRouter(prefix="/directions", tags=["directions"])
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-DIRECTIONS_API_URL = "https://maps.googleapis.com/maps/api/directions/json"
+GOOGLE_MAPS_API_BASE = os.getenv("GOOGLE_MAPS_API_BASE", "https://maps.googleapis.com").rstrip("/")
+DIRECTIONS_API_URL = f"{GOOGLE_MAPS_API_BASE}/maps/api/directions/json"
 
 # 경로에서 장애물까지의 거리 임계값 (미터)
 OBSTACLE_DETECTION_RADIUS = 15
@@ -26,6 +31,9 @@ class DirectionsRequest(BaseModel):
     destination_longitude: float
     avoid_obstacles: bool = True
     language: str = "ko"
+    # google: Google Directions 경로 중 장애물이 적은 것을 고름
+    # local: 내장 OSM 보행 그래프에서 장애물 구간을 피해서 탐색 (ROUTING_OSM_PATH 필요)
+    engine: Literal["google", "local"] = "google"
 
 
 class PlaceDirectionsRequest(BaseModel):
@@ -36,47 +44,7 @@ class PlaceDirectionsRequest(BaseModel):
     language: str = "ko"
 
 
-def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """두 좌표 사이의 거리를 미터로 계산"""
-    R = 6371000  # 지구 반지름 (미터)
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-
-    a = math.sin(delta_phi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    return R * c
-
-
-def _point_to_segment_distance(
-    px: float, py: float,
-    ax: float, ay: float,
-    bx: float, by: float
-) -> float:
-    """점 P에서 선분 AB까지의 최단 거리 (미터)"""
-    # 벡터 AB, AP
-    ab_x, ab_y = bx - ax, by - ay
-    ap_x, ap_y = px - ax, py - ay
-
-    ab_len_sq = ab_x * ab_x + ab_y * ab_y
-
-    if ab_len_sq == 0:
-        return _haversine_distance(px, py, ax, ay)
-
-    # 투영 비율 t (0~1 사이면 선분 위)
-    t = max(0, min(1, (ap_x * ab_x + ap_y * ab_y) / ab_len_sq))
-
-    # 선분 위 가장 가까운 점
-    closest_x = ax + t * ab_x
-    closest_y = ay + t * ab_y
-
-    return _haversine_distance(px, py, closest_x, closest_y)
-
-
-def _decode_polyline(polyline_str: str) -> list[tuple[float, float]]:
+def decode_polyline(polyline_str: str) -> list[tuple[float, float]]:
     """Google Polyline 디코딩"""
     index, lat, lng = 0, 0, 0
     coordinates = []
@@ -109,6 +77,22 @@ def _decode_polyline(polyline_str: str) -> list[tuple[float, float]]:
     return coordinates
 
 
+def encode_polyline(points: list[tuple[float, float]]) -> str:
+    """Google Polyline 인코딩"""
+    result = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_e5, lng_e5 = round(lat * 1e5), round(lng * 1e5)
+        for delta in (lat_e5 - prev_lat, lng_e5 - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lng = lat_e5, lng_e5
+    return "".join(result)
+
+
 def _get_obstacles_near_route(
     db: sqlite3.Connection,
     route_points: list[tuple[float, float]],
@@ -118,52 +102,28 @@ def _get_obstacles_near_route(
     if not route_points:
         return []
 
-    # 경로의 bounding box 계산 (여유분 추가)
-    lats = [p[0] for p in route_points]
-    lngs = [p[1] for p in route_points]
-    margin = 0.002  # 약 200m 여유
-
-    min_lat, max_lat = min(lats) - margin, max(lats) + margin
-    min_lng, max_lng = min(lngs) - margin, max(lngs) + margin
-
-    # DB에서 해당 영역의 장애물 조회
-    rows = db.execute(
-        """SELECT id, latitude, longitude, type, name, description
-           FROM warning_places
-           WHERE latitude >= ? AND latitude <= ?
-           AND longitude >= ? AND longitude <= ?""",
-        (min_lat, max_lat, min_lng, max_lng)
-    ).fetchall()
-
-    obstacles_on_route = []
-
-    for row in rows:
-        obs_lat, obs_lng = row["latitude"], row["longitude"]
-
-        # 각 경로 세그먼트와의 거리 확인
-        for i in range(len(route_points) - 1):
-            p1 = route_points[i]
-            p2 = route_points[i + 1]
-
-            distance = _point_to_segment_distance(
-                obs_lat, obs_lng,
-                p1[0], p1[1],
-                p2[0], p2[1]
-            )
-
-            if distance <= radius:
-                obstacles_on_route.append({
-                    "id": row["id"],
-                    "latitude": obs_lat,
-                    "longitude": obs_lng,
-                    "type": row["type"],
-                    "name": row["name"],
-                    "description": row["description"],
-                    "distance_from_route": round(distance, 1)
-                })
-                break  # 이 장애물은 이미 추가됨
-
-    return obstacles_on_route
+    # 메모리 스냅샷에서 경로 구간 주변 셀만 확인
+    with span("directions.match_obstacles"):
+        place_snapshot.ensure(db)
+        matched = place_snapshot.near_route(route_points, radius)
+
+    # 걸린 장애물만 나머지 컬럼을 읽음
+    with span("directions.db_query"):
+        rows = fetch_places(db, "id, latitude, longitude, type, name, description", [place_id for place_id, _ in matched])
+
+    distances = dict(matched)
+    return [
+        {
+            "id": row["id"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "type": row["type"],
+            "name": row["name"],
+            "description": row["description"],
+            "distance_from_route": round(distances[row["id"]], 1),
+        }
+        for row in rows
+    ]
 
 
 async def _fetch_directions(
@@ -192,7 +152,8 @@ async def _fetch_directions(
         params["alternatives"] = "true"
 
     async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.get(DIRECTIONS_API_URL, params=params)
+        with span("directions.fetch"):
+            response = await get_guard("directions").call(lambda: client.get(DIRECTIONS_API_URL, params=params))
 
     if response.status_code != 200:
         raise HTTPException(status_code=502, detail="Google Directions API request failed")
@@ -240,6 +201,94 @@ def _parse_route(route: dict) -> dict:
     }
 
 
+def _distance_text(meters: float) -> str:
+    return f"{meters / 1000:.1f} km" if meters >= 1000 else f"{round(meters)} m"
+
+
+def _duration_text(seconds: float, language: str) -> str:
+    minutes = max(1, round(seconds / 60))
+    return f"{minutes}분" if language.startswith("ko") else f"{minutes} min" + ("s" if minutes > 1 else "")
+
+
+def _location(point: tuple[float, float]) -> dict:
+    return {"lat": point[0], "lng": point[1]}
+
+
+def _parse_local_route(route: LocalRoute, language: str) -> dict:
+    """내장 경로 탐색 결과를 _parse_route와 같은 형태로 변환"""
+    steps = []
+    for segment in route.segments:
+        if language.startswith("ko"):
+            instruction = f"{segment.name}을(를) 따라 이동" if segment.name else "보행로를 따라 이동"
+        else:
+            instruction = f"Walk along {segment.name}" if segment.name else "Walk along the path"
+        duration = segment.distance / ROUTING_WALKING_SPEED
+        steps.append({
+            "instruction": instruction,
+            "distance": _distance_text(segment.distance),
+            "distance_value": round(segment.distance),
+            "duration": _duration_text(duration, language),
+            "duration_value": round(duration),
+            "start_location": _location(route.points[segment.start]),
+            "end_location": _location(route.points[segment.end]),
+            "polyline": encode_polyline(route.points[segment.start:segment.end + 1]),
+            "maneuver": "",
+        })
+
+    named = [segment for segment in route.segments if segment.name]
+    duration = route.distance / ROUTING_WALKING_SPEED
+    return {
+        "summary": max(named, key=lambda segment: segment.distance).name if named else "",
+        "distance": _distance_text(route.distance),
+        "distance_value": round(route.distance),
+        "duration": _duration_text(duration, language),
+        "duration_value": round(duration),
+        "start_address": "",
+        "end_address": "",
+        "start_location": _location(route.points[0]),
+        "end_location": _location(route.points[-1]),
+        "steps": steps,
+        "overview_polyline": encode_polyline(route.points),
+    }
+
+
+def _local_walking_directions(req: DirectionsRequest, db: sqlite3.Connection) -> dict:
+    """내장 보행 그래프로 경로 탐색 (스레드풀에서 실행)"""
+    try:
+        with span("directions.local_route"):
+            route = find_route(
+                db,
+                (req.origin_latitude, req.origin_longitude),
+                (req.destination_latitude, req.destination_longitude),
+            )
+    except NoRoute:
+        raise HTTPException(status_code=404, detail="No route found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (RuntimeError, OSError) as e:
+        print(f"[Routing] local engine unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Local routing engine is not available")
+
+    parsed = _parse_local_route(route, req.language)
+    if req.avoid_obstacles:
+        # 막힌 구간(계단 등)은 이미 피했고, 남은 장애물(비용만 더한 것)을 알려줌
+        obstacles = _get_obstacles_near_route(db, route.points)
+    else:
+        obstacles = []
+    parsed["obstacles"] = obstacles
+    parsed["obstacle_count"] = len(obstacles)
+    parsed["is_accessible"] = len(obstacles) == 0
+    parsed["route_index"] = 0
+
+    return {
+        "message": "Directions found",
+        "engine": "local",
+        "recommended_route": parsed,
+        "alternative_routes": [],
+        "total_routes": 1,
+    }
+
+
 @router.post("/walking")
 async def get_walking_directions(
     req: DirectionsRequest,
@@ -250,7 +299,11 @@ async def get_walking_directions(
 
     - origin/destination 좌표로 경로 검색
     - avoid_obstacles=true면 경로상 장애물 감지 및 대체 경로 제안
+    - engine=local이면 Google 대신 내장 보행 그래프로 계단 등을 피한 경로 탐색
     """
+    if req.engine == "local":
+        return await run_in_threadpool(_local_walking_directions, req, db)
+
     origin = f"{req.origin_latitude},{req.origin_longitude}"
     destination = f"{req.destination_latitude},{req.destination_longitude}"
 
@@ -268,7 +321,8 @@ async def get_walking_directions(
 
         # 경로 상의 장애물 감지
         if req.avoid_obstacles:
-            polyline_points = _decode_polyline(parsed["overview_polyline"])
+            with span("directions.decode_polyline"):
+                polyline_points = decode_polyline(parsed["overview_polyline"])
             obstacles = _get_obstacles_near_route(db, polyline_points)
             parsed["obstacles"] = obstacles
             parsed["obstacle_count"] = len(obstacles)
@@ -289,6 +343,7 @@ async def get_walking_directions(
 
     return {
         "message": "Directions found",
+        "engine": "google",
         "recommended_route": recommended,
         "alternative_routes": routes[1:] if len(routes) > 1 else [],
         "total_routes": len(routes),
@@ -320,7 +375,8 @@ async def get_walking_directions_to_place(
         parsed = _parse_route(route)
 
         if req.avoid_obstacles:
-            polyline_points = _decode_polyline(parsed["overview_polyline"])
+            with span("directions.decode_polyline"):
+                polyline_points = decode_polyline(parsed["overview_polyline"])
             obstacles = _get_obstacles_near_route(db, polyline_points)
             parsed["obstacles"] = obstacles
             parsed["obstacle_count"] = len(obstacles)
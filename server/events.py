@@ -0,0 +1,324 @@
+import asyncio
+import json
+import math
+import os
+import secrets
+import sqlite3
+import threading
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+EVENT_GRID_CELL_DEGREES = float(os.getenv("EVENT_GRID_CELL_DEGREES", "0.01"))
+MAX_SUBSCRIPTION_CELLS = int(os.getenv("MAX_SUBSCRIPTION_CELLS", "400"))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# local: 변경한 요청에서 바로 전달 (단일 프로세스)
+# changelog: place_changes를 폴링해서 전달 (여러 워커가 같은 DB를 쓸 때)
+EVENT_SOURCE = os.getenv("EVENT_SOURCE", "local")
+EVENT_POLL_INTERVAL_SECONDS = float(os.getenv("EVENT_POLL_INTERVAL_SECONDS", "0.25"))
+# 한 번에 이보다 많이 밀려 있으면 개별 이벤트 대신 resync
+EVENT_POLL_BATCH = 500
+
+PlaceType = Literal["Stuff", "Stair", "EV"]
+EventType = Literal["add_place", "image", "verify"]
+
+# place_changes.change_type -> 이벤트 이름
+CHANGE_EVENTS: dict[str, EventType] = {"add": "add_place", "image": "image", "verify": "verify"}
+
+
+class RequestUpdateSubscription(BaseModel):
+    sw_latitude: float
+    sw_longitude: float
+    ne_latitude: float
+    ne_longitude: float
+    type: PlaceType | None = None
+
+
+class Subscription:
+    def __init__(
+        self,
+        subscription_id: str,
+        bbox: tuple[float, float, float, float],
+        place_type: str | None,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        self.id = subscription_id
+        self.bbox = bbox
+        self.place_type = place_type
+        self.loop = loop
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.cells: list[tuple[int, int]] = []
+        self.lagged = False
+
+    def matches(self, latitude: float, longitude: float, place_type: str) -> bool:
+        if self.place_type and self.place_type != place_type:
+            return False
+        sw_lat, sw_lng, ne_lat, ne_lng = self.bbox
+        return sw_lat <= latitude <= ne_lat and sw_lng <= longitude <= ne_lng
+
+    def deliver(self, event: dict) -> None:
+        # 구독자의 이벤트 루프에서만 호출됨
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+def _cell_of(latitude: float, longitude: float) -> tuple[int, int]:
+    return (
+        math.floor(latitude / EVENT_GRID_CELL_DEGREES),
+        math.floor(longitude / EVENT_GRID_CELL_DEGREES),
+    )
+
+
+class SubscriptionIndex:
+    """
+    구독 영역을 격자 셀 단위로 색인
+    이벤트 좌표가 속한 셀의 구독자만 확인하므로 구독자 수와 무관하게 빠름
+    """
+
+    def __init__(self):
+        self._subscriptions: dict[str, Subscription] = {}
+        self._cells: dict[tuple[int, int], set[str]] = {}
+        # 셀이 너무 많은 넓은 영역은 따로 선형 검사
+        self._wide: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def next_id(self) -> str:
+        # 구독 영역 변경(PUT)에 인증이 없으므로 다른 클라이언트가 추측할 수 없는 id
+        return secrets.token_urlsafe(16)
+
+    def _link(self, sub: Subscription) -> None:
+        sw_lat, sw_lng, ne_lat, ne_lng = sub.bbox
+        min_row, min_col = _cell_of(sw_lat, sw_lng)
+        max_row, max_col = _cell_of(ne_lat, ne_lng)
+
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > MAX_SUBSCRIPTION_CELLS:
+            self._wide.add(sub.id)
+            sub.cells = []
+            return
+
+        sub.cells = [
+            (row, col)
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+        ]
+        for cell in sub.cells:
+            self._cells.setdefault(cell, set()).add(sub.id)
+
+    def _unlink(self, sub: Subscription) -> None:
+        self._wide.discard(sub.id)
+        for cell in sub.cells:
+            members = self._cells.get(cell)
+            if members is None:
+                continue
+            members.discard(sub.id)
+            if not members:
+                del self._cells[cell]
+        sub.cells = []
+
+    def add(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscriptions[sub.id] = sub
+            self._link(sub)
+
+    def update(self, subscription_id: str, bbox: tuple[float, float, float, float], place_type: str | None) -> bool:
+        with self._lock:
+            sub = self._subscriptions.get(subscription_id)
+            if sub is None:
+                return False
+            self._unlink(sub)
+            sub.bbox = bbox
+            sub.place_type = place_type
+            self._link(sub)
+            return True
+
+    def remove(self, subscription_id: str) -> None:
+        with self._lock:
+            sub = self._subscriptions.pop(subscription_id, None)
+            if sub is not None:
+                self._unlink(sub)
+
+    def all(self) -> list[Subscription]:
+        with self._lock:
+            return list(self._subscriptions.values())
+
+    def match(self, latitude: float, longitude: float, place_type: str) -> list[Subscription]:
+        with self._lock:
+            candidates = self._cells.get(_cell_of(latitude, longitude), set()) | self._wide
+            subs = [self._subscriptions[sub_id] for sub_id in candidates]
+        return [sub for sub in subs if sub.matches(latitude, longitude, place_type)]
+
+
+_subscriptions = SubscriptionIndex()
+
+
+def has_subscribers() -> bool:
+    return len(_subscriptions) > 0
+
+
+def publishes_inline() -> bool:
+    """변경한 쪽에서 바로 publish_place_event를 호출해야 하는지"""
+    return EVENT_SOURCE == "local" and has_subscribers()
+
+
+def subscribe(bbox: tuple[float, float, float, float], place_type: str | None = None) -> Subscription:
+    """영역 구독 등록 (이벤트 루프 안에서 호출, 이벤트는 sub.queue로 들어옴)"""
+    sub = Subscription(_subscriptions.next_id(), bbox, place_type, asyncio.get_running_loop())
+    _subscriptions.add(sub)
+    return sub
+
+
+def unsubscribe(subscription_id: str) -> None:
+    _subscriptions.remove(subscription_id)
+
+
+def publish_place_event(event_type: EventType, cursor: int, place: dict) -> None:
+    """
+    장소 변경을 해당 영역 구독자에게 전달
+    동기 엔드포인트(스레드풀)에서도 호출할 수 있음
+    """
+    event = {"type": event_type, "cursor": cursor, "place": place}
+    for sub in _subscriptions.match(place["latitude"], place["longitude"], place["type"]):
+        try:
+            sub.loop.call_soon_threadsafe(sub.deliver, event)
+        except RuntimeError:
+            # 이벤트 루프가 이미 종료됨
+            _subscriptions.remove(sub.id)
+
+
+def broadcast_resync(cursor: int) -> None:
+    """대량 변경 후 모든 구독자에게 변경 피드로 따라잡으라고 알림"""
+    event = {"type": "resync", "cursor": cursor}
+    for sub in _subscriptions.all():
+        try:
+            sub.loop.call_soon_threadsafe(sub.deliver, event)
+        except RuntimeError:
+            _subscriptions.remove(sub.id)
+
+
+def _read_changes(conn: sqlite3.Connection, cursor: int) -> tuple[int, list[sqlite3.Row] | None]:
+    """cursor 이후 변경 (너무 많이 밀렸으면 None)"""
+    if not has_subscribers():
+        latest = conn.execute("SELECT MAX(id) FROM place_changes").fetchone()[0]
+        return latest or cursor, []
+
+    rows = conn.execute(
+        """SELECT c.id AS cursor, c.change_type, p.*
+           FROM place_changes c
+           JOIN warning_places p ON p.id = c.place_id
+           WHERE c.id > ?
+           ORDER BY c.id
+           LIMIT ?""",
+        (cursor, EVENT_POLL_BATCH + 1),
+    ).fetchall()
+    if len(rows) > EVENT_POLL_BATCH:
+        latest = conn.execute("SELECT MAX(id) FROM place_changes").fetchone()[0]
+        return latest, None
+    return (rows[-1]["cursor"] if rows else cursor), rows
+
+
+async def tail_change_log(db_path: str) -> None:
+    """
+    EVENT_SOURCE=changelog일 때 워커마다 하나씩 실행
+    어느 워커에서 생긴 변경이든 이 워커의 구독자에게 전달
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.execute("SELECT MAX(id) FROM place_changes").fetchone()[0] or 0
+        while True:
+            await asyncio.sleep(EVENT_POLL_INTERVAL_SECONDS)
+            try:
+                cursor, rows = await asyncio.to_thread(_read_changes, conn, cursor)
+            except sqlite3.OperationalError as e:
+                print(f"[Events] change log poll failed: {e}")
+                continue
+
+            if rows is None:
+                broadcast_resync(cursor)
+                continue
+            for row in rows:
+                place = dict(row)
+                event_cursor = place.pop("cursor")
+                event_type = CHANGE_EVENTS[place.pop("change_type")]
+                publish_place_event(event_type, event_cursor, place)
+    finally:
+        conn.close()
+
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _normalize_bbox(sw_latitude: float, sw_longitude: float, ne_latitude: float, ne_longitude: float) -> tuple[float, float, float, float]:
+    if sw_latitude > ne_latitude or sw_longitude > ne_longitude:
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+    return sw_latitude, sw_longitude, ne_latitude, ne_longitude
+
+
+@router.get("/warning_places")
+async def subscribe_warning_places(
+    request: Request,
+    sw_latitude: float = Query(...),
+    sw_longitude: float = Query(...),
+    ne_latitude: float = Query(...),
+    ne_longitude: float = Query(...),
+    type: PlaceType | None = Query(None),
+) -> StreamingResponse:
+    """
+    영역 내 장애물 변경 구독 (Server-Sent Events)
+
+    - 첫 이벤트로 subscription_id 전달
+    - 영역 안에서 제보/이미지/검증이 생기면 즉시 전달
+    - 큐가 넘치면 resync 이벤트 → /warning/changes로 따라잡기
+    """
+    bbox = _normalize_bbox(sw_latitude, sw_longitude, ne_latitude, ne_longitude)
+    sub = subscribe(bbox, type)
+
+    async def stream():
+        try:
+            yield _format_sse("subscribed", {"subscription_id": sub.id})
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield _format_sse(event["type"], event)
+
+                if sub.lagged and sub.queue.empty():
+                    sub.lagged = False
+                    yield _format_sse("resync", {"cursor": event["cursor"]})
+        finally:
+            unsubscribe(sub.id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.put("/subscriptions/{subscription_id}")
+def update_subscription(subscription_id: str, req: RequestUpdateSubscription) -> dict:
+    """
+    지도를 이동했을 때 연결을 유지한 채 구독 영역만 변경
+    구독은 스트림을 연 워커에만 있으므로 다른 워커로 온 요청은 404
+    """
+    bbox = _normalize_bbox(req.sw_latitude, req.sw_longitude, req.ne_latitude, req.ne_longitude)
+    if not _subscriptions.update(subscription_id, bbox, req.type):
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    return {"message": "Subscription updated successfully", "subscription_id": subscription_id}
@@ -0,0 +1,80 @@
+import math
+
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_LATITUDE_DEGREE = 111320
+# 웹 메르카토르가 표현할 수 있는 위도 한계
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """두 좌표 사이의 거리를 미터로 계산"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+
+    a = math.sin(delta_phi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_METERS * c
+
+
+def meters_to_latitude_degrees(meters: float) -> float:
+    return meters / METERS_PER_LATITUDE_DEGREE
+
+
+def meters_to_longitude_degrees(meters: float, latitude: float) -> float:
+    # 극지방에서 0으로 나누지 않도록 cos 값 하한을 둠
+    return meters / (METERS_PER_LATITUDE_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+
+
+def bbox_around(latitude: float, longitude: float, radius: float) -> tuple[float, float, float, float]:
+    """반경 radius(미터)를 덮는 (min_lat, min_lng, max_lat, max_lng)"""
+    d_lat = meters_to_latitude_degrees(radius)
+    d_lng = meters_to_longitude_degrees(radius, latitude)
+    return latitude - d_lat, longitude - d_lng, latitude + d_lat, longitude + d_lng
+
+
+def tile_xy(latitude: float, longitude: float, zoom: int) -> tuple[int, int]:
+    """좌표가 들어가는 지도 타일 (XYZ, 줌 zoom)"""
+    n = 1 << zoom
+    latitude = max(min(latitude, MAX_MERCATOR_LATITUDE), -MAX_MERCATOR_LATITUDE)
+    x = int((longitude + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def project_onto_segment(
+    px: float, py: float,
+    ax: float, ay: float,
+    bx: float, by: float
+) -> tuple[float, float]:
+    """점 P를 선분 AB에 투영했을 때 (투영 비율 t (0~1), 거리 (미터))"""
+    # 벡터 AB, AP
+    ab_x, ab_y = bx - ax, by - ay
+    ap_x, ap_y = px - ax, py - ay
+
+    ab_len_sq = ab_x * ab_x + ab_y * ab_y
+
+    if ab_len_sq == 0:
+        return 0.0, haversine_distance(px, py, ax, ay)
+
+    # 투영 비율 t (0~1 사이면 선분 위)
+    t = max(0, min(1, (ap_x * ab_x + ap_y * ab_y) / ab_len_sq))
+
+    # 선분 위 가장 가까운 점
+    closest_x = ax + t * ab_x
+    closest_y = ay + t * ab_y
+
+    return t, haversine_distance(px, py, closest_x, closest_y)
+
+
+def point_to_segment_distance(
+    px: float, py: float,
+    ax: float, ay: float,
+    bx: float, by: float
+) -> float:
+    """점 P에서 선분 AB까지의 최단 거리 (미터)"""
+    return project_onto_segment(px, py, ax, ay, bx, by)[1]
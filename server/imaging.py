@@ -0,0 +1,189 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Literal
+
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401  설치돼 있으면 AVIF 인코더 등록
+except ImportError:
+    pass
+
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# multipart 경계/헤더 몫으로 본문 크기 한도에 더해 주는 여유
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+# 지도 타일 변환 작업 수 (0이면 변환하지 않고 원본 PNG 그대로)
+TILE_TRANSCODE_WORKERS = int(os.getenv("TILE_TRANSCODE_WORKERS", str(min(2, os.cpu_count() or 1))))
+# 위성 타일은 사진이라 손실 압축, 이 품질로 인코딩 (0이면 위성도 무손실)
+TILE_SATELLITE_QUALITY = int(os.getenv("TILE_SATELLITE_QUALITY", "75"))
+
+TileFormat = Literal["webp", "avif"]
+
+Image.init()
+AVIF_SUPPORTED = "AVIF" in Image.SAVE
+
+RenditionSize = Literal["thumb", "medium", "full"]
+RenditionFormat = Literal["png", "webp"]
+
+# 렌디션 이름 -> 긴 변 최대 픽셀
+RENDITIONS: dict[str, int] = {
+    "thumb": 256,
+    "medium": 1024,
+    "full": 2048,
+}
+
+# Pillow는 디코딩/인코딩 중 GIL을 놓기 때문에 스레드 풀로도 이벤트 루프를 막지 않음
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+# 타일 변환은 요청 경로에 있으므로 업로드 처리와 풀을 나눔
+tile_executor = ThreadPoolExecutor(max_workers=max(1, TILE_TRANSCODE_WORKERS), thread_name_prefix="tile-transcode")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def hash_upload(source: BinaryIO, max_bytes: int | None = MAX_UPLOAD_BYTES) -> tuple[str, int]:
+    """업로드를 청크 단위로 읽어 sha256과 크기 계산 (메모리에 통째로 올리지 않음, max_bytes=None이면 크기 제한 없음)"""
+    source.seek(0)
+    hasher = hashlib.sha256()
+    size = 0
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise UploadTooLarge()
+        hasher.update(chunk)
+    source.seek(0)
+    return hasher.hexdigest(), size
+
+
+class UploadSizeLimit:
+    """
+    이미지 업로드 경로의 요청 본문 크기 제한 (ASGI 미들웨어)
+    Starlette가 multipart 본문을 임시 파일로 다 받기 전에 거절
+    - Content-Length가 한도를 넘으면 본문을 읽지 않고 바로 413
+    - 길이를 알 수 없는(chunked) 요청은 받는 도중 한도를 넘는 순간 413
+    """
+
+    def __init__(self, app, path_prefixes: tuple[str, ...], max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.path_prefixes = path_prefixes
+        self.max_body = max_bytes + MULTIPART_OVERHEAD_BYTES
+        self.detail = f"Image exceeds {max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_body:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    exceeded = True
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message) -> None:
+            nonlocal started
+            # 한도를 넘긴 뒤 안쪽에서 만든 오류 응답(본문 파싱 실패 등)은 버리고 413으로 대신함
+            if exceeded:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send) -> None:
+        response = JSONResponse({"detail": self.detail}, status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
+
+
+# 업로드마다 만들어지는 (렌디션, 형식) 조합
+RENDITION_VARIANTS: list[tuple[RenditionSize, RenditionFormat]] = [
+    ("full", "png"),
+    ("full", "webp"),
+    ("medium", "webp"),
+    ("thumb", "webp"),
+]
+
+
+def rendition_key(image_hash: str, size: RenditionSize, fmt: RenditionFormat) -> str:
+    """원본 해시 기반 저장소 키 (앞 4자리로 2단계 샤딩)"""
+    return f"{image_hash[:2]}/{image_hash[2:4]}/{image_hash}_{size}.{fmt}"
+
+
+def build_renditions(source: BinaryIO, directory: Path) -> dict[tuple[RenditionSize, RenditionFormat], Path]:
+    """
+    업로드 이미지 검증 후 재압축해서 directory에 렌디션 파일 생성
+    - full: 긴 변 2048px PNG (기존 API 호환)
+    - thumb/medium/full: WebP
+    """
+    source.seek(0)
+    with Image.open(source) as probe:
+        probe.verify()
+
+    source.seek(0)
+    with Image.open(source) as opened:
+        img = ImageOps.exif_transpose(opened)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+        img.thumbnail((RENDITIONS["full"], RENDITIONS["full"]), Image.LANCZOS)
+        paths: dict[tuple[RenditionSize, RenditionFormat], Path] = {}
+
+        for size, fmt in RENDITION_VARIANTS:
+            resized = img if size == "full" else img.copy()
+            resized.thumbnail((RENDITIONS[size], RENDITIONS[size]), Image.LANCZOS)
+            path = directory / f"{size}.{fmt}"
+            if fmt == "png":
+                resized.save(path, format="PNG", optimize=True)
+            else:
+                resized.save(path, format="WEBP", quality=WEBP_QUALITY, method=4)
+            paths[(size, fmt)] = path
+
+        return paths
+
+
+def transcode_tile(content: bytes, fmt: TileFormat, quality: int) -> bytes:
+    """
+    타일 이미지를 WebP/AVIF로 재인코딩
+    quality가 0이면 무손실 (도로/지형 지도의 글자와 선이 뭉개지지 않도록)
+    """
+    with Image.open(io.BytesIO(content)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+        output = io.BytesIO()
+        if fmt == "avif":
+            img.save(output, format="AVIF", quality=quality)
+        elif quality:
+            img.save(output, format="WEBP", quality=quality, method=4)
+        else:
+            img.save(output, format="WEBP", lossless=True, method=1)
+        return output.getvalue()
@@ -0,0 +1,294 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+
+from db import DB_PATH, get_db
+
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+LEADERBOARD_CACHE_TTL_SECONDS = float(os.getenv("LEADERBOARD_CACHE_TTL_SECONDS", "30"))
+LEADERBOARD_CACHE_SIZE = int(os.getenv("LEADERBOARD_CACHE_SIZE", "64"))
+# 지역 랭킹 격자 크기 (0.1도 ≈ 11km)
+LEADERBOARD_AREA_DEGREES = float(os.getenv("LEADERBOARD_AREA_DEGREES", "0.1"))
+MAX_PAGE_SIZE = 100
+
+# 카운터 1 증가당 점수 (stairs/elevators_reported는 obstacles_reported와 중복이라 제외)
+LEADERBOARD_POINTS = {
+    "obstacles_reported": 10,
+    "photos_uploaded": 5,
+    "verifications": 3,
+}
+
+Period = Literal["all", "weekly", "monthly"]
+
+
+def _period_scope(period: Period, today: date | None = None) -> str:
+    today = today or date.today()
+    if period == "weekly":
+        year, week, _ = today.isocalendar()
+        return f"week:{year}-W{week:02d}"
+    if period == "monthly":
+        return f"month:{today.year}-{today.month:02d}"
+    return "all"
+
+
+def _area_scope(latitude: float, longitude: float) -> str:
+    row = math.floor(latitude / LEADERBOARD_AREA_DEGREES)
+    col = math.floor(longitude / LEADERBOARD_AREA_DEGREES)
+    return f"area:{row}:{col}"
+
+
+def record_points(
+    db: sqlite3.Connection,
+    user_id: int,
+    increments: dict[str, int],
+    location: tuple[float, float] | None = None,
+) -> None:
+    """카운터 변화를 점수로 바꿔 전체/주간/월간(/지역) 집계 테이블에 누적"""
+    points = sum(LEADERBOARD_POINTS.get(field, 0) * amount for field, amount in increments.items())
+    if points == 0:
+        return
+
+    scopes = [_period_scope("all"), _period_scope("weekly"), _period_scope("monthly")]
+    if location is not None:
+        scopes.append(_area_scope(*location))
+
+    db.executemany(
+        """INSERT INTO leaderboard_scores (scope, user_id, score) VALUES (?, ?, ?)
+           ON CONFLICT(scope, user_id) DO UPDATE SET score = score + excluded.score""",
+        [(scope, user_id, points) for scope in scopes],
+    )
+
+
+def init_leaderboard() -> None:
+    """집계 테이블이 비어 있으면 기존 users 카운터와 제보 위치로 채움"""
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        if conn.execute("SELECT 1 FROM leaderboard_scores LIMIT 1").fetchone():
+            return
+        # 여러 워커가 동시에 시작해도 한 워커만 채우도록 쓰기 잠금을 잡고 다시 확인
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM leaderboard_scores LIMIT 1").fetchone():
+            conn.rollback()
+            return
+
+        score_expr = " + ".join(f"{field} * {points}" for field, points in LEADERBOARD_POINTS.items())
+        conn.execute(
+            f"""INSERT INTO leaderboard_scores (scope, user_id, score)
+                SELECT 'all', id, {score_expr} FROM users WHERE {score_expr} > 0"""
+        )
+
+        area_scores: dict[tuple[str, int], int] = {}
+        for user_id, latitude, longitude in conn.execute(
+            "SELECT user_id, latitude, longitude FROM warning_places WHERE user_id IS NOT NULL"
+        ):
+            key = (_area_scope(latitude, longitude), user_id)
+            area_scores[key] = area_scores.get(key, 0) + LEADERBOARD_POINTS["obstacles_reported"]
+        conn.executemany(
+            "INSERT INTO leaderboard_scores (scope, user_id, score) VALUES (?, ?, ?)",
+            [(scope, user_id, score) for (scope, user_id), score in area_scores.items()],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class RankedBoard:
+    """
+    점수 내림차순으로 정렬된 스냅샷
+    순위 조회는 이진 탐색(O(log n)), 페이지 조회는 슬라이스
+    """
+
+    def __init__(self, rows: list[tuple[int, int]]):
+        # rows: (user_id, score), 점수 내림차순 / user_id 오름차순
+        self.user_ids = [user_id for user_id, _ in rows]
+        # bisect는 오름차순이 필요하므로 점수를 음수로 저장
+        self.neg_scores = [-score for _, score in rows]
+        self.scores = {user_id: score for user_id, score in rows}
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def rank_of(self, user_id: int) -> tuple[int, int] | None:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        # 동점자는 같은 순위
+        return bisect_left(self.neg_scores, -score) + 1, score
+
+    def page(self, offset: int, limit: int) -> list[tuple[int, int, int]]:
+        entries = []
+        for index in range(offset, min(offset + limit, len(self.user_ids))):
+            score = -self.neg_scores[index]
+            rank = bisect_left(self.neg_scores, -score) + 1
+            entries.append((rank, self.user_ids[index], score))
+        return entries
+
+
+class BoardCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._boards: OrderedDict[str, RankedBoard] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: sqlite3.Connection, scope: str) -> RankedBoard:
+        with self._lock:
+            board = self._boards.get(scope)
+            if board is not None and time.monotonic() - board.built_at <= self.ttl_seconds:
+                self._boards.move_to_end(scope)
+                return board
+
+        rows = db.execute(
+            """SELECT user_id, score FROM leaderboard_scores
+               WHERE scope = ? AND score > 0
+               ORDER BY score DESC, user_id""",
+            (scope,),
+        ).fetchall()
+        board = RankedBoard([(row["user_id"], row["score"]) for row in rows])
+
+        with self._lock:
+            self._boards[scope] = board
+            self._boards.move_to_end(scope)
+            while len(self._boards) > self.max_size:
+                self._boards.popitem(last=False)
+        return board
+
+
+_boards = BoardCache(LEADERBOARD_CACHE_SIZE, LEADERBOARD_CACHE_TTL_SECONDS)
+_stats_cache: tuple[float, dict] | None = None
+
+
+def _resolve_scope(period: Period, latitude: float | None, longitude: float | None) -> str:
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="latitude and longitude must be given together")
+    if latitude is not None:
+        if period != "all":
+            raise HTTPException(status_code=400, detail="Area rankings are only available for period=all")
+        return _area_scope(latitude, longitude)
+    return _period_scope(period)
+
+
+@router.get("")
+def get_leaderboard(
+    period: Period = Query("all", description="all, weekly, monthly"),
+    latitude: float | None = Query(None, description="지역 랭킹 기준 위도"),
+    longitude: float | None = Query(None, description="지역 랭킹 기준 경도"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: sqlite3.Connection = Depends(get_db),
+) -> dict:
+    """
+    기여자 랭킹
+
+    - 점수: 제보 10, 사진 5, 검증 3
+    - latitude/longitude를 주면 해당 지역(격자) 랭킹
+    """
+    scope = _resolve_scope(period, latitude, longitude)
+    try:
+        board = _boards.get(db, scope)
+        page = board.page(offset, limit)
+
+        users: dict[int, dict] = {}
+        if page:
+            user_ids = [user_id for _, user_id, _ in page]
+            placeholders = ", ".join("?" * len(user_ids))
+            for row in db.execute(
+                f"""SELECT u.id, u.username, u.profile_image, COUNT(b.badge_name) AS badge_count
+                    FROM users u LEFT JOIN user_badges b ON b.user_id = u.id
+                    WHERE u.id IN ({placeholders})
+                    GROUP BY u.id""",
+                user_ids,
+            ):
+                users[row["id"]] = dict(row)
+
+        return {
+            "scope": scope,
+            "total": len(board),
+            "offset": offset,
+            "entries": [
+                {
+                    "rank": rank,
+                    "user_id": user_id,
+                    "username": users.get(user_id, {}).get("username"),
+                    "profile_image": users.get(user_id, {}).get("profile_image"),
+                    "badge_count": users.get(user_id, {}).get("badge_count", 0),
+                    "score": score,
+                }
+                for rank, user_id, score in page
+            ],
+        }
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to get leaderboard")
+
+
+@router.get("/user/{user_id}")
+def get_user_rank(
+    user_id: int,
+    period: Period = Query("all", description="all, weekly, monthly"),
+    latitude: float | None = Query(None),
+    longitude: float | None = Query(None),
+    db: sqlite3.Connection = Depends(get_db),
+) -> dict:
+    """내 순위 조회"""
+    scope = _resolve_scope(period, latitude, longitude)
+    try:
+        board = _boards.get(db, scope)
+        found = board.rank_of(user_id)
+        return {
+            "scope": scope,
+            "user_id": user_id,
+            "rank": found[0] if found else None,
+            "score": found[1] if found else 0,
+            "total": len(board),
+        }
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to get user rank")
+
+
+@router.get("/stats")
+def get_stats(db: sqlite3.Connection = Depends(get_db)) -> dict:
+    """서비스 전체 집계 (짧게 캐시)"""
+    global _stats_cache
+    now = time.monotonic()
+    if _stats_cache is not None and now - _stats_cache[0] <= LEADERBOARD_CACHE_TTL_SECONDS:
+        return _stats_cache[1]
+
+    try:
+        places = db.execute(
+            """SELECT type, COUNT(*) AS count, SUM(has_image) AS with_image
+               FROM warning_places WHERE duplicate_of IS NULL GROUP BY type"""
+        ).fetchall()
+        users = db.execute(
+            """SELECT COUNT(*) AS users,
+                      SUM(obstacles_reported > 0) AS contributors,
+                      SUM(verifications) AS verifications,
+                      SUM(photos_uploaded) AS photos
+               FROM users"""
+        ).fetchone()
+
+        stats = {
+            "places": {
+                "total": sum(row["count"] for row in places),
+                **{row["type"]: row["count"] for row in places},
+                "with_image": sum(row["with_image"] or 0 for row in places),
+            },
+            "users": users["users"],
+            "contributors": users["contributors"] or 0,
+            "verifications": users["verifications"] or 0,
+            "photos": users["photos"] or 0,
+        }
+        _stats_cache = (now, stats)
+        return stats
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to get stats")
@@ -2,6 +2,7 @@ import asyncio
 import hashlib
 import os
 import re
+import sqlite3
 import time
 from collections import OrderedDict
 from contextlib import asynccontextmanager
@@ -12,17 +13,33 @@ from dotenv import load_dotenv
 load_dotenv(Path(__file__).with_name(".env"))
 
 import httpx
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import PlainTextResponse
 
-from db import init_db
+from db import DB_PATH, init_db
 from warning import router as warning_router
 from badge import router as badge_router
 from auth import router as auth_router
 from places import router as places_router
 from directions import router as directions_router
+from events import router as events_router
+from bulk import router as bulk_router
+from leaderboard import router as leaderboard_router, init_leaderboard
+from navigation import router as navigation_router, session_count as navigation_session_count
+from offline import router as offline_router, TileSource, job_counts, set_tile_source
+from events import EVENT_SOURCE, tail_change_log
+from routing import ROUTING_OSM_PATH, ROUTING_SYNC_INTERVAL_SECONDS, keep_synced
+from shared_cache import SharedCache, create_shared_cache
+from snapshot import load_snapshot, place_snapshot
+import metrics
+from tracing import span, trace_requests
+import upstream
+from upstream import CLOSED, HedgeBudget, LatencyTracker, UpstreamUnavailable, get_guard
+from prefetch import TILE_PREFETCH_MAX_UPSTREAM, TILE_PREFETCH_WORKERS, Prefetcher, TileKey
+from imaging import AVIF_SUPPORTED, TILE_SATELLITE_QUALITY, TILE_TRANSCODE_WORKERS, TileFormat, UploadSizeLimit, tile_executor, transcode_tile
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+GOOGLE_TILE_API_BASE = os.getenv("GOOGLE_TILE_API_BASE", "https://tile.googleapis.com").rstrip("/")
 DEFAULT_MAP_TYPE = os.getenv("GOOGLE_MAP_TYPE", "roadmap")
 DEFAULT_TILE_LANGUAGE = os.getenv("GOOGLE_TILE_LANGUAGE", "en-US")
 DEFAULT_TILE_REGION = os.getenv("GOOGLE_TILE_REGION", "US")
@@ -33,6 +50,15 @@ SESSION_REFRESH_GRACE_SECONDS = int(os.getenv("SESSION_REFRESH_GRACE_SECONDS", "
 MAX_SESSION_CACHE_SIZE = int(os.getenv("MAX_SESSION_CACHE_SIZE", "128"))
 TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "1000"))
 TILE_CACHE_TTL_SECONDS = int(os.getenv("TILE_CACHE_TTL_SECONDS", "3600"))
+# Google 장애로 만료된 캐시 타일을 대신 줄 때 클라이언트 캐시 시간 (초)
+STALE_TILE_MAX_AGE_SECONDS = int(os.getenv("STALE_TILE_MAX_AGE_SECONDS", "60"))
+# 최근 타일 응답 시간의 이 백분위수가 지나도 응답이 없으면 같은 요청을 한 번 더 보냄 (0이면 끔, 예: 0.9)
+TILE_HEDGE_PERCENTILE = float(os.getenv("TILE_HEDGE_PERCENTILE", "0"))
+# 헤지 요청은 전체 타일 요청의 이 비율까지만
+TILE_HEDGE_BUDGET = float(os.getenv("TILE_HEDGE_BUDGET", "0.05"))
+TILE_HEDGE_MIN_DELAY_MS = float(os.getenv("TILE_HEDGE_MIN_DELAY_MS", "10"))
+# 공유 캐시를 쓸 때 각 워커가 자기 메트릭을 올리는 간격 (/metrics는 모든 워커의 값을 합쳐 보여줌)
+METRICS_PUBLISH_INTERVAL_SECONDS = float(os.getenv("METRICS_PUBLISH_INTERVAL_SECONDS", "5"))
 
 _http_client: httpx.AsyncClient | None = None
 
@@ -44,61 +70,212 @@ def _get_http_client() -> httpx.AsyncClient:
 
 
 class TileCache:
-    def __init__(self, max_size: int, ttl_seconds: int):
+    """워커별 메모리 LRU, shared가 있으면 다른 워커와 공유하는 2차 캐시로 사용"""
+
+    def __init__(self, max_size: int, ttl_seconds: int, shared: SharedCache | None = None):
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.bytes = 0
         self._cache: OrderedDict[str, tuple[bytes, str, float]] = OrderedDict()
         self._lock = asyncio.Lock()
 
-    def _make_key(self, z: int, x: int, y: int, map_type: str, lang: str, region: str) -> str:
-        return f"{z}/{x}/{y}/{map_type}/{lang}/{region}"
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _make_key(self, z: int, x: int, y: int, map_type: str, lang: str, region: str, variant: str | None = None) -> str:
+        key = f"{z}/{x}/{y}/{map_type}/{lang}/{region}"
+        # 변환된 형식(webp/avif)은 원본 옆에 따로 저장
+        return f"{key}/{variant}" if variant else key
 
-    async def get(self, z: int, x: int, y: int, map_type: str, lang: str, region: str) -> tuple[bytes, str] | None:
-        key = self._make_key(z, x, y, map_type, lang, region)
+    async def get(
+        self, z: int, x: int, y: int, map_type: str, lang: str, region: str, variant: str | None = None,
+    ) -> tuple[bytes, str] | None:
+        key = self._make_key(z, x, y, map_type, lang, region, variant)
+        label = f"tile_{variant}" if variant else "tile"
         async with self._lock:
-            if key not in self._cache:
-                return None
-            content, content_type, timestamp = self._cache[key]
-            if time.time() - timestamp > self.ttl_seconds:
-                del self._cache[key]
-                return None
-            self._cache.move_to_end(key)
-            return content, content_type
-
-    async def set(self, z: int, x: int, y: int, map_type: str, lang: str, region: str, content: bytes, content_type: str):
-        key = self._make_key(z, x, y, map_type, lang, region)
+            entry = self._cache.get(key)
+            if entry is not None:
+                content, content_type, timestamp = entry
+                if time.time() - timestamp <= self.ttl_seconds:
+                    self._cache.move_to_end(key)
+                    metrics.cache_requests.inc(cache=label, result="hit")
+                    return content, content_type
+                # 만료된 항목은 업스트림 장애 때 get_stale로 쓸 수 있도록 남겨 둠 (LRU로 밀려남)
+
+        if self.shared is None:
+            metrics.cache_requests.inc(cache=label, result="miss")
+            return None
+
+        found = await asyncio.to_thread(self.shared.get_tile, key, self.ttl_seconds)
+        if found is None:
+            metrics.cache_requests.inc(cache=label, result="miss")
+            return None
+        metrics.cache_requests.inc(cache=label, result="shared_hit")
+        content, content_type, stored_at = found
         async with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-            self._cache[key] = (content, content_type, time.time())
-            while len(self._cache) > self.max_size:
-                self._cache.popitem(last=False)
-
-
-_tile_cache = TileCache(TILE_CACHE_SIZE, TILE_CACHE_TTL_SECONDS)
+            self._put(key, content, content_type, stored_at)
+        return content, content_type
+
+    async def get_stale(
+        self, z: int, x: int, y: int, map_type: str, lang: str, region: str, variant: str | None = None,
+    ) -> tuple[bytes, str] | None:
+        """TTL과 무관하게 남아 있는 타일 반환"""
+        key = self._make_key(z, x, y, map_type, lang, region, variant)
+        async with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                return entry[0], entry[1]
+
+        if self.shared is None:
+            return None
+        found = await asyncio.to_thread(self.shared.get_tile, key, float("inf"))
+        return (found[0], found[1]) if found else None
+
+    def contains(self, z: int, x: int, y: int, map_type: str, lang: str, region: str) -> bool:
+        """메모리 캐시에 만료되지 않은 타일이 있는지 (지표에 기록하지 않음)"""
+        entry = self._cache.get(self._make_key(z, x, y, map_type, lang, region))
+        return entry is not None and time.time() - entry[2] <= self.ttl_seconds
+
+    def _remove(self, key: str) -> None:
+        content, _, _ = self._cache.pop(key)
+        self.bytes -= len(content)
+
+    def _put(self, key: str, content: bytes, content_type: str, stored_at: float) -> None:
+        if key in self._cache:
+            self._remove(key)
+        self._cache[key] = (content, content_type, stored_at)
+        self.bytes += len(content)
+        while len(self._cache) > self.max_size:
+            self._remove(next(iter(self._cache)))
+            metrics.cache_evictions.inc(cache="tile")
+
+    async def set(
+        self, z: int, x: int, y: int, map_type: str, lang: str, region: str, content: bytes, content_type: str,
+        variant: str | None = None,
+    ):
+        key = self._make_key(z, x, y, map_type, lang, region, variant)
+        stored_at = time.time()
+        async with self._lock:
+            self._put(key, content, content_type, stored_at)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set_tile, key, content, content_type, stored_at)
+
+
+_shared_cache = create_shared_cache()
+_tile_cache = TileCache(TILE_CACHE_SIZE, TILE_CACHE_TTL_SECONDS, _shared_cache)
+
+metrics.gauge(
+    "cache_entries", "Entries held in process-local caches", ("cache",),
+    collect=lambda: [(("tile",), len(_tile_cache)), (("tile_session",), len(_session_entries))],
+)
+metrics.gauge(
+    "tile_prefetch_queue", "Predicted tiles waiting to be fetched",
+    collect=lambda: [((), len(_prefetcher))] if _prefetcher is not None else [],
+)
+metrics.gauge(
+    "place_snapshot_places", "Places held in the in-memory obstacle snapshot",
+    collect=lambda: [((), len(place_snapshot))],
+)
+metrics.gauge(
+    "navigation_sessions", "Open navigation sessions",
+    collect=lambda: [((), navigation_session_count())],
+)
+metrics.gauge("offline_pack_jobs", "Offline pack builds by state", ("state",), collect=job_counts)
+metrics.gauge(
+    "upstream_hedge_delay_seconds", "Current delay before a hedged tile request is sent", ("api",),
+    collect=lambda: [(("tiles",), _tile_latency.percentile(TILE_HEDGE_PERCENTILE) or 0)] if TILE_HEDGE_PERCENTILE > 0 else [],
+)
+metrics.gauge(
+    "cache_bytes", "Payload bytes held in process-local caches", ("cache",),
+    collect=lambda: [(("tile",), _tile_cache.bytes)],
+)
+
+
+async def publish_worker_metrics(shared: SharedCache) -> None:
+    """워커마다 하나씩 실행, 다른 워커가 /metrics에 응답할 때 이 워커의 값도 보이도록"""
+    while True:
+        try:
+            await asyncio.to_thread(shared.set_worker_metrics, metrics.WORKER_ID, metrics.registry.collect())
+        except sqlite3.OperationalError as e:
+            print(f"[Metrics] publish failed: {e}")
+        await asyncio.sleep(METRICS_PUBLISH_INTERVAL_SECONDS)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global _http_client
     init_db()
+    init_leaderboard()
+    # 지도/경로 장애물 조회용 메모리 스냅샷
+    await asyncio.to_thread(load_snapshot, DB_PATH)
     _http_client = httpx.AsyncClient(
         timeout=TILE_TIMEOUT_SECONDS,
         http2=True,
         limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
     )
+    tailer = asyncio.create_task(tail_change_log(DB_PATH)) if EVENT_SOURCE == "changelog" else None
+    prefetcher = asyncio.create_task(_prefetcher.run()) if _prefetcher is not None else None
+    metrics_publisher = (
+        asyncio.create_task(publish_worker_metrics(_shared_cache)) if _shared_cache is not None else None
+    )
+    # 보행 그래프를 미리 열고 새 장애물을 백그라운드로 반영
+    routing_sync = (
+        asyncio.create_task(keep_synced(DB_PATH)) if ROUTING_OSM_PATH and ROUTING_SYNC_INTERVAL_SECONDS > 0 else None
+    )
     yield
+    if routing_sync is not None:
+        routing_sync.cancel()
+    if tailer is not None:
+        tailer.cancel()
+    if prefetcher is not None:
+        prefetcher.cancel()
+    if metrics_publisher is not None:
+        metrics_publisher.cancel()
     await _http_client.aclose()
     _http_client = None
 
 
 app = FastAPI(title="Google Tiles Proxy", lifespan=lifespan)
 
+
+app.middleware("http")(trace_requests)
+# 이미지 업로드는 본문을 다 받기 전에 크기 제한
+app.add_middleware(UploadSizeLimit, path_prefixes=("/warning/update_place_img/",))
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    metrics.http_requests_in_flight.inc()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.http_requests_in_flight.dec()
+        # 매칭된 라우트 템플릿을 라벨로 써야 경로 파라미터 때문에 라벨이 폭증하지 않음
+        route = request.scope.get("route")
+        metrics.http_request_duration.observe(
+            time.perf_counter() - started,
+            router=(route.tags[0] if route is not None and getattr(route, "tags", None) else "app"),
+            route=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=status,
+        )
+
+
 app.include_router(warning_router)
 app.include_router(badge_router)
 app.include_router(auth_router)
 app.include_router(places_router)
 app.include_router(directions_router)
+app.include_router(events_router)
+app.include_router(bulk_router)
+app.include_router(leaderboard_router)
+app.include_router(offline_router)
+app.include_router(navigation_router)
 
 _session_entries: dict[str, tuple[str, float]] = {}
 _session_locks: dict[str, asyncio.Lock] = {}
@@ -177,6 +354,7 @@ def _trim_session_cache() -> None:
         : len(_session_entries) - MAX_SESSION_CACHE_SIZE
     ]:
         _session_entries.pop(key, None)
+        metrics.cache_evictions.inc(cache="tile_session")
 
 
 async def _create_google_session(map_type: str, language: str, region: str) -> tuple[str, float]:
@@ -190,10 +368,10 @@ async def _create_google_session(map_type: str, language: str, region: str) -> t
         "language": language,
         "region": region,
     }
-    url = f"https://tile.googleapis.com/v1/createSession?key={GOOGLE_MAPS_API_KEY}"
+    url = f"{GOOGLE_TILE_API_BASE}/v1/createSession?key={GOOGLE_MAPS_API_KEY}"
 
     client = _get_http_client()
-    response = await client.post(url, json=payload)
+    response = await get_guard("tile_session").call(lambda: client.post(url, json=payload))
 
     if response.status_code >= 400:
         raise HTTPException(
@@ -218,6 +396,7 @@ async def _get_google_session(map_type: str, language: str, region: str) -> str:
     now = time.time()
     current = _session_entries.get(session_key)
     if current and now < (current[1] - SESSION_REFRESH_GRACE_SECONDS):
+        metrics.cache_requests.inc(cache="tile_session", result="hit")
         return current[0]
 
     lock = await _get_session_lock(session_key)
@@ -227,10 +406,32 @@ async def _get_google_session(map_type: str, language: str, region: str) -> str:
         if current and now < (current[1] - SESSION_REFRESH_GRACE_SECONDS):
             return current[0]
 
-        token, expires_at = await _create_google_session(map_type, language, region)
-        _session_entries[session_key] = (token, expires_at)
-        _trim_session_cache()
-        return token
+        # 다른 워커가 이미 만든 세션이 있으면 재사용
+        if _shared_cache is not None:
+            shared = await asyncio.to_thread(_shared_cache.get_session, session_key)
+            if shared and now < (shared[1] - SESSION_REFRESH_GRACE_SECONDS):
+                metrics.cache_requests.inc(cache="tile_session", result="shared_hit")
+                _session_entries[session_key] = shared
+                _trim_session_cache()
+                return shared[0]
+
+        metrics.cache_requests.inc(cache="tile_session", result="miss")
+        try:
+            return await _store_new_session(session_key, map_type, language, region)
+        except HTTPException:
+            # 갱신에 실패해도 아직 만료되지 않은 세션은 계속 사용
+            if current and now < current[1]:
+                return current[0]
+            raise
+
+
+async def _store_new_session(session_key: str, map_type: str, language: str, region: str) -> str:
+    token, expires_at = await _create_google_session(map_type, language, region)
+    _session_entries[session_key] = (token, expires_at)
+    _trim_session_cache()
+    if _shared_cache is not None:
+        await asyncio.to_thread(_shared_cache.set_session, session_key, token, expires_at)
+    return token
 
 
 async def _fetch_tile(
@@ -241,26 +442,130 @@ async def _fetch_tile(
     language: str,
     region: str,
     force_new_session: bool = False,
+    hedge: bool = True,
 ) -> httpx.Response:
     session_key = _build_session_key(map_type, language, region)
 
-    if force_new_session:
-        lock = await _get_session_lock(session_key)
-        async with lock:
-            token, expires_at = await _create_google_session(map_type, language, region)
-            _session_entries[session_key] = (token, expires_at)
-            _trim_session_cache()
-            session = token
-    else:
-        session = await _get_google_session(map_type, language, region)
+    with span("tile.session"):
+        if force_new_session:
+            lock = await _get_session_lock(session_key)
+            async with lock:
+                session = await _store_new_session(session_key, map_type, language, region)
+        else:
+            session = await _get_google_session(map_type, language, region)
 
     url = (
-        f"https://tile.googleapis.com/v1/2dtiles/{z}/{x}/{y}"
+        f"{GOOGLE_TILE_API_BASE}/v1/2dtiles/{z}/{x}/{y}"
         f"?session={session}&key={GOOGLE_MAPS_API_KEY}"
     )
 
+    with span("tile.upstream"):
+        if hedge and TILE_HEDGE_PERCENTILE > 0:
+            return await _hedged_tile_get(url)
+        client = _get_http_client()
+        return await get_guard("tiles").call(lambda: client.get(url))
+
+
+_tile_latency = LatencyTracker()
+_tile_hedge_budget = HedgeBudget(TILE_HEDGE_BUDGET)
+
+
+async def _hedged_tile_get(url: str) -> httpx.Response:
+    """
+    첫 요청이 최근 응답 시간의 TILE_HEDGE_PERCENTILE 백분위수 안에 오지 않으면
+    같은 요청을 하나 더 보내서 먼저 온 응답을 쓰고 나머지는 취소
+    """
     client = _get_http_client()
-    return await client.get(url)
+    guard = get_guard("tiles")
+    _tile_hedge_budget.deposit()
+
+    async def attempt() -> httpx.Response:
+        started = time.perf_counter()
+        response = await guard.call(lambda: client.get(url))
+        _tile_latency.observe(time.perf_counter() - started)
+        return response
+
+    primary = asyncio.create_task(attempt())
+    delay = _tile_latency.percentile(TILE_HEDGE_PERCENTILE)
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=max(delay, TILE_HEDGE_MIN_DELAY_MS / 1000))
+    # 업스트림이 불안정할 때 헤지는 부하만 늘림
+    if done or guard.breaker.state != CLOSED:
+        return await primary
+    if not _tile_hedge_budget.withdraw():
+        metrics.upstream_hedges.inc(api="tiles", result="no_budget")
+        return await primary
+
+    metrics.upstream_hedges.inc(api="tiles", result="sent")
+    hedge = asyncio.create_task(attempt())
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        metrics.upstream_hedges.inc(api="tiles", result="won")
+                    return task.result()
+        # 둘 다 실패하면 첫 요청의 오류를 그대로 올림
+        return primary.result()
+    finally:
+        for task in (primary, hedge):
+            if not task.done():
+                task.cancel()
+
+
+async def _fetch_and_cache_tile(tile: TileKey) -> tuple[bytes, str]:
+    """사용자 요청이 아닌 백그라운드 작업(미리 받기, 오프라인 팩)용, 헤지하지 않음"""
+    response = await _fetch_tile(*tile, hedge=False)
+    if response.status_code in (401, 403):
+        response = await _fetch_tile(*tile, force_new_session=True, hedge=False)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"Google tile request failed ({response.status_code})")
+    content_type = response.headers.get("content-type", "image/png")
+    await _tile_cache.set(*tile, response.content, content_type)
+    return response.content, content_type
+
+
+async def _prefetch_tile(tile: TileKey) -> None:
+    await _fetch_and_cache_tile(tile)
+
+
+async def load_offline_tile(tile: TileKey) -> tuple[bytes, str]:
+    return await _tile_cache.get(*tile) or await _fetch_and_cache_tile(tile)
+
+
+def _upstream_busy() -> bool:
+    guard = get_guard("tiles")
+    return guard.in_flight >= TILE_PREFETCH_MAX_UPSTREAM or guard.breaker.state != CLOSED
+
+
+_prefetcher = Prefetcher(
+    _prefetch_tile,
+    lambda tile: _tile_cache.contains(*tile),
+    _upstream_busy,
+    max_zoom=MAX_ZOOM,
+) if TILE_PREFETCH_WORKERS > 0 else None
+
+
+offline_tile_source = TileSource(
+    load_offline_tile,
+    lambda map_type, language, region: (
+        _normalize_map_type(map_type), _normalize_language(language), _normalize_region(region),
+    ),
+    MAX_ZOOM,
+)
+set_tile_source(offline_tile_source)
+
+
+def _client_key(request: Request) -> str:
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return client_id
+    host = request.client.host if request.client else ""
+    return f"{host}|{request.headers.get('user-agent', '')}"
 
 
 @app.get("/health", response_class=PlainTextResponse)
@@ -268,8 +573,31 @@ async def health() -> str:
     return "ok"
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    """
+    Prometheus 텍스트 형식
+    공유 캐시를 쓰면(다중 워커) 최근에 값을 올린 모든 워커의 샘플을 worker 라벨로 구분해서 합침
+    """
+    if _shared_cache is None:
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+    own = metrics.registry.collect()
+    _shared_cache.set_worker_metrics(metrics.WORKER_ID, own)
+    workers = _shared_cache.get_worker_metrics(METRICS_PUBLISH_INTERVAL_SECONDS * 3)
+    workers[metrics.WORKER_ID] = own
+    return PlainTextResponse(metrics.registry.render_merged(workers.values()), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/upstream")
+def get_upstream_status() -> dict:
+    """외부 API별 회로 차단기 상태와 한도 (워커 프로세스별 값)"""
+    return upstream.status()
+
+
 @app.get("/maps/tiles/{z}/{x}/{y}.png")
 async def tile_proxy(
+    request: Request,
     z: int,
     x: int,
     y: int,
@@ -283,32 +611,53 @@ async def tile_proxy(
     tile_region = _normalize_region(region)
     map_type = _normalize_map_type(mapType)
 
-    cached = await _tile_cache.get(z, x, y, map_type, tile_language, tile_region)
+    tile = TileKey(z, x, y, map_type, tile_language, tile_region)
+    if _prefetcher is not None:
+        _prefetcher.observe(_client_key(request), tile)
+
+    tile_format = _negotiate_tile_format(request.headers.get("accept"), map_type)
+
+    with span("tile.cache"):
+        if tile_format is not None:
+            variant = await _tile_cache.get(*tile, variant=tile_format)
+            if variant is not None:
+                return _tile_response(*variant, tile_language, tile_region, "HIT", TILE_CACHE_TTL_SECONDS)
+
+        cached = await _tile_cache.get(*tile)
+        if cached is None and _prefetcher is not None:
+            # 미리 받는 중인 타일이면 그 결과를 기다림
+            if await _prefetcher.join(tile):
+                cached = await _tile_cache.get(*tile)
     if cached:
         content, content_type = cached
-        return Response(
-            content=content,
-            media_type=content_type,
-            headers={
-                "Cache-Control": f"public, max-age={TILE_CACHE_TTL_SECONDS}",
-                "X-Tile-Proxy": "google-map-tiles",
-                "X-Tile-Language": tile_language,
-                "X-Tile-Region": tile_region,
-                "X-Cache": "HIT",
-            },
-        )
+        if tile_format is not None:
+            content, content_type = await _transcode_tile(tile, content, content_type, tile_format)
+        return _tile_response(content, content_type, tile_language, tile_region, "HIT", TILE_CACHE_TTL_SECONDS)
 
-    response = await _fetch_tile(z, x, y, map_type, tile_language, tile_region)
-    if response.status_code in (401, 403):
-        response = await _fetch_tile(
-            z,
-            x,
-            y,
-            map_type,
-            tile_language,
-            tile_region,
-            force_new_session=True,
-        )
+    try:
+        response = await _fetch_tile(z, x, y, map_type, tile_language, tile_region)
+        if response.status_code in (401, 403):
+            response = await _fetch_tile(
+                z,
+                x,
+                y,
+                map_type,
+                tile_language,
+                tile_region,
+                force_new_session=True,
+            )
+    except (UpstreamUnavailable, httpx.HTTPError) as e:
+        stale = await _stale_tile(tile, tile_format)
+        if stale is None:
+            if isinstance(e, UpstreamUnavailable):
+                raise
+            raise HTTPException(status_code=502, detail="Google tile request failed")
+        return _tile_response(*stale, tile_language, tile_region, "STALE", STALE_TILE_MAX_AGE_SECONDS)
+
+    if response.status_code >= 500 or response.status_code == 429:
+        stale = await _stale_tile(tile, tile_format)
+        if stale is not None:
+            return _tile_response(*stale, tile_language, tile_region, "STALE", STALE_TILE_MAX_AGE_SECONDS)
 
     if response.status_code >= 400:
         raise HTTPException(
@@ -319,24 +668,106 @@ async def tile_proxy(
     content_type = response.headers.get("content-type", "image/png")
     content = response.content
 
-    await _tile_cache.set(z, x, y, map_type, tile_language, tile_region, content, content_type)
+    with span("tile.store"):
+        await _tile_cache.set(*tile, content, content_type)
+
+    if tile_format is not None:
+        content, content_type = await _transcode_tile(tile, content, content_type, tile_format)
+    return _tile_response(content, content_type, tile_language, tile_region, "MISS", TILE_CACHE_TTL_SECONDS)
 
+
+def _negotiate_tile_format(accept: str | None, map_type: str) -> TileFormat | None:
+    """Accept 헤더로 보낼 형식 결정 (AVIF는 손실 압축하는 위성 타일에만)"""
+    if not accept or TILE_TRANSCODE_WORKERS <= 0:
+        return None
+
+    accepted = set()
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        if params and quality.replace(".", "", 1).isdigit() and float(quality) == 0:
+            continue
+        accepted.add(media_type.strip().lower())
+
+    if map_type == "satellite" and TILE_SATELLITE_QUALITY > 0 and AVIF_SUPPORTED and "image/avif" in accepted:
+        return "avif"
+    if "image/webp" in accepted:
+        return "webp"
+    return None
+
+
+async def _transcode_tile(tile: TileKey, content: bytes, content_type: str, tile_format: TileFormat) -> tuple[bytes, str]:
+    """
+    원본을 tile_format으로 변환해서 변형 캐시에 저장
+    변환 결과가 원본보다 크거나 변환에 실패하면 원본을 변형 캐시에 넣어 다시 변환하지 않음
+    """
+    quality = TILE_SATELLITE_QUALITY if tile.map_type == "satellite" else 0
+    started = time.perf_counter()
+    try:
+        with span("tile.transcode"):
+            encoded = await asyncio.get_running_loop().run_in_executor(
+                tile_executor, transcode_tile, content, tile_format, quality,
+            )
+    except Exception as e:
+        print(f"[Tile] transcode failed for {tile}: {e}")
+        encoded = None
+    metrics.tile_transcode_duration.observe(time.perf_counter() - started, format=tile_format)
+
+    if encoded is None or len(encoded) >= len(content):
+        metrics.tile_transcodes.inc(format=tile_format, result="kept_original")
+        result = (content, content_type)
+    else:
+        metrics.tile_transcodes.inc(format=tile_format, result="encoded")
+        metrics.tile_transcode_saved_bytes.observe(len(content) - len(encoded), format=tile_format)
+        result = (encoded, f"image/{tile_format}")
+
+    await _tile_cache.set(*tile, *result, variant=tile_format)
+    return result
+
+
+async def _stale_tile(tile: TileKey, tile_format: TileFormat | None) -> tuple[bytes, str] | None:
+    if tile_format is not None:
+        variant = await _tile_cache.get_stale(*tile, variant=tile_format)
+        if variant is not None:
+            return variant
+    return await _tile_cache.get_stale(*tile)
+
+
+def _tile_response(content: bytes, content_type: str, language: str, region: str, cache_status: str, max_age: int) -> Response:
     return Response(
         content=content,
         media_type=content_type,
         headers={
-            "Cache-Control": f"public, max-age={TILE_CACHE_TTL_SECONDS}",
+            "Cache-Control": f"public, max-age={max_age}",
+            # Accept에 따라 형식이 달라지므로 중간 캐시가 구분하도록
+            "Vary": "Accept",
             "X-Tile-Proxy": "google-map-tiles",
-            "X-Tile-Language": tile_language,
-            "X-Tile-Region": tile_region,
-            "X-Cache": "MISS",
+            "X-Tile-Language": language,
+            "X-Tile-Region": region,
+            "X-Cache": cache_status,
         },
     )
+
+
 if __name__ == "__main__":
+    import secrets
+
     import uvicorn
 
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host=host, port=port)
+    workers = int(os.getenv("WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+    else:
+        # 워커 프로세스는 환경 변수를 물려받으므로 여기서 공유 설정을 맞춰 둠
+        os.environ.setdefault("SHARED_CACHE_PATH", str(Path(DB_PATH).with_name("cache.db")))
+        os.environ.setdefault("OAUTH_STATE_STORE", "sqlite")
+        os.environ.setdefault("EVENT_SOURCE", "changelog")
+        # 내비게이션 세션은 워커 메모리에 있고 uvicorn 워커끼리는 요청을 고정할 수 없음
+        os.environ.setdefault("NAVIGATION_SESSIONS", "off")
+        os.environ.setdefault("SESSION_SECRET", secrets.token_urlsafe(32))
+        uvicorn.run("main:app", host=host, port=port, workers=workers, app_dir=str(Path(__file__).parent))
 
 
@@ -0,0 +1,285 @@
+import math
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Iterable
+
+import httpx
+
+
+# 초 단위 기본 버킷 (1ms ~ 10s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+# 여러 워커의 값을 합쳐 보여줄 때 샘플마다 붙이는 worker 라벨 값
+WORKER_ID = str(os.getpid())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(label for label in extra if label)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self, const: str = "") -> list[str]:
+        """샘플 줄 목록 (const: 모든 샘플에 붙일 라벨, 예: worker=\"123\")"""
+        raise NotImplementedError
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> str:
+        return "\n".join(self.header() + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, const: str = "") -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key, const)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Metric):
+    """값을 직접 set 하거나, collect 콜백으로 수집 시점에 읽어 옴"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Iterable[str] = (),
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]] | None = None,
+    ):
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self, const: str = "") -> list[str]:
+        if self._collect is not None:
+            items = list(self._collect())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key, const)} {_format_value(value)}" for key, value in items]
+
+
+INF_LABEL = 'le="+Inf"'
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 -> (버킷별 개수, 합계, 전체 개수)
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * len(self.buckets), 0.0, 0)
+            counts, total, count = entry
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self, const: str = "") -> list[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, const, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, const, INF_LABEL)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key, const)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key, const)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def collect(self) -> dict[str, list[str]]:
+        """이 프로세스의 샘플을 worker 라벨을 붙여 메트릭 이름별로 (다른 워커가 합쳐서 보여줄 수 있게)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        const = f'worker="{WORKER_ID}"'
+        return {metric.name: metric.samples(const) for metric in metrics}
+
+    def render_merged(self, workers: Iterable[dict[str, list[str]]]) -> str:
+        """여러 워커의 collect() 결과를 메트릭마다 한 묶음으로 출력"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        workers = list(workers)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            for samples in workers:
+                lines.extend(samples.get(metric.name, ()))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, description: str, labelnames: Iterable[str] = ()) -> Counter:
+    return registry.register(Counter(name, description, labelnames))
+
+
+def gauge(name: str, description: str, labelnames: Iterable[str] = (), collect=None) -> Gauge:
+    return registry.register(Gauge(name, description, labelnames, collect))
+
+
+def histogram(name: str, description: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, description, labelnames, buckets))
+
+
+# HTTP
+http_request_duration = histogram(
+    "http_request_duration_seconds", "Request latency until response headers", ("router", "route", "method", "status"),
+)
+http_requests_in_flight = gauge("http_requests_in_flight", "Requests currently being handled")
+http_requests_in_flight.set(0)
+
+# 외부 API (tiles, tile_session, places, directions, oauth)
+upstream_requests = counter("upstream_requests_total", "Upstream API calls by status code", ("api", "status"))
+upstream_duration = histogram("upstream_request_duration_seconds", "Upstream API latency", ("api",))
+upstream_hedges = counter(
+    "upstream_hedges_total", "Hedged upstream requests (sent, won = hedge answered first, no_budget)", ("api", "result"),
+)
+upstream_rejections = counter(
+    "upstream_rejections_total", "Upstream calls refused locally (circuit_open, rate_limited, saturated)", ("api", "reason"),
+)
+
+# 캐시
+cache_requests = counter("cache_requests_total", "Cache lookups", ("cache", "result"))
+cache_evictions = counter("cache_evictions_total", "Entries evicted to stay under the size limit", ("cache",))
+tile_transcodes = counter("tile_transcodes_total", "Tile format conversions (encoded, kept_original = not smaller)", ("format", "result"))
+tile_transcode_duration = histogram("tile_transcode_duration_seconds", "Time to re-encode one tile", ("format",))
+tile_transcode_saved_bytes = histogram(
+    "tile_transcode_saved_bytes", "Bytes saved per converted tile versus the original PNG", ("format",),
+    (1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072),
+)
+tile_prefetch = counter(
+    "tile_prefetch_total", "Predicted tiles (fetched, used = later requested by a client, dropped, failed)", ("result",),
+)
+
+# 내장 보행 경로 탐색
+local_route_duration = histogram(
+    "local_route_duration_seconds", "Shortest-path search time on the local walking graph (algorithm: cch, astar)",
+    ("algorithm",), DB_BUCKETS,
+)
+local_route_customize_duration = histogram(
+    "local_route_customize_duration_seconds", "Time to re-apply obstacle costs to the walking graph hierarchy (kind: partial, full)",
+    ("kind",),
+)
+
+# 내비게이션
+navigation_update_duration = histogram(
+    "navigation_update_duration_seconds", "Time to process one GPS fix in a navigation session", (), DB_BUCKETS,
+)
+
+# 오프라인 팩
+offline_pack_builds = counter("offline_pack_builds_total", "Offline pack builds (kind: full, incremental)", ("kind", "result"))
+offline_pack_build_duration = histogram("offline_pack_build_duration_seconds", "Time to build or refresh an offline pack", ("kind",))
+
+# 장애물 메모리 스냅샷
+place_snapshot_refresh_duration = histogram(
+    "place_snapshot_refresh_duration_seconds", "Time to load or catch up the in-memory obstacle snapshot (kind: full, incremental)",
+    ("kind",), DB_BUCKETS,
+)
+
+# DB
+db_query_duration = histogram("db_query_duration_seconds", "SQLite statement execution time", ("statement",), DB_BUCKETS)
+db_connections_open = gauge("db_connections_open", "Request-scoped SQLite connections currently open")
+db_connections_open.set(0)
+db_connections_opened = counter("db_connections_opened_total", "Request-scoped SQLite connections opened")
+
+
+async def timed_upstream(api: str, request: Awaitable[httpx.Response]) -> httpx.Response:
+    """외부 API 호출을 감싸서 상태 코드별 횟수와 지연 시간 기록"""
+    started = time.perf_counter()
+    try:
+        response = await request
+    except httpx.TimeoutException:
+        upstream_requests.inc(api=api, status="timeout")
+        raise
+    except httpx.HTTPError:
+        upstream_requests.inc(api=api, status="error")
+        raise
+    finally:
+        upstream_duration.observe(time.perf_counter() - started, api=api)
+    upstream_requests.inc(api=api, status=str(response.status_code))
+    return response
@@ -0,0 +1,406 @@
+import asyncio
+import bisect
+import json
+import math
+import os
+import secrets
+import sqlite3
+import time
+from contextlib import closing
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from db import DB_PATH, get_db
+from directions import OBSTACLE_DETECTION_RADIUS, decode_polyline
+from events import Subscription, subscribe, unsubscribe
+from geo import haversine_distance, meters_to_latitude_degrees, meters_to_longitude_degrees, project_onto_segment
+from snapshot import fetch_places, place_snapshot
+
+
+router = APIRouter(prefix="/navigation", tags=["navigation"])
+
+# 현재 위치에서 이 거리(m) 앞까지 남은 경로의 장애물을 알림
+NAVIGATION_LOOKAHEAD_METERS = float(os.getenv("NAVIGATION_LOOKAHEAD_METERS", "300"))
+# 경로에서 이보다 멀면 경로 이탈
+NAVIGATION_OFF_ROUTE_METERS = float(os.getenv("NAVIGATION_OFF_ROUTE_METERS", "40"))
+# 이 시간 동안 위치가 오지 않은 세션은 새 세션을 만들 때 정리
+NAVIGATION_SESSION_TTL_SECONDS = float(os.getenv("NAVIGATION_SESSION_TTL_SECONDS", "1800"))
+NAVIGATION_MAX_SESSIONS = int(os.getenv("NAVIGATION_MAX_SESSIONS", "1000"))
+# 세션은 프로세스 메모리에 있어서 같은 세션의 요청이 모두 같은 프로세스로 와야 함
+# - local: 세션 사용 (단일 워커, 또는 세션 id로 고정 라우팅하는 로드밸런서 뒤의 단일 워커 인스턴스들)
+# - off: 세션 시작을 503으로 거절 (WORKERS가 2 이상일 때 기본값, uvicorn 워커끼리는 요청을 고정할 수 없음)
+NAVIGATION_SESSIONS = os.getenv("NAVIGATION_SESSIONS", "local")
+if NAVIGATION_SESSIONS not in ("local", "off"):
+    raise RuntimeError(f"Unknown NAVIGATION_SESSIONS: {NAVIGATION_SESSIONS}")
+
+# 경로 구간 격자 셀 크기 (약 100m)
+ROUTE_CELL_DEGREES = 0.001
+
+OBSTACLE_COLUMNS = "id, latitude, longitude, type, name, description, verification_count"
+
+
+class RequestNavigationSession(BaseModel):
+    # /directions/walking 응답의 overview_polyline
+    polyline: str
+
+
+class RequestNavigationFix(BaseModel):
+    latitude: float
+    longitude: float
+
+
+def _cell_of(latitude: float, longitude: float) -> tuple[int, int]:
+    return math.floor(latitude / ROUTE_CELL_DEGREES), math.floor(longitude / ROUTE_CELL_DEGREES)
+
+
+class NavigationSession:
+    """
+    등록된 경로 하나의 진행 상태
+
+    - 경로 구간을 격자 셀로 색인해 두고, 위치/장애물은 그 좌표가 속한 셀의 구간만 확인
+    - 경로 근처 장애물은 경로 위 위치(m) 순으로 정렬해서, 위치 업데이트마다 앞쪽 창만 이분 탐색
+    - 위치 업데이트 비용은 경로 전체 길이와 무관함
+    """
+
+    def __init__(self, session_id: str, points: list[tuple[float, float]]):
+        self.id = session_id
+        self.points = points
+        # 각 꼭짓점까지의 경로 거리 (m)
+        self.cumulative = [0.0]
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+            self.cumulative.append(self.cumulative[-1] + haversine_distance(lat1, lng1, lat2, lng2))
+        self.length = self.cumulative[-1]
+
+        reach = max(NAVIGATION_OFF_ROUTE_METERS, OBSTACLE_DETECTION_RADIUS)
+        d_lat = meters_to_latitude_degrees(reach)
+        # 셀 -> 그 셀 안의 점에서 reach 안을 지나는 구간 번호 (오름차순)
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        for segment in range(len(points) - 1):
+            (lat1, lng1), (lat2, lng2) = points[segment], points[segment + 1]
+            d_lng = meters_to_longitude_degrees(reach, max(abs(lat1), abs(lat2)))
+            min_row, min_col = _cell_of(min(lat1, lat2) - d_lat, min(lng1, lng2) - d_lng)
+            max_row, max_col = _cell_of(max(lat1, lat2) + d_lat, max(lng1, lng2) + d_lng)
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    self.cells.setdefault((row, col), []).append(segment)
+
+        lats = [p[0] for p in points]
+        lngs = [p[1] for p in points]
+        d_lng = meters_to_longitude_degrees(OBSTACLE_DETECTION_RADIUS, max(map(abs, lats)))
+        d_lat = meters_to_latitude_degrees(OBSTACLE_DETECTION_RADIUS)
+        self.bbox = (min(lats) - d_lat, min(lngs) - d_lng, max(lats) + d_lat, max(lngs) + d_lng)
+
+        # (경로 위 위치, 장소 id) 정렬 목록과 장소 정보
+        self.ahead: list[tuple[float, int]] = []
+        self.obstacles: dict[int, dict] = {}
+        self.alerted: set[int] = set()
+
+        self.progress = 0.0
+        self.subscription: Subscription | None = None
+        # 구독 이벤트가 누락되어 DB에서 다시 읽어야 함
+        self.stale = False
+        self.connected = False
+        self.last_seen = time.monotonic()
+
+    def _project(self, latitude: float, longitude: float, segment: int) -> tuple[float, float]:
+        """(경로 위 위치, 경로까지 거리)"""
+        (lat1, lng1), (lat2, lng2) = self.points[segment], self.points[segment + 1]
+        t, distance = project_onto_segment(latitude, longitude, lat1, lng1, lat2, lng2)
+        start = self.cumulative[segment]
+        return start + t * (self.cumulative[segment + 1] - start), distance
+
+    def add_place(self, place: dict) -> float | None:
+        """장애물이 남은 경로 근처면 등록하고 경로 위 위치 반환"""
+        if place["id"] in self.obstacles:
+            return None
+
+        # 아직 지나지 않은 부분 중 가장 먼저 만나는 지점
+        best = None
+        for segment in self.cells.get(_cell_of(place["latitude"], place["longitude"]), ()):
+            if self.cumulative[segment + 1] < self.progress:
+                continue
+            along, distance = self._project(place["latitude"], place["longitude"], segment)
+            if distance <= OBSTACLE_DETECTION_RADIUS and along >= self.progress:
+                best = (along, distance)
+                break
+        if best is None:
+            return None
+
+        along, distance = best
+        self.obstacles[place["id"]] = {
+            "id": place["id"],
+            "latitude": place["latitude"],
+            "longitude": place["longitude"],
+            "type": place["type"],
+            "name": place["name"],
+            "description": place["description"],
+            "verification_count": place["verification_count"],
+            "distance_from_route": round(distance, 1),
+        }
+        bisect.insort(self.ahead, (along, place["id"]))
+        return along
+
+    def _upcoming(self) -> list[dict]:
+        start = bisect.bisect_left(self.ahead, (self.progress,))
+        end = bisect.bisect_right(self.ahead, (self.progress + NAVIGATION_LOOKAHEAD_METERS, math.inf))
+        return [
+            {**self.obstacles[place_id], "distance_ahead": round(along - self.progress, 1)}
+            for along, place_id in self.ahead[start:end]
+        ]
+
+    def apply_event(self, event: dict) -> dict | None:
+        """
+        구독 이벤트 반영
+        새 장애물이 바로 앞쪽 창 안에 들어오면 보낼 알림 반환
+        """
+        if event["type"] == "resync":
+            self.stale = True
+            return None
+
+        place = event["place"]
+        known = self.obstacles.get(place["id"])
+        if known is not None:
+            known["verification_count"] = place["verification_count"]
+            return None
+        if event["type"] != "add_place" or place.get("duplicate_of") is not None:
+            return None
+
+        along = self.add_place(place)
+        if along is None or along > self.progress + NAVIGATION_LOOKAHEAD_METERS:
+            return None
+        self.alerted.add(place["id"])
+        return {"type": "alert", "alerts": [{**self.obstacles[place["id"]], "distance_ahead": round(along - self.progress, 1)}]}
+
+    def drain_events(self) -> None:
+        """POST로 위치를 받을 때: 그동안 쌓인 구독 이벤트를 한꺼번에 반영"""
+        queue = self.subscription.queue
+        while not queue.empty():
+            event = queue.get_nowait()
+            if self.apply_event(event) is not None:
+                # 다음 응답의 alerts로 전달
+                self.alerted.discard(event["place"]["id"])
+        if self.subscription.lagged:
+            self.subscription.lagged = False
+            self.stale = True
+
+    def update(self, latitude: float, longitude: float) -> dict:
+        """GPS 위치 하나 반영 (주변 셀의 구간과 앞쪽 창의 장애물만 확인)"""
+        started = time.perf_counter()
+        self.last_seen = time.monotonic()
+
+        # 지금 진행 위치 근처에서 가장 가까운 구간, 없으면 (건너뛰었거나 되돌아감) 어디든 가장 가까운 구간
+        near = far = None
+        low, high = self.progress - NAVIGATION_OFF_ROUTE_METERS, self.progress + NAVIGATION_LOOKAHEAD_METERS
+        for segment in self.cells.get(_cell_of(latitude, longitude), ()):
+            along, distance = self._project(latitude, longitude, segment)
+            if distance > NAVIGATION_OFF_ROUTE_METERS:
+                continue
+            if low <= along <= high:
+                if near is None or distance < near[1]:
+                    near = (along, distance)
+            elif far is None or distance < far[1]:
+                far = (along, distance)
+        match = near or far
+        if match is not None:
+            self.progress = match[0]
+
+        upcoming = self._upcoming()
+        alerts = [obstacle for obstacle in upcoming if obstacle["id"] not in self.alerted]
+        self.alerted.update(obstacle["id"] for obstacle in alerts)
+
+        metrics.navigation_update_duration.observe(time.perf_counter() - started)
+        return {
+            "type": "position",
+            "on_route": match is not None,
+            "distance_from_route": round(match[1], 1) if match is not None else None,
+            "progress_meters": round(self.progress, 1),
+            "remaining_meters": round(self.length - self.progress, 1),
+            "upcoming": upcoming,
+            "alerts": alerts,
+        }
+
+
+_sessions: dict[str, NavigationSession] = {}
+
+
+def session_count() -> int:
+    return len(_sessions)
+
+
+def _close_session(session: NavigationSession) -> None:
+    _sessions.pop(session.id, None)
+    if session.subscription is not None:
+        unsubscribe(session.subscription.id)
+
+
+def _expire_sessions() -> None:
+    deadline = time.monotonic() - NAVIGATION_SESSION_TTL_SECONDS
+    for session in list(_sessions.values()):
+        if not session.connected and session.last_seen < deadline:
+            _close_session(session)
+
+
+def _get_session(session_id: str) -> NavigationSession:
+    session = _sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Navigation session not found")
+    return session
+
+
+def _query_places(db: sqlite3.Connection, points: list[tuple[float, float]]) -> list[dict]:
+    place_snapshot.ensure(db)
+    matched = place_snapshot.near_route(points, OBSTACLE_DETECTION_RADIUS)
+    return [dict(row) for row in fetch_places(db, OBSTACLE_COLUMNS, [place_id for place_id, _ in matched])]
+
+
+def _load_places(points: list[tuple[float, float]]) -> list[dict]:
+    """요청 밖(WebSocket)에서 다시 읽을 때"""
+    with closing(sqlite3.connect(DB_PATH, check_same_thread=False)) as conn:
+        conn.row_factory = sqlite3.Row
+        return _query_places(conn, points)
+
+
+def _resync(session: NavigationSession, places: list[dict]) -> None:
+    session.stale = False
+    for place in places:
+        session.add_place(place)
+
+
+@router.post("/sessions")
+async def create_session(
+    req: RequestNavigationSession,
+    db: sqlite3.Connection = Depends(get_db),
+) -> dict:
+    """
+    내비게이션 세션 시작
+
+    - 길찾기에서 고른 경로(overview_polyline)를 등록
+    - 이후 위치를 POST /navigation/sessions/{id}/fixes 또는 WebSocket으로 보내면 앞쪽 장애물을 알려줌
+    """
+    if NAVIGATION_SESSIONS == "off":
+        raise HTTPException(
+            status_code=503,
+            detail="Navigation sessions need a single worker process (NAVIGATION_SESSIONS=off)",
+        )
+
+    try:
+        points = decode_polyline(req.polyline)
+    except IndexError:
+        raise HTTPException(status_code=400, detail="Invalid polyline")
+    if len(points) < 2:
+        raise HTTPException(status_code=400, detail="Route must have at least two points")
+
+    _expire_sessions()
+    if len(_sessions) >= NAVIGATION_MAX_SESSIONS:
+        raise HTTPException(status_code=503, detail="Too many navigation sessions")
+
+    session = await run_in_threadpool(NavigationSession, secrets.token_urlsafe(16), points)
+    # 조회와 구독 사이에 들어온 제보를 놓치지 않도록 먼저 구독 (중복은 id로 걸러짐)
+    session.subscription = subscribe(session.bbox)
+    try:
+        places = await run_in_threadpool(_query_places, db, session.points)
+    except Exception:
+        unsubscribe(session.subscription.id)
+        raise
+    _resync(session, places)
+    _sessions[session.id] = session
+
+    return {
+        "message": "Navigation session started",
+        "session_id": session.id,
+        "route_distance": round(session.length, 1),
+        "obstacle_count": len(session.obstacles),
+        "lookahead_meters": NAVIGATION_LOOKAHEAD_METERS,
+    }
+
+
+@router.post("/sessions/{session_id}/fixes")
+async def post_fix(
+    session_id: str,
+    req: RequestNavigationFix,
+    db: sqlite3.Connection = Depends(get_db),
+) -> dict:
+    """
+    현재 위치 전달
+
+    - alerts: 이번에 처음 앞쪽 NAVIGATION_LOOKAHEAD_METERS 안에 들어온 장애물 (세션 중 새로 제보된 것 포함)
+    - upcoming: 앞쪽 창 안의 모든 장애물
+    """
+    session = _get_session(session_id)
+    session.drain_events()
+    if session.stale:
+        _resync(session, await run_in_threadpool(_query_places, db, session.points))
+    return session.update(req.latitude, req.longitude)
+
+
+@router.delete("/sessions/{session_id}")
+def close_session(session_id: str) -> dict:
+    """내비게이션 종료"""
+    _close_session(_get_session(session_id))
+    return {"message": "Navigation session closed", "session_id": session_id}
+
+
+def _parse_fix(message: dict) -> RequestNavigationFix:
+    """WebSocket 메시지 하나를 위치로 (텍스트/바이너리 프레임 모두 JSON 객체여야 함)"""
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    payload = message.get("text")
+    if payload is None:
+        payload = message.get("bytes") or b""
+    data = json.loads(payload)
+    if not isinstance(data, dict):
+        raise TypeError("Fix must be a JSON object")
+    return RequestNavigationFix(**data)
+
+
+@router.websocket("/sessions/{session_id}/ws")
+async def navigation_socket(websocket: WebSocket, session_id: str) -> None:
+    """
+    위치 스트리밍 (WebSocket)
+
+    - 클라이언트: {"latitude": ..., "longitude": ...}
+    - 서버: 위치마다 position 메시지, 그 사이 앞쪽에 새 장애물이 제보되면 바로 alert 메시지
+    """
+    session = _sessions.get(session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    session.connected = True
+    queue = session.subscription.queue
+    receive = asyncio.ensure_future(websocket.receive())
+    event = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receive, event}, return_when=asyncio.FIRST_COMPLETED)
+
+            if event in done:
+                alert = session.apply_event(event.result())
+                if alert is not None:
+                    await websocket.send_json(alert)
+                if session.subscription.lagged:
+                    session.subscription.lagged = False
+                    session.stale = True
+                event = asyncio.ensure_future(queue.get())
+
+            if receive in done:
+                try:
+                    fix = _parse_fix(receive.result())
+                except (ValueError, TypeError, ValidationError):
+                    await websocket.send_json({"type": "error", "detail": "Invalid fix"})
+                else:
+                    if session.stale:
+                        _resync(session, await run_in_threadpool(_load_places, session.points))
+                    await websocket.send_json(session.update(fix.latitude, fix.longitude))
+                receive = asyncio.ensure_future(websocket.receive())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receive.cancel()
+        event.cancel()
+        session.connected = False
+        session.last_seen = time.monotonic()
@@ -0,0 +1,650 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Literal, NamedTuple
+
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+import metrics
+from db import DB_PATH, init_db
+from directions import decode_polyline
+from geo import bbox_around, haversine_distance, point_to_segment_distance, tile_xy
+from imaging import TILE_SATELLITE_QUALITY, rendition_key, tile_executor, transcode_tile
+from prefetch import TileKey
+from storage import image_store
+
+
+router = APIRouter(prefix="/offline", tags=["offline"])
+
+OFFLINE_PACK_PATH = Path(os.getenv("OFFLINE_PACK_PATH", "./offline_packs"))
+# 팩 하나에 넣을 수 있는 최대 타일 수
+OFFLINE_PACK_MAX_TILES = int(os.getenv("OFFLINE_PACK_MAX_TILES", "3000"))
+# 디스크에 남겨 둘 팩 수 (넘으면 오래 안 받은 팩부터 지움)
+OFFLINE_PACK_MAX_PACKS = int(os.getenv("OFFLINE_PACK_MAX_PACKS", "200"))
+# 이보다 오래된 팩은 다시 요청하면 타일까지 새로 만듦 (초)
+OFFLINE_PACK_MAX_AGE_SECONDS = int(os.getenv("OFFLINE_PACK_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+# 동시에 만드는 팩 수 / 팩 하나가 동시에 받는 타일 수
+OFFLINE_PACK_BUILDS = int(os.getenv("OFFLINE_PACK_BUILDS", "2"))
+OFFLINE_PACK_TILE_CONCURRENCY = int(os.getenv("OFFLINE_PACK_TILE_CONCURRENCY", "4"))
+# 업스트림 보호로 거절된 타일을 다시 시도하는 횟수
+OFFLINE_TILE_RETRIES = 3
+TILE_WRITE_BATCH = 256
+MAX_CORRIDOR_METERS = 1000
+
+MapType = Literal["roadmap", "satellite", "terrain"]
+PackTileFormat = Literal["png", "webp"]
+PackState = Literal["queued", "building", "ready", "failed"]
+
+# 오프라인 팩에 넣는 장소 컬럼 (제보자 ID는 넣지 않음)
+PACK_PLACE_COLUMNS = "id, name, latitude, longitude, description, type, has_image, image_hash, verification_count, created_at, updated_at"
+
+PACK_SCHEMA = """
+    CREATE TABLE metadata (name TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE tiles (
+        zoom_level INTEGER,
+        tile_column INTEGER,
+        tile_row INTEGER,
+        tile_data BLOB
+    );
+    CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    CREATE TABLE warning_places (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        description TEXT NOT NULL,
+        type TEXT,
+        has_image INTEGER,
+        image_hash TEXT,
+        verification_count INTEGER,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP
+    );
+    CREATE INDEX idx_warning_places_coords ON warning_places (latitude, longitude);
+    CREATE TABLE place_images (image_hash TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+
+class RequestOfflinePack(BaseModel):
+    # 영역: bbox 또는 경로(/directions/walking 응답의 overview_polyline) 중 하나
+    sw_latitude: float | None = None
+    sw_longitude: float | None = None
+    ne_latitude: float | None = None
+    ne_longitude: float | None = None
+    polyline: str | None = None
+    corridor_meters: float = 200
+    min_zoom: int = 14
+    max_zoom: int = 17
+    mapType: MapType | None = None
+    lang: str | None = None
+    region: str | None = None
+    tile_format: PackTileFormat = "png"
+
+
+class TileSource(NamedTuple):
+    """팩에 넣을 타일을 가져오는 쪽 (서버의 타일 캐시/Google 세션/업스트림 보호를 그대로 씀)"""
+    load: Callable[[TileKey], Awaitable[tuple[bytes, str]]]
+    # (mapType, lang, region) 검증 + 기본값 적용
+    style: Callable[[str | None, str | None, str | None], tuple[str, str, str]]
+    max_zoom: int
+
+
+class PackSpec(NamedTuple):
+    bbox: tuple[float, float, float, float] | None
+    route: tuple[tuple[float, float], ...] | None
+    corridor: float
+    min_zoom: int
+    max_zoom: int
+    map_type: str
+    language: str
+    region: str
+    tile_format: str
+
+    @property
+    def pack_id(self) -> str:
+        """같은 영역/옵션이면 같은 팩을 쓰도록 스펙 해시를 ID로 사용"""
+        return hashlib.sha256(json.dumps(self._asdict(), sort_keys=True).encode()).hexdigest()[:16]
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        """(min_lat, min_lng, max_lat, max_lng)"""
+        if self.bbox is not None:
+            return self.bbox
+        boxes = [bbox_around(lat, lng, self.corridor) for lat, lng in self.route]
+        return (
+            min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes),
+        )
+
+    def covering_boxes(self) -> list[tuple[float, float, float, float]]:
+        """영역을 덮는 사각형들 (경로면 corridor 간격으로 찍은 점마다 하나)"""
+        if self.bbox is not None:
+            return [self.bbox]
+        boxes = []
+        step = max(self.corridor, 10)
+        points = self.route
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:] or points):
+            count = max(1, math.ceil(haversine_distance(lat1, lng1, lat2, lng2) / step))
+            for i in range(count + 1):
+                t = i / count
+                boxes.append(bbox_around(lat1 + (lat2 - lat1) * t, lng1 + (lng2 - lng1) * t, self.corridor))
+        return boxes
+
+    def tiles(self) -> list[TileKey]:
+        keys: set[tuple[int, int, int]] = set()
+        boxes = self.covering_boxes()
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            for min_lat, min_lng, max_lat, max_lng in boxes:
+                min_x, min_y = tile_xy(max_lat, min_lng, z)
+                max_x, max_y = tile_xy(min_lat, max_lng, z)
+                keys.update((z, x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1))
+                if len(keys) > OFFLINE_PACK_MAX_TILES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Offline pack exceeds {OFFLINE_PACK_MAX_TILES} tiles, reduce the area or zoom range",
+                    )
+        return [TileKey(z, x, y, self.map_type, self.language, self.region) for z, x, y in sorted(keys)]
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        if self.bbox is not None:
+            min_lat, min_lng, max_lat, max_lng = self.bbox
+            return min_lat <= latitude <= max_lat and min_lng <= longitude <= max_lng
+        points = self.route
+        return any(
+            point_to_segment_distance(latitude, longitude, a[0], a[1], b[0], b[1]) <= self.corridor
+            for a, b in zip(points, points[1:] or points)
+        )
+
+
+class PackJob:
+    def __init__(self, spec: PackSpec, tiles: list[TileKey]):
+        self.spec = spec
+        self.tiles = tiles
+        self.state: PackState = "queued"
+        self.tiles_done = 0
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+
+
+_tile_source: TileSource | None = None
+_jobs: dict[str, PackJob] = {}
+# 팩 파일을 바꾸는 작업(빌드, 증분 갱신)은 팩마다 하나씩
+_pack_locks: dict[str, asyncio.Lock] = {}
+# 팩과 무관한 변경만 있었던 커서 (파일을 다시 쓰지 않고 건너뜀)
+_checked_cursors: dict[str, int] = {}
+_build_slots = asyncio.Semaphore(OFFLINE_PACK_BUILDS)
+
+
+def set_tile_source(source: TileSource) -> None:
+    global _tile_source
+    _tile_source = source
+
+
+def spec_from_request(req: RequestOfflinePack, source: TileSource) -> PackSpec:
+    if not 0 <= req.min_zoom <= req.max_zoom <= source.max_zoom:
+        raise HTTPException(status_code=400, detail="Invalid zoom range")
+    if not 0 < req.corridor_meters <= MAX_CORRIDOR_METERS:
+        raise HTTPException(status_code=400, detail=f"corridor_meters must be in (0, {MAX_CORRIDOR_METERS}]")
+
+    corners = (req.sw_latitude, req.sw_longitude, req.ne_latitude, req.ne_longitude)
+    bbox = route = None
+    if req.polyline:
+        try:
+            points = decode_polyline(req.polyline)
+        except IndexError:
+            raise HTTPException(status_code=400, detail="Invalid polyline")
+        if not points:
+            raise HTTPException(status_code=400, detail="Invalid polyline")
+        route = tuple((round(lat, 5), round(lng, 5)) for lat, lng in points)
+    elif all(value is not None for value in corners):
+        if req.sw_latitude > req.ne_latitude or req.sw_longitude > req.ne_longitude:
+            raise HTTPException(status_code=400, detail="Invalid bounding box")
+        bbox = tuple(round(value, 5) for value in corners)
+    else:
+        raise HTTPException(status_code=400, detail="Either a bounding box or a polyline is required")
+
+    map_type, language, region = source.style(req.mapType, req.lang, req.region)
+    return PackSpec(
+        bbox, route, req.corridor_meters if route else 0, req.min_zoom, req.max_zoom,
+        map_type, language, region, req.tile_format,
+    )
+
+
+def pack_path(pack_id: str) -> Path:
+    if not pack_id.isalnum():
+        raise HTTPException(status_code=404, detail="Offline pack not found")
+    return OFFLINE_PACK_PATH / f"{pack_id}.mbtiles"
+
+
+def read_pack_metadata(path: Path) -> dict[str, str] | None:
+    if not path.is_file():
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return dict(conn.execute("SELECT name, value FROM metadata"))
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+
+def _latest_cursor(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM place_changes").fetchone()[0]
+
+
+def _place_rows(conn: sqlite3.Connection, spec: PackSpec, since: int | None = None) -> list[sqlite3.Row]:
+    """
+    팩 영역 안의 장소 (중복 제보 제외)
+    since가 있으면 그 커서 이후 바뀐 장소만
+    """
+    min_lat, min_lng, max_lat, max_lng = spec.bounds()
+    columns = ", ".join(f"p.{column.strip()}" for column in PACK_PLACE_COLUMNS.split(","))
+    if since is None:
+        rows = conn.execute(
+            f"""SELECT {columns} FROM warning_places p
+               WHERE p.latitude >= ? AND p.latitude <= ? AND p.longitude >= ? AND p.longitude <= ?
+               AND p.duplicate_of IS NULL""",
+            (min_lat, max_lat, min_lng, max_lng),
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            f"""SELECT DISTINCT {columns} FROM place_changes c
+               JOIN warning_places p ON p.id = c.place_id
+               WHERE c.id > ?
+               AND p.latitude >= ? AND p.latitude <= ? AND p.longitude >= ? AND p.longitude <= ?
+               AND p.duplicate_of IS NULL""",
+            (since, min_lat, max_lat, min_lng, max_lng),
+        ).fetchall()
+    return [row for row in rows if spec.contains(row["latitude"], row["longitude"])]
+
+
+def _write_places(pack: sqlite3.Connection, rows: Iterable[sqlite3.Row]) -> int:
+    """장소와 썸네일을 팩에 기록, 기록한 장소 수 반환"""
+    placeholders = ", ".join("?" for _ in PACK_PLACE_COLUMNS.split(","))
+    count = 0
+    for row in rows:
+        pack.execute(f"INSERT OR REPLACE INTO warning_places ({PACK_PLACE_COLUMNS}) VALUES ({placeholders})", tuple(row))
+        count += 1
+        image_hash = row["image_hash"]
+        if not row["has_image"] or image_hash is None:
+            continue
+        if pack.execute("SELECT 1 FROM place_images WHERE image_hash = ?", (image_hash,)).fetchone():
+            continue
+        try:
+            data = image_store.read(rendition_key(image_hash, "thumb", "webp"))
+        except Exception as e:
+            print(f"[Offline] thumbnail read failed for {image_hash}: {e}")
+            continue
+        if data is not None:
+            pack.execute("INSERT INTO place_images (image_hash, data) VALUES (?, ?)", (image_hash, data))
+    return count
+
+
+def _set_metadata(pack: sqlite3.Connection, values: dict[str, object]) -> None:
+    pack.executemany(
+        "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+        [(name, str(value)) for name, value in values.items()],
+    )
+
+
+def _create_pack(path: Path, spec: PackSpec) -> sqlite3.Connection:
+    pack = sqlite3.connect(path, check_same_thread=False)
+    pack.executescript(PACK_SCHEMA)
+    min_lat, min_lng, max_lat, max_lng = spec.bounds()
+    _set_metadata(pack, {
+        # MBTiles 1.3 필수/권장 항목
+        "name": f"offline-{spec.pack_id}",
+        "format": spec.tile_format,
+        "type": "baselayer",
+        "version": "1",
+        "bounds": f"{min_lng},{min_lat},{max_lng},{max_lat}",
+        "center": f"{(min_lng + max_lng) / 2},{(min_lat + max_lat) / 2},{spec.min_zoom}",
+        "minzoom": spec.min_zoom,
+        "maxzoom": spec.max_zoom,
+        # 이 서비스 전용 항목
+        "pack_id": spec.pack_id,
+        "spec": json.dumps(spec._asdict()),
+    })
+    return pack
+
+
+def _fill_places(pack: sqlite3.Connection, spec: PackSpec) -> tuple[int, int]:
+    """장소/썸네일을 채우고 (커서, 장소 수) 반환"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        # 장소를 읽기 전에 커서를 잡아야 읽는 동안 생긴 변경을 다음 증분 갱신에서 놓치지 않음
+        cursor = _latest_cursor(conn)
+        count = _write_places(pack, _place_rows(conn, spec))
+    finally:
+        conn.close()
+    _set_metadata(pack, {"cursor": cursor, "places": count})
+    return cursor, count
+
+
+def _spec_from_metadata(metadata: dict[str, str]) -> PackSpec:
+    values = json.loads(metadata["spec"])
+    values["bbox"] = tuple(values["bbox"]) if values["bbox"] else None
+    values["route"] = tuple(tuple(point) for point in values["route"]) if values["route"] else None
+    return PackSpec(**values)
+
+
+async def _load_pack_tile(source: TileSource, tile: TileKey, tile_format: str) -> bytes | None:
+    for attempt in range(OFFLINE_TILE_RETRIES + 1):
+        try:
+            content, _ = await source.load(tile)
+            break
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None  # 해당 줌에 타일이 없는 지역 (위성 등)
+            if e.status_code not in (429, 503) or attempt == OFFLINE_TILE_RETRIES:
+                raise
+            retry_after = float((e.headers or {}).get("Retry-After", 2 ** attempt))
+            await asyncio.sleep(retry_after)
+
+    if tile_format == "png":
+        return content
+    quality = TILE_SATELLITE_QUALITY if tile.map_type == "satellite" else 0
+    return await asyncio.get_running_loop().run_in_executor(tile_executor, transcode_tile, content, "webp", quality)
+
+
+async def build_pack(spec: PackSpec, source: TileSource, job: PackJob | None = None) -> Path:
+    """
+    타일 + 장소 + 썸네일을 담은 MBTiles 파일을 만들어 pack_path에 놓음
+    임시 파일에 만든 뒤 교체하므로 빌드 중에도 이전 팩을 내려받을 수 있음
+    """
+    OFFLINE_PACK_PATH.mkdir(parents=True, exist_ok=True)
+    final = pack_path(spec.pack_id)
+    tmp = OFFLINE_PACK_PATH / f".{spec.pack_id}.{uuid.uuid4().hex}.tmp"
+    tiles = job.tiles if job is not None else spec.tiles()
+    started = time.perf_counter()
+
+    pack = _create_pack(tmp, spec)
+    try:
+        pending: list[tuple[int, int, int, bytes]] = []
+        slots = asyncio.Semaphore(OFFLINE_PACK_TILE_CONCURRENCY)
+
+        async def fetch(tile: TileKey) -> None:
+            async with slots:
+                data = await _load_pack_tile(source, tile, spec.tile_format)
+            if data is not None:
+                # MBTiles는 TMS 규칙이라 y축이 반대
+                pending.append((tile.z, tile.x, (1 << tile.z) - 1 - tile.y, data))
+            if job is not None:
+                job.tiles_done += 1
+
+        def flush(rows: list[tuple[int, int, int, bytes]]) -> None:
+            pack.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", rows)
+
+        for start in range(0, len(tiles), TILE_WRITE_BATCH):
+            await asyncio.gather(*(fetch(tile) for tile in tiles[start:start + TILE_WRITE_BATCH]))
+            rows, pending = pending, []
+            await asyncio.to_thread(flush, rows)
+
+        cursor, _ = await asyncio.to_thread(_fill_places, pack, spec)
+        _set_metadata(pack, {"built_at": int(time.time()), "tiles": len(tiles)})
+        pack.commit()
+        pack.close()
+        os.replace(tmp, final)
+    except BaseException:
+        metrics.offline_pack_builds.inc(kind="full", result="failed")
+        raise
+    finally:
+        pack.close()
+        tmp.unlink(missing_ok=True)
+
+    _checked_cursors[spec.pack_id] = cursor
+    metrics.offline_pack_builds.inc(kind="full", result="ok")
+    metrics.offline_pack_build_duration.observe(time.perf_counter() - started, kind="full")
+    _evict_old_packs()
+    return final
+
+
+def refresh_pack(path: Path) -> int | None:
+    """
+    팩을 만든 뒤 바뀐 장소만 반영 (증분 갱신), 반영했으면 새 커서 반환
+    다운로드 중인 파일을 건드리지 않도록 복사본을 고친 뒤 교체
+    """
+    metadata = read_pack_metadata(path)
+    if metadata is None:
+        return None
+    pack_id, pack_cursor = metadata["pack_id"], int(metadata["cursor"])
+    checked = max(pack_cursor, _checked_cursors.get(pack_id, 0))
+
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        latest = _latest_cursor(conn)
+        if latest <= checked:
+            return None
+        started = time.perf_counter()
+        rows = _place_rows(conn, _spec_from_metadata(metadata), since=pack_cursor)
+    finally:
+        conn.close()
+
+    if not rows:
+        _checked_cursors[pack_id] = latest
+        return None
+
+    tmp = path.with_name(f".{pack_id}.{uuid.uuid4().hex}.tmp")
+    try:
+        shutil.copyfile(path, tmp)
+        pack = sqlite3.connect(tmp)
+        try:
+            _write_places(pack, rows)
+            places = pack.execute("SELECT COUNT(*) FROM warning_places").fetchone()[0]
+            _set_metadata(pack, {"cursor": latest, "places": places, "updated_at": int(time.time())})
+            pack.commit()
+        finally:
+            pack.close()
+        os.replace(tmp, path)
+    except Exception:
+        metrics.offline_pack_builds.inc(kind="incremental", result="failed")
+        raise
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    _checked_cursors[pack_id] = latest
+    metrics.offline_pack_builds.inc(kind="incremental", result="ok")
+    metrics.offline_pack_build_duration.observe(time.perf_counter() - started, kind="incremental")
+    return latest
+
+
+def _evict_old_packs() -> None:
+    packs = sorted(OFFLINE_PACK_PATH.glob("*.mbtiles"), key=lambda path: path.stat().st_mtime)
+    for path in packs[:max(0, len(packs) - OFFLINE_PACK_MAX_PACKS)]:
+        path.unlink(missing_ok=True)
+        _checked_cursors.pop(path.stem, None)
+
+
+def job_counts() -> list[tuple[tuple[str], int]]:
+    return [((state,), sum(1 for job in _jobs.values() if job.state == state)) for state in ("queued", "building", "failed")]
+
+
+def _pack_lock(pack_id: str) -> asyncio.Lock:
+    lock = _pack_locks.get(pack_id)
+    if lock is None:
+        lock = _pack_locks[pack_id] = asyncio.Lock()
+    return lock
+
+
+async def _run_build(job: PackJob, source: TileSource) -> None:
+    pack_id = job.spec.pack_id
+    try:
+        async with _build_slots, _pack_lock(pack_id):
+            job.state = "building"
+            await build_pack(job.spec, source, job)
+        job.state = "ready"
+        _jobs.pop(pack_id, None)
+    except Exception as e:
+        print(f"[Offline] pack {pack_id} build failed: {e}")
+        job.state = "failed"
+        job.error = e.detail if isinstance(e, HTTPException) else str(e)
+
+
+def _pack_status(pack_id: str) -> dict | None:
+    job = _jobs.get(pack_id)
+    metadata = read_pack_metadata(pack_path(pack_id))
+    if job is None and metadata is None:
+        return None
+
+    status = {
+        "pack_id": pack_id,
+        "status": job.state if job is not None else "ready",
+        "download_url": f"/offline/packs/{pack_id}/download" if metadata is not None else None,
+    }
+    if job is not None:
+        status.update(tiles_total=len(job.tiles), tiles_done=job.tiles_done, error=job.error)
+    if metadata is not None:
+        # 새로 만드는 중이어도 이전 팩은 받을 수 있음
+        status.update(
+            tiles=int(metadata["tiles"]),
+            places=int(metadata["places"]),
+            cursor=int(metadata["cursor"]),
+            built_at=int(metadata["built_at"]),
+            size_bytes=pack_path(pack_id).stat().st_size,
+        )
+    return status
+
+
+def _require_source() -> TileSource:
+    if _tile_source is None:
+        raise HTTPException(status_code=503, detail="Offline packs are not available")
+    return _tile_source
+
+
+@router.post("/packs")
+async def create_offline_pack(req: RequestOfflinePack, response: Response) -> dict:
+    """
+    오프라인 팩 생성 요청 (지하/무선 불가 구간용)
+
+    - bbox 또는 경로 polyline + corridor_meters로 영역 지정
+    - 같은 영역/옵션의 팩이 있으면 바로 반환, 없으면 백그라운드로 만들고 202
+    - 만들어진 팩은 /offline/packs/{pack_id}/download로 내려받음
+    """
+    source = _require_source()
+    spec = spec_from_request(req, source)
+    pack_id = spec.pack_id
+
+    job = _jobs.get(pack_id)
+    if job is None or job.state == "failed":
+        _jobs.pop(pack_id, None)
+        metadata = read_pack_metadata(pack_path(pack_id))
+        expired = metadata is None or time.time() - int(metadata["built_at"]) > OFFLINE_PACK_MAX_AGE_SECONDS
+        if expired:
+            job = _jobs[pack_id] = PackJob(spec, spec.tiles())
+            job.task = asyncio.create_task(_run_build(job, source))
+
+    status = _pack_status(pack_id)
+    if status["status"] != "ready":
+        response.status_code = 202
+    return {"message": "Offline pack requested", **status}
+
+
+@router.get("/packs/{pack_id}")
+def get_offline_pack(pack_id: str) -> dict:
+    status = _pack_status(pack_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Offline pack not found")
+    return {"message": "Offline pack status retrieved successfully", **status}
+
+
+@router.get("/packs/{pack_id}/download")
+async def download_offline_pack(pack_id: str) -> FileResponse:
+    """MBTiles(SQLite) 파일, 만든 뒤 바뀐 장소는 내려주기 전에 반영"""
+    path = pack_path(pack_id)
+    if not path.is_file():
+        if pack_id in _jobs:
+            raise HTTPException(status_code=409, detail="Offline pack is still building")
+        raise HTTPException(status_code=404, detail="Offline pack not found")
+
+    async with _pack_lock(pack_id):
+        try:
+            await asyncio.to_thread(refresh_pack, path)
+        except (sqlite3.Error, OSError) as e:
+            # 갱신에 실패해도 이전 내용은 그대로 받을 수 있음
+            print(f"[Offline] pack {pack_id} refresh failed: {e}")
+        metadata = read_pack_metadata(path)
+        # 최근에 받은 팩이 정리 대상에서 밀리도록
+        os.utime(path)
+
+    return FileResponse(
+        path,
+        media_type="application/vnd.sqlite3",
+        filename=f"{pack_id}.mbtiles",
+        headers={
+            "Cache-Control": "private, no-cache",
+            "ETag": f'"{pack_id}-{metadata["cursor"]}"',
+            "X-Pack-Cursor": metadata["cursor"],
+        },
+    )
+
+
+def _parse_floats(value: str, count: int) -> tuple[float, ...]:
+    parts = tuple(float(part) for part in value.split(","))
+    if len(parts) != count:
+        raise argparse.ArgumentTypeError(f"expected {count} comma-separated numbers")
+    return parts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="오프라인 팩(MBTiles + 장애물) 생성/갱신")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="영역의 팩을 새로 만듦")
+    area = build_parser.add_mutually_exclusive_group(required=True)
+    area.add_argument("--bbox", type=lambda v: _parse_floats(v, 4), help="sw_lat,sw_lng,ne_lat,ne_lng")
+    area.add_argument("--polyline", help="경로 (Google encoded polyline)")
+    build_parser.add_argument("--corridor", type=float, default=200, help="경로 양옆 폭 (미터)")
+    build_parser.add_argument("--min-zoom", type=int, default=14)
+    build_parser.add_argument("--max-zoom", type=int, default=17)
+    build_parser.add_argument("--map-type", choices=["roadmap", "satellite", "terrain"])
+    build_parser.add_argument("--lang")
+    build_parser.add_argument("--region")
+    build_parser.add_argument("--tile-format", choices=["png", "webp"], default="png")
+    build_parser.add_argument("--output", type=Path, help="만든 팩을 복사할 경로")
+
+    refresh_parser = sub.add_parser("refresh", help="팩에 바뀐 장소만 반영")
+    refresh_parser.add_argument("pack_id")
+
+    args = parser.parse_args()
+    init_db()
+
+    if args.command == "refresh":
+        cursor = refresh_pack(pack_path(args.pack_id))
+        print(f"Updated to cursor {cursor}" if cursor is not None else "Already up to date")
+    else:
+        # 서버와 같은 타일 캐시/Google 세션/업스트림 보호를 쓰도록 main의 타일 로더 사용
+        import main
+
+        request = RequestOfflinePack(
+            polyline=args.polyline,
+            corridor_meters=args.corridor,
+            min_zoom=args.min_zoom,
+            max_zoom=args.max_zoom,
+            mapType=args.map_type,
+            lang=args.lang,
+            region=args.region,
+            tile_format=args.tile_format,
+            **dict(zip(("sw_latitude", "sw_longitude", "ne_latitude", "ne_longitude"), args.bbox or ())),
+        )
+
+        async def run() -> Path:
+            async with main.lifespan(main.app):
+                spec = spec_from_request(request, main.offline_tile_source)
+                print(f"Building pack {spec.pack_id} ({len(spec.tiles())} tiles)")
+                return await build_pack(spec, main.offline_tile_source)
+
+        built = asyncio.run(run())
+        if args.output:
+            shutil.copyfile(built, args.output)
+        print(json.dumps(read_pack_metadata(args.output or built), ensure_ascii=False, indent=2))
@@ -5,11 +5,14 @@ import httpx
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
+from upstream import get_guard
+
 
 router = APIRouter(prefix="/places", tags=["places"])
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-PLACES_BASE_URL = "https://maps.googleapis.com/maps/api/place"
+GOOGLE_MAPS_API_BASE = os.getenv("GOOGLE_MAPS_API_BASE", "https://maps.googleapis.com").rstrip("/")
+PLACES_BASE_URL = f"{GOOGLE_MAPS_API_BASE}/maps/api/place"
 
 
 class TextSearchRequest(BaseModel):
@@ -44,7 +47,7 @@ async def _make_places_request(endpoint: str, params: dict) -> dict:
     url = f"{PLACES_BASE_URL}/{endpoint}/json"
 
     async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(url, params=params)
+        response = await get_guard("places").call(lambda: client.get(url, params=params))
 
     if response.status_code != 200:
         raise HTTPException(status_code=502, detail="Google Places API request failed")
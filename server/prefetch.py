@@ -0,0 +1,223 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, NamedTuple
+
+import metrics
+
+
+# 백그라운드로 타일을 미리 받아 올 작업 수 (0이면 끔)
+TILE_PREFETCH_WORKERS = int(os.getenv("TILE_PREFETCH_WORKERS", "0"))
+TILE_PREFETCH_QUEUE_SIZE = int(os.getenv("TILE_PREFETCH_QUEUE_SIZE", "512"))
+# 이동 방향으로 화면 밖 몇 줄까지 미리 받을지
+TILE_PREFETCH_DEPTH = int(os.getenv("TILE_PREFETCH_DEPTH", "1"))
+# 실제 요청의 타일 업스트림 호출이 이만큼 진행 중이면 미리 받기를 쉼
+TILE_PREFETCH_MAX_UPSTREAM = int(os.getenv("TILE_PREFETCH_MAX_UPSTREAM", "8"))
+
+# 이 시간 안의 요청들을 현재 화면으로 봄
+PREFETCH_WINDOW_SECONDS = 2.0
+PREFETCH_HISTORY = 64
+PREFETCH_MAX_CLIENTS = 10000
+MAX_PREDICTIONS = 32
+# 한 화면의 타일 요청이 한꺼번에 오므로 클라이언트별 예측은 이 간격에 한 번만
+PREDICT_INTERVAL_SECONDS = 0.1
+IDLE_POLL_SECONDS = 0.02
+
+
+class TileKey(NamedTuple):
+    z: int
+    x: int
+    y: int
+    map_type: str
+    language: str
+    region: str
+
+
+def _sign(value: float) -> int:
+    if value >= 0.5:
+        return 1
+    if value <= -0.5:
+        return -1
+    return 0
+
+
+def predict_tiles(history: deque[tuple[float, TileKey]], now: float, depth: int, max_zoom: int = 22) -> list[TileKey]:
+    """
+    최근 요청으로 화면 범위와 이동 방향/줌 변화를 추정해서 다음에 필요할 타일 목록 반환
+    - 이동 중이면 진행 방향 화면 밖 depth줄
+    - 줌을 바꾸는 중이면 같은 방향의 다음 줌 레벨 화면
+    """
+    latest = history[-1][1]
+    style = latest[3:]
+    recent = [
+        (ts, key) for ts, key in history
+        if now - ts <= PREFETCH_WINDOW_SECONDS and key[3:] == style
+    ]
+    screen = [key for _, key in recent if key.z == latest.z]
+    min_x, max_x = min(key.x for key in screen), max(key.x for key in screen)
+    min_y, max_y = min(key.y for key in screen), max(key.y for key in screen)
+
+    candidates: list[tuple[int, int, int]] = []
+
+    # 이동 방향: 창 앞 절반과 뒤 절반의 중심 비교
+    half = now - PREFETCH_WINDOW_SECONDS / 2
+    older = [key for ts, key in recent if ts < half and key.z == latest.z]
+    newer = [key for ts, key in recent if ts >= half and key.z == latest.z]
+    if older and newer:
+        dx = _sign(sum(k.x for k in newer) / len(newer) - sum(k.x for k in older) / len(older))
+        dy = _sign(sum(k.y for k in newer) / len(newer) - sum(k.y for k in older) / len(older))
+        for step in range(1, depth + 1):
+            if dx:
+                column = (max_x if dx > 0 else min_x) + dx * step
+                candidates.extend((latest.z, column, y) for y in range(min_y - 1, max_y + 2))
+            if dy:
+                row = (max_y if dy > 0 else min_y) + dy * step
+                candidates.extend((latest.z, x, row) for x in range(min_x - 1, max_x + 2))
+
+    # 줌 변화: 직전에 다른 줌 레벨을 보고 있었다면 같은 방향으로 한 단계 더
+    previous_zoom = next((key.z for _, key in reversed(recent) if key.z != latest.z), None)
+    if previous_zoom is not None:
+        center_x, center_y = (min_x + max_x) // 2, (min_y + max_y) // 2
+        half_w, half_h = (max_x - min_x) // 2 + 1, (max_y - min_y) // 2 + 1
+        if latest.z > previous_zoom and latest.z < max_zoom:
+            z = latest.z + 1
+            center_x, center_y = center_x * 2, center_y * 2
+        elif latest.z < previous_zoom and latest.z > 0:
+            z = latest.z - 1
+            center_x, center_y = center_x // 2, center_y // 2
+        else:
+            z = None
+        if z is not None:
+            candidates.extend(
+                (z, x, y)
+                for x in range(center_x - half_w, center_x + half_w + 1)
+                for y in range(center_y - half_h, center_y + half_h + 1)
+            )
+
+    seen = {(key.z, key.x, key.y) for _, key in recent}
+    predictions = []
+    for z, x, y in candidates:
+        bound = (1 << z) - 1
+        if 0 <= x <= bound and 0 <= y <= bound and (z, x, y) not in seen:
+            seen.add((z, x, y))
+            predictions.append(TileKey(z, x, y, *style))
+            if len(predictions) >= MAX_PREDICTIONS:
+                break
+    return predictions
+
+
+class ClientTrack:
+    __slots__ = ("history", "predicted_at")
+
+    def __init__(self):
+        self.history: deque[tuple[float, TileKey]] = deque(maxlen=PREFETCH_HISTORY)
+        self.predicted_at = 0.0
+
+
+class Prefetcher:
+    """
+    클라이언트별 최근 타일 요청으로 다음 타일을 예측해서 백그라운드로 캐시에 채움
+    - 큐가 차면 오래된 예측부터 버리고, 최신 예측부터 처리
+    - busy()가 참이면(실제 요청이 업스트림을 쓰는 중) 쉬었다가 다시 시도
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[TileKey], Awaitable[None]],
+        is_cached: Callable[[TileKey], bool],
+        busy: Callable[[], bool],
+        workers: int = TILE_PREFETCH_WORKERS,
+        queue_size: int = TILE_PREFETCH_QUEUE_SIZE,
+        depth: int = TILE_PREFETCH_DEPTH,
+        max_zoom: int = 22,
+    ):
+        self.fetch = fetch
+        self.is_cached = is_cached
+        self.busy = busy
+        self.workers = workers
+        self.queue_size = queue_size
+        self.depth = depth
+        self.max_zoom = max_zoom
+        self._clients: OrderedDict[str, ClientTrack] = OrderedDict()
+        self._queue: deque[TileKey] = deque()
+        self._queued: set[TileKey] = set()
+        self._fetching: dict[TileKey, asyncio.Future] = {}
+        # 미리 받은 타일이 실제로 요청됐는지 세기 위함
+        self._prefetched: OrderedDict[TileKey, None] = OrderedDict()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def observe(self, client: str, key: TileKey) -> None:
+        """타일 요청마다 호출 (응답 경로에서 부르므로 가볍게 유지)"""
+        now = time.monotonic()
+        track = self._clients.get(client)
+        if track is None:
+            track = self._clients[client] = ClientTrack()
+            if len(self._clients) > PREFETCH_MAX_CLIENTS:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        track.history.append((now, key))
+
+        if key in self._prefetched:
+            del self._prefetched[key]
+            metrics.tile_prefetch.inc(result="used")
+
+        if now - track.predicted_at < PREDICT_INTERVAL_SECONDS:
+            return
+        track.predicted_at = now
+        for tile in predict_tiles(track.history, now, self.depth, self.max_zoom):
+            self._enqueue(tile)
+
+    async def join(self, key: TileKey) -> bool:
+        """key를 미리 받는 중이면 끝날 때까지 기다림 (같은 타일을 두 번 받지 않도록)"""
+        future = self._fetching.get(key)
+        if future is None:
+            return False
+        await asyncio.shield(future)
+        return True
+
+    def _enqueue(self, tile: TileKey) -> None:
+        if tile in self._queued or tile in self._fetching or self.is_cached(tile):
+            return
+        if len(self._queue) >= self.queue_size:
+            self._queued.discard(self._queue.popleft())
+            metrics.tile_prefetch.inc(result="dropped")
+        self._queue.append(tile)
+        self._queued.add(tile)
+        self._wakeup.set()
+
+    async def _worker(self) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if self.busy():
+                await asyncio.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            tile = self._queue.pop()
+            self._queued.discard(tile)
+            if self.is_cached(tile):
+                continue
+            future = self._fetching[tile] = asyncio.get_running_loop().create_future()
+            try:
+                await self.fetch(tile)
+            except Exception:
+                # 업스트림 보호로 거절됐거나 실패한 예측은 그냥 버림
+                metrics.tile_prefetch.inc(result="failed")
+                continue
+            finally:
+                del self._fetching[tile]
+                future.set_result(None)
+            metrics.tile_prefetch.inc(result="fetched")
+            self._prefetched[tile] = None
+            if len(self._prefetched) > self.queue_size * 4:
+                self._prefetched.popitem(last=False)
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
@@ -0,0 +1,636 @@
+import argparse
+import asyncio
+import heapq
+import json
+import math
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import NamedTuple
+
+try:
+    import osmium  # .osm.pbf 읽기용 (선택, pip install osmium)
+except ImportError:
+    osmium = None
+
+import metrics
+from cch import ContractionHierarchy
+from geo import bbox_around, haversine_distance, point_to_segment_distance
+
+
+# 보행 그래프를 만들 OSM 추출본 (.osm XML 또는 .osm.pbf), 없으면 engine=local 사용 불가
+ROUTING_OSM_PATH = os.getenv("ROUTING_OSM_PATH")
+# 소요 시간 계산용 보행 속도 (m/s)
+ROUTING_WALKING_SPEED = float(os.getenv("ROUTING_WALKING_SPEED", "1.2"))
+# 이 거리(미터) 안의 장애물이 구간 비용에 반영됨
+ROUTING_OBSTACLE_RADIUS = float(os.getenv("ROUTING_OBSTACLE_RADIUS", "15"))
+# 출발/도착 좌표에서 보행 네트워크까지 허용 거리 (미터)
+ROUTING_MAX_SNAP_METERS = float(os.getenv("ROUTING_MAX_SNAP_METERS", "200"))
+# 장애물 타입별로 구간에 더하는 비용 (미터 환산), inf면 그 구간을 아예 지나지 않음
+OBSTACLE_PENALTIES = {
+    "Stair": float(os.getenv("ROUTING_STAIR_PENALTY", "inf")),
+    "Stuff": float(os.getenv("ROUTING_STUFF_PENALTY", "50")),
+    "EV": float(os.getenv("ROUTING_EV_PENALTY", "0")),
+}
+# OSM highway=steps 구간 비용 (기본: 지나지 않음)
+ROUTING_STEPS_PENALTY = float(os.getenv("ROUTING_STEPS_PENALTY", "inf"))
+# 검증 1건마다 장애물 비용에 더하는 비율 (최대 MAX_WEIGHTED_VERIFICATIONS건까지)
+ROUTING_VERIFICATION_WEIGHT = float(os.getenv("ROUTING_VERIFICATION_WEIGHT", "0.5"))
+# 전처리(CCH) 파일 (기본: <ROUTING_OSM_PATH>.cch), 없거나 OSM 파일이 바뀌었으면 백그라운드로 새로 만듦
+ROUTING_CCH_PATH = os.getenv("ROUTING_CCH_PATH")
+# 변경 피드를 읽어 새 장애물을 그래프에 반영하는 주기 (초), 0이면 경로 요청 때 반영
+ROUTING_SYNC_INTERVAL_SECONDS = float(os.getenv("ROUTING_SYNC_INTERVAL_SECONDS", "1"))
+
+MAX_WEIGHTED_VERIFICATIONS = 4
+# 한 번에 바뀐 구간이 CCH 호 수의 이 비율을 넘으면 부분 대신 전체 커스터마이징
+FULL_CUSTOMIZE_RATIO = 0.002
+CCH_MAGIC = b"BSDCCH01"
+GRAPH_ARRAYS = ("lat", "lng", "offsets", "targets", "lengths", "base_costs", "name_ids")
+
+GRID_CELL_DEGREES = 0.002
+
+# 걸을 수 있는 OSM highway 값 (foot=yes/no, access=private가 우선)
+WALKABLE_HIGHWAYS = {
+    "footway", "pedestrian", "path", "steps", "living_street", "residential", "service",
+    "unclassified", "tertiary", "tertiary_link", "secondary", "secondary_link",
+    "primary", "primary_link", "track", "corridor", "elevator", "crossing",
+}
+
+
+class RouteSegment(NamedTuple):
+    """이름이 같은 연속 구간 (안내 단계 하나)"""
+    name: str
+    start: int  # points 인덱스
+    end: int
+    distance: float
+
+
+class LocalRoute(NamedTuple):
+    points: list[tuple[float, float]]
+    distance: float
+    segments: list[RouteSegment]
+
+
+class NoRoute(Exception):
+    pass
+
+
+def _is_walkable(tags: dict[str, str]) -> bool:
+    foot = tags.get("foot")
+    if foot in ("no", "private"):
+        return False
+    if foot in ("yes", "designated", "permissive"):
+        return True
+    if tags.get("access") in ("no", "private"):
+        return False
+    return tags.get("highway") in WALKABLE_HIGHWAYS
+
+
+def _read_osm_xml(path: Path) -> tuple[dict[int, tuple[float, float]], list[tuple[list[int], dict[str, str]]]]:
+    """노드/걸을 수 있는 길을 읽음 (iterparse로 읽은 요소는 바로 버림)"""
+    nodes: dict[int, tuple[float, float]] = {}
+    ways: list[tuple[list[int], dict[str, str]]] = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            nodes[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            if _is_walkable(tags):
+                ways.append(([int(nd.get("ref")) for nd in elem.iter("nd")], tags))
+            elem.clear()
+        elif elem.tag == "relation":
+            elem.clear()
+    return nodes, ways
+
+
+def _read_osm_pbf(path: Path) -> tuple[dict[int, tuple[float, float]], list[tuple[list[int], dict[str, str]]]]:
+    if osmium is None:
+        raise RuntimeError("Reading .pbf files requires the osmium package (pip install osmium)")
+    nodes: dict[int, tuple[float, float]] = {}
+    ways: list[tuple[list[int], dict[str, str]]] = []
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, way):
+            tags = {tag.k: tag.v for tag in way.tags}
+            if not _is_walkable(tags):
+                return
+            refs = []
+            for node in way.nodes:
+                if node.location.valid():
+                    nodes[node.ref] = (node.location.lat, node.location.lon)
+                    refs.append(node.ref)
+            ways.append((refs, tags))
+
+    # locations=True면 길의 노드 좌표를 osmium이 채워 주므로 전체 노드를 들고 있지 않아도 됨
+    Handler().apply_file(str(path), locations=True)
+    return nodes, ways
+
+
+def obstacle_penalty(place_type: str, verification_count: int) -> float:
+    """장애물 하나가 근처 구간에 더하는 비용 (검증될수록 확실한 장애물이므로 늘림)"""
+    penalty = OBSTACLE_PENALTIES.get(place_type, 0)
+    return penalty * (1 + ROUTING_VERIFICATION_WEIGHT * min(verification_count, MAX_WEIGHTED_VERIFICATIONS))
+
+
+def _cell(latitude: float, longitude: float) -> tuple[int, int]:
+    return math.floor(latitude / GRID_CELL_DEGREES), math.floor(longitude / GRID_CELL_DEGREES)
+
+
+class WalkingGraph:
+    """
+    보행 그래프 (CSR 배열)
+    노드 u의 나가는 구간은 targets[offsets[u]:offsets[u + 1]], 구간 비용 = base_costs + penalties (blocked면 inf)
+    배열은 array 또는 전처리 파일을 mmap한 memoryview
+    """
+
+    def __init__(
+        self,
+        lat: array,
+        lng: array,
+        offsets: array,
+        targets: array,
+        lengths: array,
+        base_costs: array,
+        name_ids: array,
+        names: list[str],
+    ):
+        self.lat = lat
+        self.lng = lng
+        self.offsets = offsets
+        self.targets = targets
+        self.lengths = lengths
+        self.base_costs = base_costs
+        self.name_ids = name_ids
+        self.names = names
+        self.penalties = array("f", bytes(4 * len(targets)))
+        # 구간을 지나갈 수 없게 만든 장애물 수 (계단 등 비용이 inf인 것)
+        self.blocked = array("i", bytes(4 * len(targets)))
+        # 장애물 반영 상태 (변경 피드 커서까지 반영됨), 장소 id -> (더한 비용, 구간 목록)
+        self.obstacle_cursor = 0
+        self._applied: dict[int, tuple[float, list[int]]] = {}
+        self.lock = threading.Lock()
+
+        # CCH가 없거나(만드는 중), 비용이 바뀐 구간이 남았거나, 다시 커스터마이징 중이면 A*로 탐색
+        self.hierarchy: ContractionHierarchy | None = None
+        self.pending_edges: set[int] = set()
+        self.customizing = False
+        self.hierarchy_lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+
+        self._node_grid: dict[tuple[int, int], list[int]] = {}
+        for node in range(len(lat)):
+            self._node_grid.setdefault(_cell(lat[node], lng[node]), []).append(node)
+
+        self._edge_grid: dict[tuple[int, int], list[int]] = {}
+        for source in range(len(lat)):
+            for edge in range(offsets[source], offsets[source + 1]):
+                target = targets[edge]
+                (row1, col1), (row2, col2) = _cell(lat[source], lng[source]), _cell(lat[target], lng[target])
+                for row in range(min(row1, row2), max(row1, row2) + 1):
+                    for col in range(min(col1, col2), max(col1, col2) + 1):
+                        self._edge_grid.setdefault((row, col), []).append(edge)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lat)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def nearest_node(self, latitude: float, longitude: float, max_distance: float = ROUTING_MAX_SNAP_METERS) -> int | None:
+        min_lat, min_lng, max_lat, max_lng = bbox_around(latitude, longitude, max_distance)
+        (min_row, min_col), (max_row, max_col) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+        best, best_distance = None, max_distance
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for node in self._node_grid.get((row, col), ()):
+                    distance = haversine_distance(latitude, longitude, self.lat[node], self.lng[node])
+                    if distance <= best_distance:
+                        best, best_distance = node, distance
+        return best
+
+    def edges_near(self, latitude: float, longitude: float, radius: float) -> list[int]:
+        min_lat, min_lng, max_lat, max_lng = bbox_around(latitude, longitude, radius)
+        (min_row, min_col), (max_row, max_col) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+        candidates = set()
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                candidates.update(self._edge_grid.get((row, col), ()))
+
+        near = []
+        for edge in candidates:
+            source, target = self.source_of(edge), self.targets[edge]
+            distance = point_to_segment_distance(
+                latitude, longitude, self.lat[source], self.lng[source], self.lat[target], self.lng[target],
+            )
+            if distance <= radius:
+                near.append(edge)
+        return near
+
+    def source_of(self, edge: int) -> int:
+        # offsets가 정렬돼 있으므로 이분 탐색으로 구간의 출발 노드를 찾음
+        return bisect_right(self.offsets, edge) - 1
+
+    def cost(self, edge: int) -> float:
+        return math.inf if self.blocked[edge] else self.base_costs[edge] + self.penalties[edge]
+
+    def _add_penalty(self, edges: list[int], penalty: float, sign: int) -> None:
+        for edge in edges:
+            if penalty == math.inf:
+                self.blocked[edge] += sign
+            else:
+                self.penalties[edge] += sign * penalty
+
+    def apply_obstacle(
+        self, place_id: int, latitude: float, longitude: float, place_type: str, verification_count: int = 0,
+    ) -> list[int]:
+        """장애물 근처 구간 비용을 반영하고 바뀐 구간 목록 반환 (이미 반영한 장소는 검증 수가 바뀌었을 때만 다시 계산)"""
+        penalty = obstacle_penalty(place_type, verification_count)
+        previous, edges = self._applied.get(place_id, (0.0, []))
+        if penalty == previous:
+            return []
+        if previous:
+            self._add_penalty(edges, previous, -1)
+        if not edges:
+            edges = self.edges_near(latitude, longitude, ROUTING_OBSTACLE_RADIUS)
+        self._add_penalty(edges, penalty, 1)
+        self._applied[place_id] = (penalty, edges)
+        return edges
+
+    def attach_hierarchy(self, hierarchy: ContractionHierarchy) -> None:
+        """장애물 없는 비용으로 커스터마이징된 CCH를 붙임, 이미 반영한 장애물 구간은 다음 동기화 때 커스터마이징"""
+        with self.lock:
+            self.hierarchy = hierarchy
+            for _, edges in self._applied.values():
+                self.pending_edges.update(edges)
+
+    def shortest_path(self, source: int, target: int) -> list[int]:
+        """CCH가 최신이면 CCH로, 아니면 A*로 탐색해 지나는 구간 목록 반환"""
+        hierarchy = self.hierarchy
+        if hierarchy is not None and not self.pending_edges and not self.customizing:
+            with self.hierarchy_lock:
+                if not self.pending_edges and not self.customizing:
+                    started = time.perf_counter()
+                    distance, path = hierarchy.query(source, target)
+                    if distance == math.inf:
+                        raise NoRoute()
+                    edges = hierarchy.unpack(path, self.cost)
+                    metrics.local_route_duration.observe(time.perf_counter() - started, algorithm="cch")
+                    return edges
+
+        started = time.perf_counter()
+        edges = self._astar(source, target)
+        metrics.local_route_duration.observe(time.perf_counter() - started, algorithm="astar")
+        return edges
+
+    def _astar(self, source: int, target: int) -> list[int]:
+        """A* (휴리스틱: 직선 거리)"""
+        lat, lng, offsets, targets = self.lat, self.lng, self.offsets, self.targets
+        base_costs, penalties, blocked = self.base_costs, self.penalties, self.blocked
+        goal_lat, goal_lng = lat[target], lng[target]
+
+        best = {source: 0.0}
+        via: dict[int, int] = {}
+        heap = [(haversine_distance(lat[source], lng[source], goal_lat, goal_lng), 0.0, source)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if cost > best[node]:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                step = base_costs[edge] + penalties[edge]
+                if step == math.inf or blocked[edge]:
+                    continue
+                neighbor = targets[edge]
+                new_cost = cost + step
+                if new_cost < best.get(neighbor, math.inf):
+                    best[neighbor] = new_cost
+                    via[neighbor] = edge
+                    estimate = new_cost + haversine_distance(lat[neighbor], lng[neighbor], goal_lat, goal_lng)
+                    heapq.heappush(heap, (estimate, new_cost, neighbor))
+        else:
+            if source != target:
+                raise NoRoute()
+
+        path = []
+        node = target
+        while node != source:
+            edge = via[node]
+            path.append(edge)
+            node = self.source_of(edge)
+        path.reverse()
+        return path
+
+    def build_route(self, source: int, edges: list[int]) -> LocalRoute:
+        points = [(self.lat[source], self.lng[source])]
+        segments: list[RouteSegment] = []
+        total = 0.0
+        for edge in edges:
+            target = self.targets[edge]
+            points.append((self.lat[target], self.lng[target]))
+            length = self.lengths[edge]
+            total += length
+            name = self.names[self.name_ids[edge]]
+            if segments and segments[-1].name == name:
+                last = segments[-1]
+                segments[-1] = last._replace(end=len(points) - 1, distance=last.distance + length)
+            else:
+                segments.append(RouteSegment(name, len(points) - 2, len(points) - 1, length))
+        return LocalRoute(points, total, segments)
+
+
+def build_graph(nodes: dict[int, tuple[float, float]], ways: list[tuple[list[int], dict[str, str]]]) -> WalkingGraph:
+    index: dict[int, int] = {}
+    lat, lng = array("d"), array("d")
+    names = [""]
+    name_index = {"": 0}
+    edges: list[tuple[int, int, float, float, int]] = []
+
+    for refs, tags in ways:
+        refs = [ref for ref in refs if ref in nodes]
+        name = tags.get("name", "")
+        name_id = name_index.get(name)
+        if name_id is None:
+            name_id = name_index[name] = len(names)
+            names.append(name)
+        extra = ROUTING_STEPS_PENALTY if tags.get("highway") == "steps" else 0.0
+
+        for a, b in zip(refs, refs[1:]):
+            for ref in (a, b):
+                if ref not in index:
+                    index[ref] = len(lat)
+                    lat.append(nodes[ref][0])
+                    lng.append(nodes[ref][1])
+            u, v = index[a], index[b]
+            if u == v:
+                continue
+            length = haversine_distance(lat[u], lng[u], lat[v], lng[v])
+            # 보행자는 일방통행과 무관하므로 양방향
+            edges.append((u, v, length, length + extra, name_id))
+            edges.append((v, u, length, length + extra, name_id))
+
+    # 출발 노드 기준 계수 정렬로 CSR 구성
+    count = len(lat)
+    offsets = array("i", bytes(4 * (count + 1)))
+    for u, *_ in edges:
+        offsets[u + 1] += 1
+    for node in range(count):
+        offsets[node + 1] += offsets[node]
+
+    size = len(edges)
+    targets = array("i", bytes(4 * size))
+    lengths = array("f", bytes(4 * size))
+    base_costs = array("f", bytes(4 * size))
+    name_ids = array("i", bytes(4 * size))
+    cursor = array("i", offsets[:-1])
+    for u, v, length, cost, name_id in edges:
+        slot = cursor[u]
+        cursor[u] += 1
+        targets[slot], lengths[slot], base_costs[slot], name_ids[slot] = v, length, cost, name_id
+
+    return WalkingGraph(lat, lng, offsets, targets, lengths, base_costs, name_ids, names)
+
+
+def load_graph(path: Path) -> WalkingGraph:
+    started = time.perf_counter()
+    reader = _read_osm_pbf if path.name.endswith(".pbf") else _read_osm_xml
+    nodes, ways = reader(path)
+    graph = build_graph(nodes, ways)
+    print(
+        f"[Routing] loaded {path.name}: {graph.node_count} nodes, {graph.edge_count} edges "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return graph
+
+
+def build_hierarchy(graph: WalkingGraph) -> ContractionHierarchy:
+    """장애물 없는 기본 비용으로 CCH 전처리 (노드 순서, 지름길, 커스터마이징)"""
+    started = time.perf_counter()
+    base_costs = graph.base_costs
+    hierarchy = ContractionHierarchy.build(graph.lat, graph.lng, graph.offsets, graph.targets, lambda edge: base_costs[edge])
+    print(f"[Routing] built hierarchy: {hierarchy.arc_count} arcs in {time.perf_counter() - started:.1f}s")
+    return hierarchy
+
+
+def cch_path(source: Path) -> Path:
+    return Path(ROUTING_CCH_PATH) if ROUTING_CCH_PATH else source.with_name(source.name + ".cch")
+
+
+def _source_signature(source: Path) -> dict:
+    # 원본 OSM 파일이나 기본 비용 설정이 바뀌면 전처리 파일을 다시 만듦
+    stat = source.stat()
+    return {"name": source.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "steps_penalty": ROUTING_STEPS_PENALTY}
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def save_graph(graph: WalkingGraph, hierarchy: ContractionHierarchy, path: Path, source: Path) -> None:
+    """
+    그래프와 CCH를 mmap으로 바로 열 수 있는 파일로 저장 (임시 파일에 쓰고 교체)
+    형식: MAGIC | 헤더 길이(8바이트) | JSON 헤더 | 8바이트 정렬된 배열들
+    """
+    arrays = {name: getattr(graph, name) for name in GRAPH_ARRAYS} | hierarchy.arrays()
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = (values.typecode if isinstance(values, array) else values.format, offset, len(values))
+        offset += len(values) * values.itemsize
+    header = json.dumps({"source": _source_signature(source), "names": graph.names, "arrays": layout}).encode()
+
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with temp.open("wb") as f:
+        f.write(CCH_MAGIC + len(header).to_bytes(8, "little") + header)
+        data_start = _aligned(f.tell())
+        for name, values in arrays.items():
+            f.write(bytes(data_start + layout[name][1] - f.tell()))
+            f.write(values.tobytes())
+    os.replace(temp, path)
+
+
+def open_graph(path: Path, source: Path) -> WalkingGraph | None:
+    """전처리 파일을 mmap으로 열기 (없거나 원본과 맞지 않으면 None), 비용 배열은 쓰기 시 복사라 파일은 바뀌지 않음"""
+    started = time.perf_counter()
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        if f.read(len(CCH_MAGIC)) != CCH_MAGIC:
+            return None
+        header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+        if header["source"] != _source_signature(source):
+            print(f"[Routing] {path.name} is stale, rebuilding")
+            return None
+        data_start = _aligned(f.tell())
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+
+    arrays = {}
+    for name, (typecode, offset, length) in header["arrays"].items():
+        start = data_start + offset
+        arrays[name] = view[start:start + length * array(typecode).itemsize].cast(typecode)
+    graph = WalkingGraph(**{name: arrays.pop(name) for name in GRAPH_ARRAYS}, names=header["names"])
+    graph.attach_hierarchy(ContractionHierarchy(**arrays))
+    print(
+        f"[Routing] opened {path.name}: {graph.node_count} nodes, {graph.hierarchy.arc_count} arcs "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return graph
+
+
+def _build_in_background(graph: WalkingGraph, path: Path, source: Path) -> None:
+    def run() -> None:
+        try:
+            hierarchy = build_hierarchy(graph)
+        except Exception as e:
+            print(f"[Routing] hierarchy build failed: {e}")
+            return
+        try:
+            save_graph(graph, hierarchy, path, source)
+        except OSError as e:
+            print(f"[Routing] could not save {path}: {e}")
+        graph.attach_hierarchy(hierarchy)
+
+    threading.Thread(target=run, name="routing-cch", daemon=True).start()
+
+
+_graph: WalkingGraph | None = None
+_graph_lock = threading.Lock()
+
+
+def get_graph() -> WalkingGraph:
+    """
+    처음 쓸 때 한 번만 읽음 (스레드풀에서 호출)
+    전처리 파일이 있으면 mmap으로 바로 열고, 없으면 OSM을 읽어 A*로 쓰면서 CCH를 백그라운드로 만듦
+    """
+    global _graph
+    if _graph is None:
+        if not ROUTING_OSM_PATH:
+            raise RuntimeError("ROUTING_OSM_PATH is not configured")
+        with _graph_lock:
+            if _graph is None:
+                source = Path(ROUTING_OSM_PATH)
+                path = cch_path(source)
+                graph = open_graph(path, source)
+                if graph is None:
+                    graph = load_graph(source)
+                    _build_in_background(graph, path, source)
+                _graph = graph
+    return _graph
+
+
+def _customize(graph: WalkingGraph) -> None:
+    """비용이 바뀐 구간을 CCH에 반영 (그동안 경로 탐색은 A*)"""
+    hierarchy = graph.hierarchy
+    with graph.lock:
+        graph.customizing = True
+        edges = list(graph.pending_edges)
+        graph.pending_edges.clear()
+    try:
+        with graph.hierarchy_lock:
+            started = time.perf_counter()
+            if len(edges) > hierarchy.arc_count * FULL_CUSTOMIZE_RATIO:
+                hierarchy.customize(graph.cost)
+                kind = "full"
+            else:
+                hierarchy.update(edges, graph.cost)
+                kind = "partial"
+            metrics.local_route_customize_duration.observe(time.perf_counter() - started, kind=kind)
+    finally:
+        graph.customizing = False
+
+
+def sync_obstacles(graph: WalkingGraph, db: sqlite3.Connection) -> None:
+    """
+    변경 피드 커서 이후 추가/검증된 장애물을 구간 비용에 반영 (처음에는 전체)하고, 바뀐 구간만 CCH에 다시 커스터마이징
+    다른 스레드가 반영하는 중이면 기다리지 않음
+    """
+    if not graph.sync_lock.acquire(blocking=False):
+        return
+    try:
+        latest = db.execute("SELECT COALESCE(MAX(id), 0) FROM place_changes").fetchone()[0]
+        if latest > graph.obstacle_cursor:
+            rows = db.execute(
+                """SELECT DISTINCT p.id, p.latitude, p.longitude, p.type, p.verification_count
+                   FROM place_changes c
+                   JOIN warning_places p ON p.id = c.place_id
+                   WHERE c.id > ? AND c.id <= ? AND c.change_type IN ('add', 'verify') AND p.duplicate_of IS NULL""",
+                (graph.obstacle_cursor, latest),
+            ).fetchall()
+            with graph.lock:
+                for place_id, latitude, longitude, place_type, verification_count in rows:
+                    graph.pending_edges.update(
+                        graph.apply_obstacle(place_id, latitude, longitude, place_type, verification_count)
+                    )
+                graph.obstacle_cursor = latest
+        if graph.hierarchy is not None and graph.pending_edges:
+            _customize(graph)
+    finally:
+        graph.sync_lock.release()
+
+
+async def keep_synced(db_path: str) -> None:
+    """
+    워커마다 하나씩 실행, 그래프를 미리 열고 ROUTING_SYNC_INTERVAL_SECONDS마다 새 장애물을 반영
+    경로 요청은 반영을 기다리지 않음
+    """
+    try:
+        graph = await asyncio.to_thread(get_graph)
+    except (RuntimeError, OSError) as e:
+        print(f"[Routing] local engine unavailable: {e}")
+        return
+
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(sync_obstacles, graph, conn)
+            except sqlite3.OperationalError as e:
+                print(f"[Routing] obstacle sync failed: {e}")
+            await asyncio.sleep(ROUTING_SYNC_INTERVAL_SECONDS)
+    finally:
+        conn.close()
+
+
+def find_route(db: sqlite3.Connection, origin: tuple[float, float], destination: tuple[float, float]) -> LocalRoute:
+    """
+    장애물 비용을 반영한 최단 보행 경로
+    출발/도착이 보행 네트워크에서 너무 멀면 ValueError, 경로가 없으면 NoRoute
+    """
+    graph = get_graph()
+    if ROUTING_SYNC_INTERVAL_SECONDS <= 0:
+        sync_obstacles(graph, db)
+
+    source = graph.nearest_node(*origin)
+    target = graph.nearest_node(*destination)
+    if source is None or target is None:
+        raise ValueError("Origin or destination is too far from the walking network")
+    return graph.build_route(source, graph.shortest_path(source, target))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="보행 그래프 전처리 (CCH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="OSM 추출본에서 그래프와 CCH를 만들어 저장")
+    build_parser.add_argument("osm", type=Path, nargs="?", help="OSM 추출본 (기본: ROUTING_OSM_PATH)")
+    build_parser.add_argument("--output", type=Path, help="저장할 경로 (기본: ROUTING_CCH_PATH 또는 <osm>.cch)")
+
+    args = parser.parse_args()
+    source = args.osm or (Path(ROUTING_OSM_PATH) if ROUTING_OSM_PATH else None)
+    if source is None:
+        parser.error("OSM path is required (or set ROUTING_OSM_PATH)")
+    graph = load_graph(source)
+    output = args.output or cch_path(source)
+    save_graph(graph, build_hierarchy(graph), output, source)
+    print(f"Saved {output}")
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# 여러 워커가 함께 쓰는 캐시 파일 (비어 있으면 워커별 메모리 캐시만 사용)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_TILE_CACHE_SIZE = int(os.getenv("SHARED_TILE_CACHE_SIZE", "50000"))
+# 이 횟수만큼 쓸 때마다 오래된 타일 정리
+SHARED_CACHE_TRIM_INTERVAL = 256
+
+
+class SharedCache:
+    """
+    프로세스 간 공유 캐시 (SQLite WAL 파일)
+    - WAL 모드라 읽기는 다른 워커의 쓰기를 기다리지 않음
+    - 연결은 스레드마다 하나씩 (호출은 스레드풀에서)
+    """
+
+    def __init__(self, path: str, max_tiles: int):
+        self.path = path
+        self.max_tiles = max_tiles
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                key TEXT PRIMARY KEY,
+                content BLOB NOT NULL,
+                content_type TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_tiles_stored_at ON tiles(stored_at);
+
+            CREATE TABLE IF NOT EXISTS sessions (
+                key TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS worker_metrics (
+                worker TEXT PRIMARY KEY,
+                samples TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_tile(self, key: str, ttl_seconds: float) -> tuple[bytes, str, float] | None:
+        return self._conn().execute(
+            "SELECT content, content_type, stored_at FROM tiles WHERE key = ? AND stored_at > ?",
+            (key, time.time() - ttl_seconds),
+        ).fetchone()
+
+    def set_tile(self, key: str, content: bytes, content_type: str, stored_at: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO tiles (key, content, content_type, stored_at) VALUES (?, ?, ?, ?)",
+            (key, content, content_type, stored_at),
+        )
+
+        with self._writes_lock:
+            self._writes += 1
+            trim = self._writes % SHARED_CACHE_TRIM_INTERVAL == 0
+        if trim:
+            overflow = conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0] - self.max_tiles
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM tiles WHERE key IN (SELECT key FROM tiles ORDER BY stored_at LIMIT ?)",
+                    (overflow,),
+                )
+
+    def get_session(self, key: str) -> tuple[str, float] | None:
+        return self._conn().execute(
+            "SELECT token, expires_at FROM sessions WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+    def set_session(self, key: str, token: str, expires_at: float) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (key, token, expires_at) VALUES (?, ?, ?)",
+            (key, token, expires_at),
+        )
+
+    def set_worker_metrics(self, worker: str, samples: dict[str, list[str]]) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO worker_metrics (worker, samples, updated_at) VALUES (?, ?, ?)",
+            (worker, json.dumps(samples), time.time()),
+        )
+
+    def get_worker_metrics(self, max_age_seconds: float) -> dict[str, dict[str, list[str]]]:
+        """최근에 올라온 워커별 메트릭 (그보다 오래된 것은 종료된 워커로 보고 지움)"""
+        conn = self._conn()
+        cutoff = time.time() - max_age_seconds
+        conn.execute("DELETE FROM worker_metrics WHERE updated_at <= ?", (cutoff,))
+        return {
+            worker: json.loads(samples)
+            for worker, samples in conn.execute("SELECT worker, samples FROM worker_metrics ORDER BY worker")
+        }
+
+
+def create_shared_cache() -> SharedCache | None:
+    if not SHARED_CACHE_PATH:
+        return None
+    return SharedCache(SHARED_CACHE_PATH, SHARED_TILE_CACHE_SIZE)
@@ -0,0 +1,304 @@
+import bisect
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import closing
+
+import metrics
+from geo import haversine_distance, meters_to_latitude_degrees, meters_to_longitude_degrees, point_to_segment_distance
+
+
+# 다른 워커의 쓰기는 최대 이 시간(초) 뒤에 반영 (이 워커의 쓰기는 다음 읽기에 바로 반영)
+PLACE_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("PLACE_SNAPSHOT_MAX_AGE_SECONDS", "0.5"))
+# 격자 셀 크기 (도), 약 200m
+PLACE_SNAPSHOT_CELL_DEGREES = float(os.getenv("PLACE_SNAPSHOT_CELL_DEGREES", "0.002"))
+# 한 번에 이보다 많이 밀려 있으면 (대량 가져오기 등) 전체를 다시 읽음
+SNAPSHOT_CATCH_UP_BATCH = 5000
+# 셀까지 최소 거리를 위도/경도 클램핑으로 구할 때의 구면 오차 여유
+NEAREST_BOUND_SLACK = 0.999
+# 나머지 컬럼을 기본 키로 읽을 때 IN 목록 크기
+FETCH_CHUNK_SIZE = 500
+
+
+class PlaceSnapshot:
+    """
+    warning_places의 좌표/타입만 담은 워커 메모리 스냅샷
+
+    - id, 위도, 경도, 타입, 중복 여부를 평행 배열로 보관 (장소당 약 30바이트, 격자 색인 포함)
+    - 위치/타입은 제보 후 바뀌지 않으므로 변경 피드의 add만 이어 붙이면 됨
+    - generation: 반영한 마지막 place_changes id
+    """
+
+    def __init__(self, cell_degrees: float = PLACE_SNAPSHOT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._reset()
+        self.loaded = False
+        # 이 워커에서 기록한 마지막 변경 (읽기 전에 여기까지는 반영해야 함)
+        self._wanted = 0
+        self._checked = -math.inf
+        self._lock = threading.Lock()
+
+    def _reset(self) -> None:
+        # 슬롯 순서 = id 순서
+        self.ids = array("q")
+        self.lats = array("d")
+        self.lngs = array("d")
+        self.types = array("B")
+        self.duplicate = array("B")
+        self.type_names: list[str] = []
+        self.cells: dict[tuple[int, int], array] = {}
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _cell_of(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def _type_code(self, place_type: str) -> int:
+        try:
+            return self.type_names.index(place_type)
+        except ValueError:
+            self.type_names.append(place_type)
+            return len(self.type_names) - 1
+
+    def _append(self, place_id: int, latitude: float, longitude: float, place_type: str, duplicate_of: int | None) -> bool:
+        """id 순서대로만 추가 (이미 있으면 무시, 순서가 어긋나면 False)"""
+        if self.ids and place_id <= self.ids[-1]:
+            index = bisect.bisect_left(self.ids, place_id)
+            return index < len(self.ids) and self.ids[index] == place_id
+
+        slot = len(self.ids)
+        self.ids.append(place_id)
+        self.lats.append(latitude)
+        self.lngs.append(longitude)
+        self.types.append(self._type_code(place_type))
+        self.duplicate.append(duplicate_of is not None)
+        cell = self._cell_of(latitude, longitude)
+        if cell not in self.cells:
+            self.cells[cell] = array("I")
+        self.cells[cell].append(slot)
+        return True
+
+    def _load(self, conn: sqlite3.Connection) -> None:
+        started = time.perf_counter()
+        self._reset()
+        # 커서를 먼저 읽으므로 그 뒤 추가된 장소가 섞여 들어와도 다음 따라잡기에서 무시됨
+        generation = conn.execute("SELECT MAX(id) FROM place_changes").fetchone()[0] or 0
+        for place_id, latitude, longitude, place_type, duplicate_of in conn.execute(
+            "SELECT id, latitude, longitude, type, duplicate_of FROM warning_places ORDER BY id"
+        ):
+            self._append(place_id, latitude, longitude, place_type, duplicate_of)
+        self.generation = generation
+        self.loaded = True
+        metrics.place_snapshot_refresh_duration.observe(time.perf_counter() - started, kind="full")
+
+    def _catch_up(self, conn: sqlite3.Connection) -> None:
+        latest = conn.execute("SELECT MAX(id) FROM place_changes").fetchone()[0] or 0
+        if latest <= self.generation:
+            return
+
+        started = time.perf_counter()
+        rows = conn.execute(
+            """SELECT p.id, p.latitude, p.longitude, p.type, p.duplicate_of
+               FROM place_changes c
+               JOIN warning_places p ON p.id = c.place_id
+               WHERE c.id > ? AND c.id <= ? AND c.change_type = 'add'
+               ORDER BY c.id
+               LIMIT ?""",
+            (self.generation, latest, SNAPSHOT_CATCH_UP_BATCH + 1),
+        ).fetchall()
+        if len(rows) > SNAPSHOT_CATCH_UP_BATCH:
+            self._load(conn)
+            return
+
+        for place_id, latitude, longitude, place_type, duplicate_of in rows:
+            if not self._append(place_id, latitude, longitude, place_type, duplicate_of):
+                self._load(conn)
+                return
+        self.generation = latest
+        metrics.place_snapshot_refresh_duration.observe(time.perf_counter() - started, kind="incremental")
+
+    def _fresh(self) -> bool:
+        return (
+            self.loaded
+            and self.generation >= self._wanted
+            and time.monotonic() - self._checked < PLACE_SNAPSHOT_MAX_AGE_SECONDS
+        )
+
+    def ensure(self, conn: sqlite3.Connection) -> None:
+        """읽기 전에 호출: 오래됐거나 이 워커의 쓰기가 아직 없으면 변경 피드로 따라잡음"""
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return
+            if self.loaded:
+                self._catch_up(conn)
+            else:
+                self._load(conn)
+            self._checked = time.monotonic()
+
+    def expect(self, change_id: int) -> None:
+        """이 워커의 변경이 커밋된 뒤 호출: 다음 읽기가 여기까지 따라잡음"""
+        self._wanted = max(self._wanted, change_id)
+
+    def _cells_in(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[array]:
+        min_row, min_col = self._cell_of(min_lat, min_lng)
+        max_row, max_col = self._cell_of(max_lat, max_lng)
+        # 영역이 넓으면 채워진 셀만 훑음
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            return [
+                slots for (row, col), slots in self.cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            ]
+        return [
+            self.cells[(row, col)]
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+            if (row, col) in self.cells
+        ]
+
+    def in_bbox(
+        self,
+        min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+        place_type: str | None = None,
+    ) -> list[tuple[int, float, float, str]]:
+        """영역 안의 원본 장소 (id, 위도, 경도, 타입), id 순"""
+        with self._lock:
+            if place_type is not None and place_type not in self.type_names:
+                return []
+            type_code = self.type_names.index(place_type) if place_type is not None else None
+            lats, lngs, types, duplicate = self.lats, self.lngs, self.types, self.duplicate
+
+            slots = []
+            for cell in self._cells_in(min_lat, min_lng, max_lat, max_lng):
+                for slot in cell:
+                    if duplicate[slot] or (type_code is not None and types[slot] != type_code):
+                        continue
+                    if min_lat <= lats[slot] <= max_lat and min_lng <= lngs[slot] <= max_lng:
+                        slots.append(slot)
+            slots.sort()
+            return [(self.ids[slot], lats[slot], lngs[slot], self.type_names[types[slot]]) for slot in slots]
+
+    def near_route(self, points: list[tuple[float, float]], radius: float) -> list[tuple[int, float]]:
+        """
+        경로 구간에서 radius(m) 안에 있는 원본 장소 (id, 처음 만나는 구간까지 거리), id 순
+        구간마다 그 주변 셀만 확인하므로 경로 bbox 전체를 읽지 않음
+        """
+        d_lat = meters_to_latitude_degrees(radius)
+        with self._lock:
+            lats, lngs, duplicate = self.lats, self.lngs, self.duplicate
+            matched: dict[int, float] = {}
+            for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+                d_lng = meters_to_longitude_degrees(radius, max(abs(lat1), abs(lat2)))
+                min_lat, max_lat = min(lat1, lat2) - d_lat, max(lat1, lat2) + d_lat
+                min_lng, max_lng = min(lng1, lng2) - d_lng, max(lng1, lng2) + d_lng
+                for cell in self._cells_in(min_lat, min_lng, max_lat, max_lng):
+                    for slot in cell:
+                        if slot in matched or duplicate[slot]:
+                            continue
+                        latitude, longitude = lats[slot], lngs[slot]
+                        if not (min_lat <= latitude <= max_lat and min_lng <= longitude <= max_lng):
+                            continue
+                        distance = point_to_segment_distance(latitude, longitude, lat1, lng1, lat2, lng2)
+                        if distance <= radius:
+                            matched[slot] = distance
+            return [(self.ids[slot], matched[slot]) for slot in sorted(matched)]
+
+    def _cell_bound(self, latitude: float, longitude: float, cell: tuple[int, int]) -> float:
+        """셀 안의 어떤 점까지의 거리보다도 크지 않은 값 (셀에서 가장 가까운 점까지, 구면 오차만큼 여유)"""
+        row, col = cell
+        nearest_lat = min(max(latitude, row * self.cell_degrees), (row + 1) * self.cell_degrees)
+        nearest_lng = min(max(longitude, col * self.cell_degrees), (col + 1) * self.cell_degrees)
+        return haversine_distance(latitude, longitude, nearest_lat, nearest_lng) * NEAREST_BOUND_SLACK
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        place_type: str | None = None,
+        max_distance: float = math.inf,
+        after: tuple[float, int] | None = None,
+    ) -> list[tuple[int, float]]:
+        """
+        가까운 순 원본 장소 k개 (id, 거리), 거리가 같으면 id 순
+        after=(거리, id)면 그 다음부터 (페이지 커서)
+
+        격자 셀을 (셀까지 최소 거리) 순으로 펼치는 best-first 탐색
+        빈 셀을 너무 많이 펼치면 (주변이 비어 있음) 채워진 셀을 모두 큐에 넣고 그것만 펼침
+        """
+        with self._lock:
+            if place_type is not None and place_type not in self.type_names:
+                return []
+            type_code = self.type_names.index(place_type) if place_type is not None else None
+            lats, lngs, types, duplicate, ids = self.lats, self.lngs, self.types, self.duplicate, self.ids
+
+            start = self._cell_of(latitude, longitude)
+            # (거리, 0, 셀) 또는 (거리, 1, id, 슬롯): 거리가 같으면 셀을 먼저 펼침
+            heap: list[tuple] = [(0.0, 0, start)]
+            visited = {start}
+            flooding = True
+            empty_budget = 4 * len(self.cells) + 64
+
+            results: list[tuple[int, float]] = []
+            while heap and len(results) < k:
+                entry = heapq.heappop(heap)
+                distance = entry[0]
+                if distance > max_distance:
+                    break
+
+                if entry[1] == 1:
+                    if after is None or (distance, entry[2]) > after:
+                        results.append((entry[2], distance))
+                    continue
+
+                cell = entry[2]
+                slots = self.cells.get(cell)
+                if slots is not None:
+                    for slot in slots:
+                        if duplicate[slot] or (type_code is not None and types[slot] != type_code):
+                            continue
+                        place_distance = haversine_distance(latitude, longitude, lats[slot], lngs[slot])
+                        heapq.heappush(heap, (place_distance, 1, ids[slot], slot))
+                elif flooding:
+                    empty_budget -= 1
+                    if empty_budget < 0:
+                        flooding = False
+                        for other in self.cells:
+                            if other not in visited:
+                                visited.add(other)
+                                heapq.heappush(heap, (self._cell_bound(latitude, longitude, other), 0, other))
+
+                if flooding:
+                    row, col = cell
+                    for neighbor in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                        if neighbor not in visited:
+                            visited.add(neighbor)
+                            heapq.heappush(heap, (self._cell_bound(latitude, longitude, neighbor), 0, neighbor))
+            return results
+
+
+place_snapshot = PlaceSnapshot()
+
+
+def load_snapshot(db_path: str) -> None:
+    """서버 시작 때 미리 읽어 둠"""
+    with closing(sqlite3.connect(db_path, check_same_thread=False)) as conn:
+        place_snapshot.ensure(conn)
+
+
+def fetch_places(db: sqlite3.Connection, columns: str, place_ids: list[int]) -> list[sqlite3.Row]:
+    """스냅샷에서 고른 장소의 나머지 컬럼만 기본 키로 읽음 (place_ids 순서 유지)"""
+    rows = {}
+    for start in range(0, len(place_ids), FETCH_CHUNK_SIZE):
+        chunk = place_ids[start:start + FETCH_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        for row in db.execute(f"SELECT {columns} FROM warning_places WHERE id IN ({placeholders})", chunk):
+            rows[row["id"]] = row
+    return [rows[place_id] for place_id in place_ids if place_id in rows]
@@ -0,0 +1,296 @@
+import abc
+import argparse
+import datetime
+import hashlib
+import hmac
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import quote, urlsplit
+
+import httpx
+from fastapi import Response
+from fastapi.responses import FileResponse, RedirectResponse
+
+from imaging import RENDITION_VARIANTS, build_renditions, hash_upload, rendition_key
+
+
+IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "local")
+WARNING_PLACE_IMG_PATH = Path(os.getenv("WARNING_PLACE_IMG_PATH", "./warning_place_img"))
+
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "http://localhost:9000")
+S3_BUCKET = os.getenv("S3_BUCKET", "warning-place-img")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+# 버킷이 공개 읽기면 서명 없는 URL로 리다이렉트 (CDN 캐시 가능)
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL")
+S3_PRESIGN_EXPIRES_SECONDS = int(os.getenv("S3_PRESIGN_EXPIRES_SECONDS", "3600"))
+
+STORED_OBJECT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ImageStore(abc.ABC):
+    """
+    이미지 저장소 인터페이스
+    키는 내용 해시에서 만들어지므로 같은 키에는 항상 같은 내용이 들어감 (덮어쓰기 없음)
+    """
+
+    # 렌디션 임시 파일을 만들 디렉터리 (None이면 시스템 임시 디렉터리)
+    staging_dir: Path | None = None
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abc.abstractmethod
+    def put_file(self, key: str, path: Path, content_type: str) -> None: ...
+
+    @abc.abstractmethod
+    def read(self, key: str) -> bytes | None:
+        """저장된 내용 (없으면 None)"""
+
+    @abc.abstractmethod
+    def response(self, key: str, media_type: str, headers: dict[str, str]) -> Response: ...
+
+
+class LocalImageStore(ImageStore):
+    def __init__(self, root: Path):
+        self.root = root
+        # 같은 파일시스템이어야 os.replace가 원자적
+        self.staging_dir = root / ".staging"
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self.path_for(key).is_file()
+
+    def put_file(self, key: str, path: Path, content_type: str) -> None:
+        dest = self.path_for(key)
+        if dest.is_file():
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, dest)
+
+    def read(self, key: str) -> bytes | None:
+        path = self.path_for(key)
+        return path.read_bytes() if path.is_file() else None
+
+    def response(self, key: str, media_type: str, headers: dict[str, str]) -> Response:
+        # FileResponse가 Range / If-Range 요청을 처리함
+        return FileResponse(self.path_for(key), media_type=media_type, headers=headers)
+
+
+def _hmac_sha256(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def _sigv4_signature(secret_key: str, date_stamp: str, region: str, string_to_sign: str) -> str:
+    key = _hmac_sha256(("AWS4" + secret_key).encode(), date_stamp)
+    key = _hmac_sha256(key, region)
+    key = _hmac_sha256(key, "s3")
+    key = _hmac_sha256(key, "aws4_request")
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+def _canonical_query(params: dict[str, str]) -> str:
+    return "&".join(
+        f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items())
+    )
+
+
+def presign_s3_url(
+    method: str,
+    host: str,
+    canonical_uri: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    expires: int,
+    now: datetime.datetime,
+) -> str:
+    """AWS Signature Version 4 쿼리 서명 (S3/MinIO 공용)"""
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = now.strftime("%Y%m%d")
+    scope = f"{date_stamp}/{region}/s3/aws4_request"
+    params = {
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": f"{access_key}/{scope}",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires),
+        "X-Amz-SignedHeaders": "host",
+    }
+    query = _canonical_query(params)
+    canonical_request = f"{method}\n{canonical_uri}\n{query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+    string_to_sign = (
+        f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+        f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+    )
+    signature = _sigv4_signature(secret_key, date_stamp, region, string_to_sign)
+    return f"{query}&X-Amz-Signature={signature}"
+
+
+class S3ImageStore(ImageStore):
+    """
+    S3 호환 API 저장소 (AWS S3, MinIO 등)
+    path-style 주소({endpoint}/{bucket}/{key})와 SigV4 서명 사용
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        region: str,
+        access_key: str,
+        secret_key: str,
+        public_base_url: str | None = None,
+    ):
+        parts = urlsplit(endpoint_url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.bucket = bucket
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        # 업로드는 이미지 워커 스레드에서 실행되므로 동기 클라이언트 사용
+        self._client = httpx.Client(timeout=30)
+
+    def _uri(self, key: str) -> str:
+        return f"/{self.bucket}/{quote(key, safe='/~')}"
+
+    def _signed_headers(self, method: str, uri: str, payload_hash: str, extra: dict[str, str]) -> dict[str, str]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = now.strftime("%Y%m%d")
+        scope = f"{date_stamp}/{self.region}/s3/aws4_request"
+
+        headers = {
+            "host": self.host,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+            **{k.lower(): v for k, v in extra.items()},
+        }
+        signed = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{k}:{headers[k].strip()}\n" for k in sorted(headers))
+        canonical_request = f"{method}\n{uri}\n\n{canonical_headers}\n{signed}\n{payload_hash}"
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+        )
+        signature = _sigv4_signature(self.secret_key, date_stamp, self.region, string_to_sign)
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed}, Signature={signature}"
+        )
+        return headers
+
+    def exists(self, key: str) -> bool:
+        uri = self._uri(key)
+        headers = self._signed_headers("HEAD", uri, hashlib.sha256(b"").hexdigest(), {})
+        response = self._client.head(f"{self.scheme}://{self.host}{uri}", headers=headers)
+        return response.status_code == 200
+
+    def put_file(self, key: str, path: Path, content_type: str) -> None:
+        data = path.read_bytes()
+        uri = self._uri(key)
+        headers = self._signed_headers(
+            "PUT",
+            uri,
+            hashlib.sha256(data).hexdigest(),
+            {"content-type": content_type, "cache-control": STORED_OBJECT_CACHE_CONTROL},
+        )
+        response = self._client.put(f"{self.scheme}://{self.host}{uri}", content=data, headers=headers)
+        if response.status_code >= 300:
+            raise RuntimeError(f"S3 upload failed ({response.status_code}): {response.text[:200]}")
+
+    def read(self, key: str) -> bytes | None:
+        uri = self._uri(key)
+        headers = self._signed_headers("GET", uri, hashlib.sha256(b"").hexdigest(), {})
+        response = self._client.get(f"{self.scheme}://{self.host}{uri}", headers=headers)
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 300:
+            raise RuntimeError(f"S3 download failed ({response.status_code}): {response.text[:200]}")
+        return response.content
+
+    def response(self, key: str, media_type: str, headers: dict[str, str]) -> Response:
+        if self.public_base_url:
+            return RedirectResponse(url=f"{self.public_base_url}/{quote(key, safe='/~')}", headers=headers)
+
+        uri = self._uri(key)
+        query = presign_s3_url(
+            "GET", self.host, uri, self.access_key, self.secret_key, self.region,
+            S3_PRESIGN_EXPIRES_SECONDS, datetime.datetime.now(datetime.timezone.utc),
+        )
+        # 서명 URL은 만료되므로 리다이렉트 자체는 짧게만 캐시
+        redirect_headers = {**headers, "Cache-Control": f"private, max-age={S3_PRESIGN_EXPIRES_SECONDS // 2}"}
+        return RedirectResponse(url=f"{self.scheme}://{self.host}{uri}?{query}", headers=redirect_headers)
+
+
+def create_image_store() -> ImageStore:
+    if IMAGE_STORE_BACKEND == "local":
+        return LocalImageStore(WARNING_PLACE_IMG_PATH)
+    if IMAGE_STORE_BACKEND == "s3":
+        if not S3_ACCESS_KEY_ID or not S3_SECRET_ACCESS_KEY:
+            raise RuntimeError("S3_ACCESS_KEY_ID / S3_SECRET_ACCESS_KEY are not configured")
+        return S3ImageStore(
+            S3_ENDPOINT_URL, S3_BUCKET, S3_REGION, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_PUBLIC_BASE_URL,
+        )
+    raise RuntimeError(f"Unknown IMAGE_STORE_BACKEND: {IMAGE_STORE_BACKEND}")
+
+
+image_store = create_image_store()
+
+
+def store_renditions(source: BinaryIO, image_hash: str) -> None:
+    """렌디션을 만들어 저장소에 올림, 같은 해시가 이미 있으면 디코딩도 생략"""
+    if all(image_store.exists(rendition_key(image_hash, size, fmt)) for size, fmt in RENDITION_VARIANTS):
+        return
+
+    if image_store.staging_dir is not None:
+        image_store.staging_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=image_store.staging_dir) as tmp:
+        for (size, fmt), path in build_renditions(source, Path(tmp)).items():
+            image_store.put_file(rendition_key(image_hash, size, fmt), path, f"image/{fmt}")
+
+
+def migrate_flat_images(db_path: str) -> int:
+    """
+    예전 평면 구조의 원본({place_id}.png)을 해시 기반 저장소로 옮김
+    렌디션({place_id}_{size}.webp)은 옮기지 않고 원본에서 다시 만듦
+    평면 구조 파일은 지우지 않음
+    """
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    migrated = 0
+    try:
+        rows = conn.execute("SELECT id, image_hash FROM warning_places WHERE has_image = 1").fetchall()
+        for row in rows:
+            flat = WARNING_PLACE_IMG_PATH / f"{row['id']}.png"
+            if not flat.is_file():
+                continue
+            with flat.open("rb") as f:
+                image_hash = row["image_hash"] or hash_upload(f, max_bytes=None)[0]
+                store_renditions(f, image_hash)
+            conn.execute("UPDATE warning_places SET image_hash = ? WHERE id = ?", (image_hash, row["id"]))
+            conn.commit()
+            migrated += 1
+    finally:
+        conn.close()
+    return migrated
+
+
+if __name__ == "__main__":
+    from db import DB_PATH, init_db
+
+    parser = argparse.ArgumentParser(description="장애물 이미지 저장소 관리")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="평면 구조 이미지를 해시 기반 저장소로 이전")
+
+    args = parser.parse_args()
+    init_db()
+    if args.command == "migrate":
+        print(f"Migrated {migrate_flat_images(DB_PATH)} images")
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 서버 모듈은 server/ 기준으로 import함
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch) -> str:
+    """빈 스키마가 만들어진 임시 DB"""
+    path = str(tmp_path / "app.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+    return path
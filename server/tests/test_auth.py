@@ -0,0 +1,128 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+import pytest
+
+import auth
+from auth import SQLiteOAuthStateStore, _b64url_decode, _b64url_encode, decode_session_token, encode_session_token
+
+
+def _sign(header: dict, claims: dict) -> str:
+    compact = {"separators": (",", ":")}
+    signing_input = f"{_b64url_encode(json.dumps(header, **compact).encode())}.{_b64url_encode(json.dumps(claims, **compact).encode())}"
+    signature = hmac.new(auth.SESSION_SECRET, signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64url_encode(signature)}"
+
+
+def _claims(**overrides) -> dict:
+    now = int(time.time())
+    return {"sub": "42", "typ": "access", "iat": now, "exp": now + 60} | overrides
+
+
+def test_round_trip():
+    token = encode_session_token(42, "access", 60)
+
+    assert decode_session_token(token, "access") == 42
+    assert decode_session_token(token, "refresh") is None
+
+
+def test_tampered_signature_and_payload():
+    header, payload, signature = encode_session_token(42, "access", 60).split(".")
+    flipped = bytes([_b64url_decode(signature)[0] ^ 1]) + _b64url_decode(signature)[1:]
+    forged_payload = _b64url_encode(json.dumps(_claims(sub="1")).encode())
+
+    assert decode_session_token(f"{header}.{payload}.{_b64url_encode(flipped)}", "access") is None
+    assert decode_session_token(f"{header}.{forged_payload}.{signature}", "access") is None
+
+
+def test_other_secret_rejected(monkeypatch):
+    token = encode_session_token(42, "access", 60)
+    monkeypatch.setattr(auth, "SESSION_SECRET", b"another-secret")
+
+    assert decode_session_token(token, "access") is None
+
+
+@pytest.mark.parametrize("header", [
+    {"alg": "none", "typ": "JWT"},
+    {"alg": "HS512", "typ": "JWT"},
+    {"typ": "JWT", "alg": "HS256"},
+])
+def test_alg_mismatch_rejected(header):
+    assert decode_session_token(_sign(header, _claims()), "access") is None
+
+
+def test_unsigned_token_rejected():
+    header, payload, _ = encode_session_token(42, "access", 60).split(".")
+
+    assert decode_session_token(f"{header}.{payload}.", "access") is None
+
+
+def test_expired_rejected():
+    valid = _sign({"alg": "HS256", "typ": "JWT"}, _claims())
+    expired = _sign({"alg": "HS256", "typ": "JWT"}, _claims(exp=int(time.time()) - 1))
+
+    assert decode_session_token(valid, "access") == 42
+    assert decode_session_token(expired, "access") is None
+    assert decode_session_token(encode_session_token(42, "access", -1), "access") is None
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "abc",
+    "a.b",
+    "a.b.c.d",
+    f"{auth._JWT_HEADER}.!!!.###",
+    f"{auth._JWT_HEADER}..",
+])
+def test_malformed_segments_rejected(token):
+    assert decode_session_token(token, "access") is None
+
+
+@pytest.mark.parametrize("claims", [
+    ["not", "an", "object"],
+    {"typ": "access", "exp": 9999999999},
+    {"sub": "x", "typ": "access", "exp": 9999999999},
+    {"sub": "42", "typ": "access", "exp": "later"},
+])
+def test_bad_claims_rejected(claims):
+    payload = _b64url_encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{auth._JWT_HEADER}.{payload}"
+    signature = hmac.new(auth.SESSION_SECRET, signing_input.encode(), hashlib.sha256).digest()
+
+    assert decode_session_token(f"{signing_input}.{_b64url_encode(signature)}", "access") is None
+
+
+def test_sqlite_oauth_state_is_single_use(db_path):
+    store = SQLiteOAuthStateStore(db_path, ttl_seconds=60, max_size=100)
+    store.put("state-1", "app://callback")
+
+    assert store.pop("state-1") == (True, "app://callback")
+    assert store.pop("state-1") == (False, None)
+    assert store.pop("unknown") == (False, None)
+
+
+def test_sqlite_oauth_state_consumed_once_under_concurrency(db_path):
+    store = SQLiteOAuthStateStore(db_path, ttl_seconds=60, max_size=100)
+    store.put("state-1", None)
+    results = []
+
+    def pop():
+        results.append(store.pop("state-1")[0])
+
+    threads = [threading.Thread(target=pop) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+
+
+def test_sqlite_oauth_state_expires(db_path):
+    store = SQLiteOAuthStateStore(db_path, ttl_seconds=-1, max_size=100)
+    store.put("state-1", None)
+
+    assert store.pop("state-1") == (False, None)
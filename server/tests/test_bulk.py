@@ -0,0 +1,69 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+from bulk import ImportAborted, import_places
+
+
+def _count_places(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM warning_places").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_ndjson_skips_bad_lines(db_path):
+    lines = [
+        '{"latitude": 37.5665, "longitude": 126.9780}',
+        "not json",
+        "[1, 2]",
+        '{"latitude": "x", "longitude": 126.9780}',
+        '{"latitude": 37.5670, "longitude": 126.9790, "type": "Stair"}',
+    ]
+    result = import_places(io.StringIO("\n".join(lines) + "\n"), "ndjson", dedupe_radius=0, db_path=db_path)
+
+    assert result["imported"] == 2
+    assert result["skipped"] == 3
+    assert [error.split(":")[0] for error in result["errors"]] == ["record 2", "record 3", "record 4"]
+    assert _count_places(db_path) == 2
+
+
+def test_geojson_skips_non_point_features(db_path):
+    features = [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [126.9780, 37.5665]}, "properties": {"name": "a"}},
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": [[126.97, 37.56], [126.98, 37.57]]}, "properties": {}},
+        {"type": "Feature", "geometry": None, "properties": {}},
+        "not a feature",
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [126.9790, 37.5670]}, "properties": {"type": "EV"}},
+    ]
+    data = json.dumps({"type": "FeatureCollection", "features": features})
+    result = import_places(io.StringIO(data), "geojson", dedupe_radius=0, db_path=db_path)
+
+    assert result["imported"] == 2
+    assert result["skipped"] == 3
+    assert _count_places(db_path) == 2
+
+
+def test_truncated_geojson_reports_what_was_imported(db_path):
+    feature = {"type": "Feature", "geometry": {"type": "Point", "coordinates": [126.9780, 37.5665]}, "properties": {}}
+    data = '{"type": "FeatureCollection", "features": [' + json.dumps(feature) + ', {"type": "Fea'
+
+    with pytest.raises(ImportAborted) as excinfo:
+        import_places(io.StringIO(data), "geojson", dedupe_radius=0, db_path=db_path)
+
+    assert excinfo.value.result["imported"] == 1
+    assert _count_places(db_path) == 1
+
+
+def test_import_keeps_coordinate_index(db_path):
+    import_places(io.StringIO('{"latitude": 37.5665, "longitude": 126.9780}\n'), "ndjson", db_path=db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+    assert "idx_warning_places_coords" in names
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import db
+import warning
+from snapshot import PlaceSnapshot
+
+
+@pytest.fixture
+def client(db_path, monkeypatch) -> TestClient:
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO users (username) VALUES (?)", [("reporter",), ("verifier",)])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(warning, "place_snapshot", PlaceSnapshot())
+
+    app = FastAPI()
+    app.include_router(warning.router)
+    return TestClient(app)
+
+
+def _add(client: TestClient, index: int) -> int:
+    response = client.post("/warning/add_place", json={
+        "user_id": 1, "name": f"p{index}", "description": "",
+        "latitude": 37.50 + index * 0.01, "longitude": 126.90 + index * 0.01, "type": "Stair",
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _read_all(client: TestClient, cursor: int, limit: int) -> tuple[int, list[list[dict]]]:
+    pages = []
+    while True:
+        body = client.get("/warning/changes", params={"cursor": cursor, "limit": limit}).json()
+        assert body["cursor"] >= cursor
+        cursor = body["cursor"]
+        pages.append(body["changes"])
+        if not body["has_more"]:
+            return cursor, pages
+
+
+def test_changes_feed_pages_every_change_once(client):
+    ids = [_add(client, index) for index in range(5)]
+    assert client.post(f"/warning/verify/{ids[1]}", json={"user_id": 2, "is_valid": True}).status_code == 200
+    # 부정 검증은 장소 상태를 바꾸지 않으므로 변경으로 기록하지 않음
+    assert client.post(f"/warning/verify/{ids[2]}", json={"user_id": 2, "is_valid": False}).status_code == 200
+
+    cursor, pages = _read_all(client, 0, limit=2)
+
+    changes = [change for page in pages for change in page]
+    assert [(change["id"], change["change_type"]) for change in changes] == [
+        (ids[0], "add"), (ids[1], "add"), (ids[2], "add"), (ids[3], "add"), (ids[4], "add"), (ids[1], "verify"),
+    ]
+    assert changes[-1]["verification_count"] == 1
+
+    # 커서 이후 변경이 없으면 빈 페이지, 커서는 그대로
+    body = client.get("/warning/changes", params={"cursor": cursor}).json()
+    assert body == {"message": "Changes retrieved successfully", "cursor": cursor, "has_more": False, "changes": []}
+
+    ids.append(_add(client, 5))
+    next_cursor, pages = _read_all(client, cursor, limit=100)
+    assert [change["id"] for change in pages[0]] == [ids[5]]
+    assert next_cursor > cursor
+
+
+def test_changes_in_one_page_collapse_to_latest_state(client):
+    place_id = _add(client, 0)
+    assert client.post(f"/warning/verify/{place_id}", json={"user_id": 2, "is_valid": True}).status_code == 200
+
+    body = client.get("/warning/changes", params={"cursor": 0}).json()
+
+    assert [(change["id"], change["change_type"]) for change in body["changes"]] == [(place_id, "verify")]
+    assert body["changes"][0]["verification_count"] == 1
+
+
+def test_init_backfills_places_created_before_the_log(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM place_changes")
+    conn.executemany(
+        "INSERT INTO warning_places (name, latitude, longitude, description) VALUES ('p', ?, 126.9, '')",
+        [(37.5,), (37.6,)],
+    )
+    conn.commit()
+
+    db.init_db()
+
+    rows = conn.execute("SELECT place_id, change_type FROM place_changes ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [(1, "add"), (2, "add")]
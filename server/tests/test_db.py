@@ -0,0 +1,34 @@
+import sqlite3
+
+from db import TimedConnection
+
+
+def _connect(db_path: str) -> TimedConnection:
+    return sqlite3.connect(db_path, factory=TimedConnection)
+
+
+def test_after_commit_runs_only_after_commit(db_path):
+    conn = _connect(db_path)
+    calls = []
+    conn.execute("INSERT INTO place_changes (place_id, change_type) VALUES (1, 'add')")
+    conn.after_commit(lambda: calls.append("published"))
+    assert calls == []
+
+    conn.commit()
+    assert calls == ["published"]
+
+    conn.commit()
+    assert calls == ["published"]
+    conn.close()
+
+
+def test_after_commit_dropped_on_rollback(db_path):
+    conn = _connect(db_path)
+    calls = []
+    conn.execute("INSERT INTO place_changes (place_id, change_type) VALUES (1, 'add')")
+    conn.after_commit(lambda: calls.append("published"))
+    conn.rollback()
+    conn.commit()
+
+    assert calls == []
+    conn.close()
@@ -0,0 +1,31 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import events
+
+BBOX = {"sw_latitude": 37.56, "sw_longitude": 126.97, "ne_latitude": 37.57, "ne_longitude": 126.99}
+
+
+def test_subscription_ids_are_opaque():
+    async def open_two():
+        first, second = events.subscribe((37.56, 126.97, 37.57, 126.99)), events.subscribe((37.56, 126.97, 37.57, 126.99))
+        events.unsubscribe(first.id)
+        events.unsubscribe(second.id)
+        return first.id, second.id
+
+    first, second = asyncio.run(open_two())
+
+    assert isinstance(first, str) and len(first) >= 16
+    assert first != second
+    assert not first.isdigit()
+
+
+def test_update_unknown_subscription_is_404():
+    app = FastAPI()
+    app.include_router(events.router)
+
+    response = TestClient(app).put("/events/subscriptions/1", json=BBOX)
+
+    assert response.status_code == 404
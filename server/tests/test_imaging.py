@@ -0,0 +1,64 @@
+import io
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from imaging import UploadSizeLimit, UploadTooLarge, hash_upload
+
+
+def _client(calls: list) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, path_prefixes=("/upload/",), max_bytes=1024)
+
+    @app.post("/upload/{item_id}")
+    async def upload(item_id: int, image: UploadFile = File(...)) -> dict:
+        calls.append(item_id)
+        return {"size": len(await image.read())}
+
+    return TestClient(app)
+
+
+def test_rejects_large_content_length_before_reading_body():
+    calls = []
+    response = _client(calls).post("/upload/1", files={"image": ("a.png", b"x" * 64 * 1024, "image/png")})
+
+    assert response.status_code == 413
+    assert calls == []
+
+
+def test_rejects_large_chunked_body():
+    calls = []
+
+    def body():
+        yield b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\nContent-Type: image/png\r\n\r\n'
+        for _ in range(8):
+            yield b"x" * 16 * 1024
+        yield b"\r\n--b--\r\n"
+
+    response = _client(calls).post(
+        "/upload/1", content=body(), headers={"Content-Type": "multipart/form-data; boundary=b"},
+    )
+
+    assert response.status_code == 413
+    assert calls == []
+
+
+def test_small_upload_passes():
+    calls = []
+    response = _client(calls).post("/upload/1", files={"image": ("a.png", b"x" * 100, "image/png")})
+
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+    assert calls == [1]
+
+
+def test_hash_upload_limit_and_unlimited():
+    data = io.BytesIO(b"x" * 200 * 1024)
+    with pytest.raises(UploadTooLarge):
+        hash_upload(data, max_bytes=1024)
+
+    digest, size = hash_upload(data, max_bytes=None)
+    assert size == 200 * 1024
+    assert data.tell() == 0
+    assert len(digest) == 64
@@ -0,0 +1,34 @@
+import sqlite3
+import threading
+
+import leaderboard
+
+
+def test_concurrent_init_backfills_once(db_path, monkeypatch):
+    monkeypatch.setattr(leaderboard, "DB_PATH", db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO users (username, obstacles_reported) VALUES ('a', 3)")
+    conn.execute(
+        "INSERT INTO warning_places (user_id, name, latitude, longitude, description) VALUES (1, 'p', 37.5665, 126.9780, '')"
+    )
+    conn.commit()
+
+    errors = []
+
+    def run():
+        try:
+            leaderboard.init_leaderboard()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    rows = conn.execute("SELECT scope, score FROM leaderboard_scores ORDER BY scope").fetchall()
+    conn.close()
+    assert [scope for scope, _ in rows].count("all") == 1
+    assert len(rows) == 2
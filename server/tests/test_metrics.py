@@ -0,0 +1,40 @@
+from metrics import Registry, WORKER_ID, Counter, Histogram
+from shared_cache import SharedCache
+
+
+def _registry() -> tuple[Registry, Counter, Histogram]:
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", (), (0.1, 1.0)))
+    return registry, requests, latency
+
+
+def test_render_merged_labels_each_worker_once_per_family(tmp_path):
+    registry, requests, latency = _registry()
+    requests.inc(route="/a")
+    latency.observe(0.05)
+
+    shared = SharedCache(str(tmp_path / "cache.db"), 10)
+    shared.set_worker_metrics("other", {"requests_total": ['requests_total{route="/a",worker="other"} 4']})
+    shared.set_worker_metrics(WORKER_ID, registry.collect())
+
+    text = registry.render_merged(shared.get_worker_metrics(60).values())
+
+    assert text.count("# TYPE requests_total counter") == 1
+    assert f'requests_total{{route="/a",worker="{WORKER_ID}"}} 1' in text
+    assert 'requests_total{route="/a",worker="other"} 4' in text
+    assert f'latency_seconds_bucket{{worker="{WORKER_ID}",le="0.1"}} 1' in text
+
+
+def test_stale_workers_are_dropped(tmp_path):
+    shared = SharedCache(str(tmp_path / "cache.db"), 10)
+    shared.set_worker_metrics("gone", {})
+
+    assert shared.get_worker_metrics(0) == {}
+
+
+def test_single_worker_render_has_no_worker_label():
+    registry, requests, _ = _registry()
+    requests.inc(route="/a")
+
+    assert 'requests_total{route="/a"} 1' in registry.render()
@@ -0,0 +1,54 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import navigation
+from directions import encode_polyline
+
+ROUTE = {"polyline": encode_polyline([(37.5665, 126.9780), (37.5675, 126.9790)])}
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(navigation.router)
+    return TestClient(app)
+
+
+def test_sessions_rejected_when_off(db_path, monkeypatch):
+    monkeypatch.setattr(navigation, "NAVIGATION_SESSIONS", "off")
+
+    response = _client().post("/navigation/sessions", json=ROUTE)
+
+    assert response.status_code == 503
+    assert navigation.session_count() == 0
+
+
+def test_sessions_served_when_local(db_path, monkeypatch):
+    monkeypatch.setattr(navigation, "NAVIGATION_SESSIONS", "local")
+    client = _client()
+
+    response = client.post("/navigation/sessions", json=ROUTE)
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+
+    assert client.delete(f"/navigation/sessions/{session_id}").status_code == 200
+
+
+def test_socket_replies_error_to_bad_frames(db_path, monkeypatch):
+    monkeypatch.setattr(navigation, "NAVIGATION_SESSIONS", "local")
+    client = _client()
+    session_id = client.post("/navigation/sessions", json=ROUTE).json()["session_id"]
+
+    with client.websocket_connect(f"/navigation/sessions/{session_id}/ws") as socket:
+        socket.send_bytes(b"\xff\x00")
+        assert socket.receive_json() == {"type": "error", "detail": "Invalid fix"}
+
+        socket.send_text("[37.5665, 126.9780]")
+        assert socket.receive_json() == {"type": "error", "detail": "Invalid fix"}
+
+        socket.send_text("not json")
+        assert socket.receive_json() == {"type": "error", "detail": "Invalid fix"}
+
+        socket.send_bytes(b'{"latitude": 37.5665, "longitude": 126.9780}')
+        assert socket.receive_json()["type"] == "position"
+
+    client.delete(f"/navigation/sessions/{session_id}")
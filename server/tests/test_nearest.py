@@ -0,0 +1,76 @@
+import random
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import warning
+from geo import haversine_distance
+from snapshot import PlaceSnapshot
+
+ORIGIN = (37.5665, 126.9780)
+
+
+@pytest.fixture
+def places(db_path, monkeypatch) -> list[tuple[int, float, float, str]]:
+    """흩어진 점 + 같은 좌표에 겹친 점(거리 동률) + 중복으로 묶인 점"""
+    rng = random.Random(5)
+    rows = []
+    for _ in range(60):
+        rows.append((ORIGIN[0] + rng.uniform(-0.02, 0.02), ORIGIN[1] + rng.uniform(-0.02, 0.02), rng.choice(["Stair", "EV"])))
+    for _ in range(5):
+        rows.append((ORIGIN[0] + 0.001, ORIGIN[1] + 0.001, "Stair"))
+    rows.append((ORIGIN[0], ORIGIN[1], "EV"))
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO warning_places (name, latitude, longitude, description, type) VALUES ('p', ?, ?, '', ?)", rows,
+    )
+    # 중복으로 묶인 장소는 결과에 나오지 않아야 함
+    conn.execute("UPDATE warning_places SET duplicate_of = 1 WHERE id IN (2, 3)")
+    conn.commit()
+    found = conn.execute("SELECT id, latitude, longitude, type FROM warning_places WHERE duplicate_of IS NULL").fetchall()
+    conn.close()
+
+    monkeypatch.setattr(warning, "place_snapshot", PlaceSnapshot())
+    return found
+
+
+def _brute_force(places, place_type=None, max_radius=float("inf")) -> list[int]:
+    ranked = sorted(
+        (haversine_distance(*ORIGIN, lat, lng), place_id)
+        for place_id, lat, lng, kind in places
+        if place_type is None or kind == place_type
+    )
+    return [place_id for distance, place_id in ranked if distance <= max_radius]
+
+
+def _page_through(client: TestClient, k: int, **params) -> list[int]:
+    ids, cursor = [], None
+    while True:
+        query = {"latitude": ORIGIN[0], "longitude": ORIGIN[1], "k": k, **params}
+        if cursor is not None:
+            query["cursor"] = cursor
+        response = client.get("/warning/nearest", params=query)
+        assert response.status_code == 200
+        body = response.json()
+        distances = [place["distance"] for place in body["places"]]
+        assert distances == sorted(distances)
+        ids.extend(place["id"] for place in body["places"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("k", [1, 3, 7, 100])
+@pytest.mark.parametrize("params", [{}, {"type": "Stair"}, {"max_radius": 1500}])
+def test_cursor_pages_match_brute_force(places, k, params):
+    app = FastAPI()
+    app.include_router(warning.router)
+
+    ids = _page_through(TestClient(app), k, **params)
+
+    expected = _brute_force(places, params.get("type"), params.get("max_radius", float("inf")))
+    assert ids == expected
+    assert len(ids) == len(set(ids))
@@ -0,0 +1,112 @@
+import math
+import random
+
+import pytest
+
+import routing
+from routing import NoRoute, WalkingGraph, build_graph, build_hierarchy, open_graph, save_graph
+
+PAIRS = 60
+
+
+def _random_graph(seed: int) -> WalkingGraph:
+    """격자 위에 노드를 흩뿌리고 이웃끼리 잇는 길 + 몇 개의 긴 길 (계단 포함)"""
+    rng = random.Random(seed)
+    nodes = {}
+    for ref in range(1, 161):
+        row, col = divmod(ref - 1, 16)
+        nodes[ref] = (37.56 + row * 0.0004 + rng.uniform(-0.0001, 0.0001), 126.97 + col * 0.0005 + rng.uniform(-0.0001, 0.0001))
+
+    ways = []
+    for ref in nodes:
+        row, col = divmod(ref - 1, 16)
+        if col < 15 and rng.random() < 0.85:
+            ways.append(([ref, ref + 1], {"highway": "footway", "name": f"r{row}"}))
+        if row < 9 and rng.random() < 0.85:
+            ways.append(([ref, ref + 16], {"highway": "footway", "name": f"c{col}"}))
+    for _ in range(15):
+        refs = rng.sample(sorted(nodes), 3)
+        ways.append((refs, {"highway": rng.choice(["path", "steps"])}))
+    return build_graph(nodes, ways)
+
+
+def _path_cost(graph: WalkingGraph, source: int, target: int, edges: list[int]) -> float:
+    node = source
+    total = 0.0
+    for edge in edges:
+        assert graph.source_of(edge) == node
+        node = graph.targets[edge]
+        total += graph.cost(edge)
+    assert node == target
+    return total
+
+
+def _route(graph: WalkingGraph, source: int, target: int, use_hierarchy: bool) -> float:
+    try:
+        edges = graph.shortest_path(source, target) if use_hierarchy else graph._astar(source, target)
+    except NoRoute:
+        return math.inf
+    return _path_cost(graph, source, target, edges)
+
+
+def _assert_matches_astar(graph: WalkingGraph, seed: int) -> None:
+    assert graph.hierarchy is not None and not graph.pending_edges
+    rng = random.Random(seed)
+    for _ in range(PAIRS):
+        source, target = rng.randrange(graph.node_count), rng.randrange(graph.node_count)
+        expected = _route(graph, source, target, use_hierarchy=False)
+        actual = _route(graph, source, target, use_hierarchy=True)
+        assert actual == pytest.approx(expected, rel=1e-5), (source, target)
+
+
+def _add_obstacles(graph: WalkingGraph, seed: int, count: int) -> None:
+    rng = random.Random(seed)
+    for place_id in range(count):
+        node = rng.randrange(graph.node_count)
+        edges = graph.apply_obstacle(place_id, graph.lat[node], graph.lng[node], rng.choice(["Stair", "Stuff", "EV"]), rng.randrange(3))
+        graph.pending_edges.update(edges)
+
+
+@pytest.fixture
+def graph() -> WalkingGraph:
+    graph = _random_graph(7)
+    graph.attach_hierarchy(build_hierarchy(graph))
+    return graph
+
+
+def test_cch_matches_astar_on_base_costs(graph):
+    _assert_matches_astar(graph, 1)
+
+
+def test_cch_matches_astar_after_partial_customize(graph, monkeypatch):
+    monkeypatch.setattr(routing, "FULL_CUSTOMIZE_RATIO", math.inf)
+    for round in range(3):
+        _add_obstacles(graph, 100 + round, 4)
+        routing._customize(graph)
+        _assert_matches_astar(graph, 200 + round)
+
+
+def test_cch_matches_astar_after_full_customize(graph, monkeypatch):
+    monkeypatch.setattr(routing, "FULL_CUSTOMIZE_RATIO", 0)
+    _add_obstacles(graph, 300, 12)
+    routing._customize(graph)
+    _assert_matches_astar(graph, 301)
+
+
+def test_saved_graph_round_trips_through_mmap(graph, tmp_path):
+    source = tmp_path / "area.osm"
+    source.write_text("<osm/>")
+    path = tmp_path / "area.osm.cch"
+    save_graph(graph, graph.hierarchy, path, source)
+
+    opened = open_graph(path, source)
+
+    assert opened is not None
+    assert opened.node_count == graph.node_count and opened.edge_count == graph.edge_count
+    rng = random.Random(2)
+    for _ in range(PAIRS):
+        source_node, target_node = rng.randrange(graph.node_count), rng.randrange(graph.node_count)
+        assert _route(opened, source_node, target_node, True) == pytest.approx(_route(graph, source_node, target_node, True))
+
+    source.write_text("<osm></osm>")
+    assert open_graph(path, source) is None
@@ -0,0 +1,24 @@
+import sqlite3
+
+from db import TimedConnection
+from snapshot import place_snapshot
+from warning import _record_change
+
+
+def test_rolled_back_change_is_not_expected(db_path, monkeypatch):
+    monkeypatch.setattr(place_snapshot, "_wanted", 0)
+    conn = sqlite3.connect(db_path, factory=TimedConnection)
+    conn.row_factory = sqlite3.Row
+    conn.execute("INSERT INTO warning_places (name, latitude, longitude, description, type) VALUES ('a', 37.5665, 126.9780, '', 'Stair')")
+
+    change_id = _record_change(conn, 1, "add")
+    assert place_snapshot._wanted == 0
+
+    conn.rollback()
+    assert place_snapshot._wanted == 0
+
+    conn.execute("INSERT INTO warning_places (name, latitude, longitude, description, type) VALUES ('a', 37.5665, 126.9780, '', 'Stair')")
+    change_id = _record_change(conn, 1, "add")
+    conn.commit()
+    assert place_snapshot._wanted == change_id
+    conn.close()
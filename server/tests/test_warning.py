@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def _import_warning(policy: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", "import warning"],
+        cwd=SERVER_DIR, env={**os.environ, "DUPLICATE_POLICY": policy}, capture_output=True, text=True,
+    )
+
+
+def test_unknown_duplicate_policy_fails_at_import():
+    result = _import_warning("mrege")
+
+    assert result.returncode != 0
+    assert "Unknown DUPLICATE_POLICY: mrege" in result.stderr
+
+
+def test_known_duplicate_policy_imports():
+    assert _import_warning("link").returncode == 0
@@ -0,0 +1,266 @@
+import asyncio
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator
+
+import httpx
+from fastapi import Request
+
+
+# OTLP/HTTP(JSON) 수집기 주소 (예: http://localhost:4318), 비어 있으면 내보내지 않음
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "").rstrip("/")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "openroute-server")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_BATCH_SIZE = 100
+TRACE_EXPORT_INTERVAL_SECONDS = 2.0
+
+# 이 시간(ms)보다 오래 걸린 요청의 스택 샘플을 저장 (0이면 프로파일러 끔)
+PROFILE_SLOW_REQUESTS_MS = float(os.getenv("PROFILE_SLOW_REQUESTS_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "./profiles"))
+PROFILE_BUFFER_SAMPLES = 50000
+# 맨 위 프레임이 이 파일들이면 대기 중인 스레드로 보고 제외
+IDLE_FRAME_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "start_ns", "end_ns")
+
+    def __init__(self, name: str, parent_id: str | None):
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(name, None)
+        self.spans: list[Span] = []
+        self.attributes: dict[str, str | int] = {}
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    현재 요청 트레이스에 구간 기록 (동기/비동기 코드 모두 사용 가능)
+    트레이스 밖에서 호출되면 아무것도 하지 않음
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    parent = _current_span.get() or trace.root
+    current = Span(name, parent.span_id)
+    token = _current_span.set(current)
+    try:
+        yield
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+
+def _server_timing(trace: Trace) -> str:
+    # 같은 이름의 구간(예: 경로마다 반복되는 단계)은 합산
+    totals: dict[str, tuple[float, int]] = {}
+    for item in trace.spans:
+        duration, count = totals.get(item.name, (0.0, 0))
+        totals[item.name] = (duration + item.duration_ms, count + 1)
+
+    entries = [
+        f'{name};dur={duration:.2f}' + (f';desc="x{count}"' if count > 1 else "")
+        for name, (duration, count) in totals.items()
+    ]
+    entries.append(f"total;dur={trace.root.duration_ms:.2f}")
+    return ", ".join(entries)
+
+
+# --- OTLP 내보내기 ---
+
+def _otlp_attributes(attributes: dict[str, str | int]) -> list[dict]:
+    return [
+        {"key": key, "value": {"intValue": str(value)} if isinstance(value, int) else {"stringValue": str(value)}}
+        for key, value in attributes.items()
+    ]
+
+
+def _otlp_span(trace: Trace, item: Span, attributes: dict | None = None) -> dict:
+    data = {
+        "traceId": trace.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        # SPAN_KIND_SERVER=2, SPAN_KIND_INTERNAL=1
+        "kind": 2 if item.parent_id is None else 1,
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns),
+        "attributes": _otlp_attributes(attributes or {}),
+    }
+    if item.parent_id:
+        data["parentSpanId"] = item.parent_id
+    return data
+
+
+class OTLPExporter:
+    """완료된 트레이스를 모아 백그라운드 스레드에서 /v1/traces로 전송"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.url = f"{endpoint}/v1/traces"
+        self.service_name = service_name
+        self._queue: queue.Queue[Trace] = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # 수집기가 느리면 버림
+
+    def _payload(self, traces: list[Trace]) -> dict:
+        spans = []
+        for trace in traces:
+            spans.append(_otlp_span(trace, trace.root, trace.attributes))
+            spans.extend(_otlp_span(trace, item) for item in trace.spans)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "openroute.tracing"}, "spans": spans}],
+            }]
+        }
+
+    def _run(self) -> None:
+        with httpx.Client(timeout=5) as client:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + TRACE_EXPORT_INTERVAL_SECONDS
+                while len(batch) < TRACE_EXPORT_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                try:
+                    client.post(self.url, json=self._payload(batch))
+                except httpx.HTTPError as e:
+                    print(f"[Tracing] OTLP export failed: {e}")
+
+
+_exporter = OTLPExporter(OTEL_EXPORTER_OTLP_ENDPOINT, OTEL_SERVICE_NAME) if OTEL_EXPORTER_OTLP_ENDPOINT else None
+
+
+# --- 느린 요청 프로파일러 ---
+
+def _collapse_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    모든 스레드의 스택을 주기적으로 샘플링해서 링 버퍼에 보관
+    느린 요청이 끝나면 그 요청 구간의 샘플을 collapsed stack 파일로 저장
+    (flamegraph.pl, speedscope 등으로 열 수 있음)
+
+    이벤트 루프는 여러 요청이 함께 쓰므로 동시에 처리된 다른 요청의 샘플이 섞일 수 있음
+    """
+
+    def __init__(self, interval_seconds: float, output_dir: Path):
+        self.interval_seconds = interval_seconds
+        self.output_dir = output_dir
+        self._samples: deque[tuple[int, str]] = deque(maxlen=PROFILE_BUFFER_SAMPLES)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval_seconds)
+            now = time.time_ns()
+            stacks = [
+                _collapse_stack(frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id
+            ]
+            with self._lock:
+                self._samples.extend((now, stack) for stack in stacks)
+
+    def dump(self, trace: Trace) -> Path | None:
+        with self._lock:
+            samples = [stack for ts, stack in self._samples if trace.root.start_ns <= ts <= trace.root.end_ns]
+        if not samples:
+            return None
+
+        counts: dict[str, int] = {}
+        for stack in samples:
+            leaf = stack.rsplit(";", 1)[-1]
+            if leaf.split("(", 1)[-1].startswith(IDLE_FRAME_FILES):
+                continue
+            counts[stack] = counts.get(stack, 0) + 1
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        route = re.sub(r"[^A-Za-z0-9.-]+", "_", str(trace.attributes.get("http.route", ""))).strip("_") or "root"
+        path = self.output_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{trace.trace_id[:8]}.folded"
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in counts.items()))
+        return path
+
+
+_profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000, PROFILE_DIR) if PROFILE_SLOW_REQUESTS_MS > 0 else None
+
+
+async def trace_requests(request: Request, call_next):
+    """요청마다 트레이스를 만들고 Server-Timing 헤더로 구간별 시간을 돌려줌"""
+    trace = Trace(f"{request.method} {request.url.path}")
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        response = await call_next(request)
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+    route = request.scope.get("route")
+    trace.attributes.update({
+        "http.method": request.method,
+        "http.route": getattr(route, "path", "unmatched"),
+        "http.status_code": response.status_code,
+    })
+    trace.root.name = f"{request.method} {trace.attributes['http.route']}"
+    response.headers["Server-Timing"] = _server_timing(trace)
+
+    if _exporter is not None and random.random() < TRACE_SAMPLE_RATIO:
+        _exporter.submit(trace)
+    if _profiler is not None and trace.root.duration_ms >= PROFILE_SLOW_REQUESTS_MS:
+        path = await asyncio.to_thread(_profiler.dump, trace)
+        if path is not None:
+            response.headers["X-Profile"] = path.name
+    return response
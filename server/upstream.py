@@ -0,0 +1,265 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+import httpx
+from fastapi import HTTPException
+
+import metrics
+
+
+# 실패로 볼 비율과 판단에 필요한 최소 호출 수 (최근 UPSTREAM_WINDOW_SIZE건 기준)
+UPSTREAM_FAILURE_RATIO = float(os.getenv("UPSTREAM_FAILURE_RATIO", "0.5"))
+UPSTREAM_MIN_CALLS = int(os.getenv("UPSTREAM_MIN_CALLS", "10"))
+UPSTREAM_WINDOW_SIZE = int(os.getenv("UPSTREAM_WINDOW_SIZE", "20"))
+# 회로가 열린 뒤 다시 시험 호출을 보내기까지 대기 시간 (초)
+UPSTREAM_OPEN_SECONDS = float(os.getenv("UPSTREAM_OPEN_SECONDS", "15"))
+# 이보다 오래 걸린 응답도 실패로 셈 (초, 0이면 끔)
+UPSTREAM_SLOW_CALL_SECONDS = float(os.getenv("UPSTREAM_SLOW_CALL_SECONDS", "5"))
+# 토큰/동시 실행 슬롯을 기다리는 최대 시간 (초), 넘으면 바로 503
+UPSTREAM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "1"))
+
+# API별 기본 한도 (워커 프로세스마다 적용), UPSTREAM_<API>_RPS / _BURST / _CONCURRENCY로 변경
+# rps가 0이면 속도 제한 없음
+DEFAULT_LIMITS = {
+    "tiles": {"rps": 500, "burst": 1000, "concurrency": 64},
+    "tile_session": {"rps": 5, "burst": 10, "concurrency": 4},
+    "places": {"rps": 50, "burst": 100, "concurrency": 32},
+    "directions": {"rps": 20, "burst": 40, "concurrency": 16},
+}
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(HTTPException):
+    """회로가 열렸거나 한도를 넘어서 외부 API를 호출하지 않음"""
+
+    def __init__(self, api: str, reason: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Upstream {api} unavailable ({reason})",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+        self.api = api
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self, max_wait: float) -> float | None:
+        """토큰 하나를 예약하고 기다려야 할 시간 반환, max_wait보다 길면 None"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+
+class CircuitBreaker:
+    """
+    최근 호출의 실패 비율로 열림/닫힘 결정
+    열린 뒤 open_seconds가 지나면 시험 호출 하나만 통과시키고(half-open) 그 결과로 다시 결정
+    """
+
+    def __init__(self, failure_ratio: float, min_calls: int, window_size: int, open_seconds: float):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._results: deque[bool] = deque(maxlen=window_size)
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, success: bool) -> None:
+        if self.state == OPEN:
+            return  # 열리기 전에 출발한 호출의 결과
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if success:
+                self.state = CLOSED
+                self._results.clear()
+            else:
+                self._open()
+            return
+
+        self._results.append(success)
+        failures = self._results.count(False)
+        if len(self._results) >= self.min_calls and failures / len(self._results) >= self.failure_ratio:
+            self._open()
+
+    def release(self) -> None:
+        """시험 호출이 결과 없이 끝난 경우 (취소 등)"""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._results.clear()
+
+
+class LatencyTracker:
+    """최근 응답 시간의 백분위수 (정렬은 refresh_every건마다 한 번)"""
+
+    def __init__(self, size: int = 512, min_samples: int = 50, refresh_every: int = 32):
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._samples: deque[float] = deque(maxlen=size)
+        self._sorted: list[float] = []
+        self._pending = 0
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._pending += 1
+
+    def percentile(self, p: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._pending >= self.refresh_every or not self._sorted:
+            self._sorted = sorted(self._samples)
+            self._pending = 0
+        return self._sorted[min(len(self._sorted) - 1, int(len(self._sorted) * p))]
+
+
+class HedgeBudget:
+    """
+    요청마다 ratio만큼 적립하고 헤지 하나에 1을 씀
+    헤지 요청 수가 전체의 ratio를 넘지 않음 (max_balance는 한가할 때 모아 둘 수 있는 양)
+    """
+
+    def __init__(self, ratio: float, max_balance: float = 10):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.balance = 0.0
+
+    def deposit(self) -> None:
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+def _limit(api: str, name: str) -> float:
+    return float(os.getenv(f"UPSTREAM_{api.upper()}_{name.upper()}", str(DEFAULT_LIMITS[api][name])))
+
+
+class UpstreamGuard:
+    """외부 API 하나에 대한 속도 제한 + 동시 실행 제한 + 회로 차단기"""
+
+    def __init__(self, api: str):
+        self.api = api
+        self.bucket = TokenBucket(_limit(api, "rps"), _limit(api, "burst"))
+        self.concurrency = int(_limit(api, "concurrency"))
+        self.breaker = CircuitBreaker(UPSTREAM_FAILURE_RATIO, UPSTREAM_MIN_CALLS, UPSTREAM_WINDOW_SIZE, UPSTREAM_OPEN_SECONDS)
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def _reject(self, reason: str, retry_after: float) -> UpstreamUnavailable:
+        metrics.upstream_rejections.inc(api=self.api, reason=reason)
+        return UpstreamUnavailable(self.api, reason, retry_after)
+
+    async def call(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        send()로 요청을 보내고 결과를 회로 차단기에 기록
+        통과시킬 수 없으면 요청을 만들지 않고 UpstreamUnavailable(503)
+        5xx/429/타임아웃/느린 응답은 실패, 그 밖의 응답은 성공으로 셈
+        """
+        if not self.breaker.allow():
+            raise self._reject("circuit_open", self.breaker.retry_after())
+
+        try:
+            wait = self.bucket.reserve(UPSTREAM_QUEUE_TIMEOUT_SECONDS)
+            if wait is None:
+                raise self._reject("rate_limited", 1 / self.bucket.rate)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), UPSTREAM_QUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise self._reject("saturated", UPSTREAM_QUEUE_TIMEOUT_SECONDS)
+        except BaseException:
+            self.breaker.release()
+            raise
+
+        self.in_flight += 1
+        started = time.monotonic()
+        success: bool | None = False
+        try:
+            response = await metrics.timed_upstream(self.api, send())
+            slow = UPSTREAM_SLOW_CALL_SECONDS > 0 and time.monotonic() - started > UPSTREAM_SLOW_CALL_SECONDS
+            success = response.status_code < 500 and response.status_code != 429 and not slow
+            return response
+        except asyncio.CancelledError:
+            # 클라이언트 연결 끊김 등으로 취소된 호출은 업스트림 상태와 무관
+            success = None
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            if success is None:
+                self.breaker.release()
+            else:
+                self.breaker.record(success)
+
+    def status(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "retry_after": round(self.breaker.retry_after(), 1) if self.breaker.state == OPEN else 0,
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "rate_per_second": self.bucket.rate,
+            "tokens": round(self.bucket.tokens, 1),
+        }
+
+
+guards: dict[str, UpstreamGuard] = {api: UpstreamGuard(api) for api in DEFAULT_LIMITS}
+
+
+def get_guard(api: str) -> UpstreamGuard:
+    return guards[api]
+
+
+def status() -> dict:
+    return {api: guard.status() for api, guard in guards.items()}
+
+
+metrics.gauge(
+    "upstream_circuit_state", "Circuit breaker state (0=closed, 1=half_open, 2=open)", ("api",),
+    collect=lambda: [((api,), CIRCUIT_STATE_VALUES[guard.breaker.state]) for api, guard in guards.items()],
+)
+metrics.gauge(
+    "upstream_in_flight", "Upstream calls currently in flight", ("api",),
+    collect=lambda: [((api,), guard.in_flight) for api, guard in guards.items()],
+)
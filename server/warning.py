@@ -1,22 +1,39 @@
+import asyncio
+import math
 import sqlite3
 import os
-import io
-from datetime import date, timedelta
-from pathlib import Path
-from typing import Literal
+from typing import BinaryIO, Literal, get_args
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query, Request, Response
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from PIL import Image, UnidentifiedImageError
 
-from db import get_db
+from badge import record_user_activity
+from db import TimedConnection, get_db
+from events import CHANGE_EVENTS, publishes_inline, publish_place_event
+from geo import bbox_around, haversine_distance
+from imaging import MAX_UPLOAD_BYTES, RenditionSize, UploadTooLarge, hash_upload, image_executor, rendition_key
+from snapshot import fetch_places, place_snapshot
+from storage import WARNING_PLACE_IMG_PATH, image_store, store_renditions
 
 
 router = APIRouter(prefix="/warning", tags=["warning"])
 
 
 PlaceType = Literal["Stuff", "Stair", "EV"]
+ChangeType = Literal["add", "image", "verify"]
+DuplicatePolicy = Literal["merge", "link", "ignore"]
+
+PLACE_COLUMNS = "id, user_id, name, latitude, longitude, description, type, has_image, image_hash, verification_count, duplicate_of, created_at, updated_at"
+MAX_CHANGES_PAGE_SIZE = 1000
+MAX_NEAREST_PAGE_SIZE = 100
+
+# 같은 타입의 기존 장소가 이 반경(미터) 안에 있으면 중복 제보로 판단
+DUPLICATE_RADIUS_METERS = float(os.getenv("DUPLICATE_RADIUS_METERS", "10"))
+DUPLICATE_POLICY: DuplicatePolicy = os.getenv("DUPLICATE_POLICY", "merge")
+if DUPLICATE_POLICY not in get_args(DuplicatePolicy):
+    raise RuntimeError(f"Unknown DUPLICATE_POLICY: {DUPLICATE_POLICY}")
 
 
 class RequestAddWarningPlace(BaseModel):
@@ -26,6 +43,8 @@ class RequestAddWarningPlace(BaseModel):
     longitude: float
     description: str
     type: PlaceType = "Stuff"
+    # 없으면 서버 기본값(DUPLICATE_POLICY) 사용
+    duplicate_policy: DuplicatePolicy | None = None
 
 
 class RequestListWarningPlace(BaseModel):
@@ -48,32 +67,73 @@ class RequestViewport(BaseModel):
     type: PlaceType | None = None
 
 
-def _update_consecutive_days(db: sqlite3.Connection, user_id: int) -> None:
-    today = date.today().isoformat()
-    yesterday = (date.today() - timedelta(days=1)).isoformat()
+def _record_change(db: TimedConnection, place_id: int, change_type: ChangeType) -> int:
+    change_id = db.execute(
+        "INSERT INTO place_changes (place_id, change_type) VALUES (?, ?)",
+        (place_id, change_type),
+    ).lastrowid
+    # 롤백되면 스냅샷/구독자가 없던 변경을 보지 않도록 커밋 뒤에 반영
+    db.after_commit(lambda: place_snapshot.expect(change_id))
 
-    user = db.execute(
-        "SELECT last_report_date, consecutive_days FROM users WHERE id = ?",
-        (user_id,),
+    if publishes_inline():
+        row = db.execute(
+            f"SELECT {PLACE_COLUMNS} FROM warning_places WHERE id = ?",
+            (place_id,),
+        ).fetchone()
+        if row is not None:
+            event_type, place = CHANGE_EVENTS[change_type], dict(row)
+            db.after_commit(lambda: publish_place_event(event_type, change_id, place))
+
+    return change_id
+
+
+def _find_duplicate_place(
+    db: sqlite3.Connection,
+    place_type: str,
+    latitude: float,
+    longitude: float,
+    radius: float = DUPLICATE_RADIUS_METERS,
+) -> tuple[sqlite3.Row, float] | None:
+    """반경 안에서 가장 가까운 같은 타입의 원본 장소 (좌표 인덱스로 후보를 좁힌 뒤 거리 계산)"""
+    min_lat, min_lng, max_lat, max_lng = bbox_around(latitude, longitude, radius)
+    rows = db.execute(
+        """SELECT id, user_id, latitude, longitude
+           FROM warning_places
+           WHERE latitude >= ? AND latitude <= ? AND longitude >= ? AND longitude <= ?
+           AND type = ? AND duplicate_of IS NULL""",
+        (min_lat, max_lat, min_lng, max_lng, place_type),
+    ).fetchall()
+
+    nearest = None
+    for row in rows:
+        distance = haversine_distance(latitude, longitude, row["latitude"], row["longitude"])
+        if distance <= radius and (nearest is None or distance < nearest[1]):
+            nearest = (row, distance)
+    return nearest
+
+
+def _merge_duplicate_report(db: sqlite3.Connection, existing: sqlite3.Row, user_id: int) -> bool:
+    """중복 제보를 기존 장소에 대한 검증으로 반영, 새로 반영됐으면 True"""
+    if existing["user_id"] == user_id:
+        return False
+
+    already = db.execute(
+        "SELECT id FROM verifications WHERE user_id = ? AND place_id = ?",
+        (user_id, existing["id"]),
     ).fetchone()
+    if already:
+        return False
 
-    if user is None:
-        return
-
-    last_date = user["last_report_date"]
-    consecutive = user["consecutive_days"] or 0
-
-    if last_date == today:
-        return
-    elif last_date == yesterday:
-        consecutive += 1
-    else:
-        consecutive = 1
-
     db.execute(
-        "UPDATE users SET consecutive_days = ?, last_report_date = ? WHERE id = ?",
-        (consecutive, today, user_id),
+        "INSERT INTO verifications (user_id, place_id, is_valid) VALUES (?, ?, 1)",
+        (user_id, existing["id"]),
+    )
+    db.execute(
+        "UPDATE warning_places SET verification_count = verification_count + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (existing["id"],),
     )
+    _record_change(db, existing["id"], "verify")
+    return True
 
 
 @router.post("/add_place")
@@ -82,33 +142,62 @@ def add_warning_place(
     db: sqlite3.Connection = Depends(get_db),
 ) -> dict:
     try:
+        policy = place.duplicate_policy or DUPLICATE_POLICY
+        found = None
+        if policy != "ignore" and DUPLICATE_RADIUS_METERS > 0:
+            found = _find_duplicate_place(db, place.type, place.latitude, place.longitude)
+
+        duplicate = None
+        if found is not None:
+            existing, distance = found
+            duplicate = {
+                "action": "merged" if policy == "merge" else "linked",
+                "place_id": existing["id"],
+                "distance": round(distance, 1),
+            }
+
+            if policy == "merge":
+                confirmed = _merge_duplicate_report(db, existing, place.user_id)
+                duplicate["confirmed"] = confirmed
+                new_badges = record_user_activity(
+                    db, place.user_id, {"verifications": 1} if confirmed else {}, report=True,
+                    location=(existing["latitude"], existing["longitude"]),
+                )
+                return {
+                    "message": "Duplicate report merged into existing place",
+                    "id": existing["id"],
+                    "duplicate": duplicate,
+                    "new_badges": new_badges,
+                }
+
         cursor = db.execute(
             """INSERT INTO warning_places
-               (user_id, name, latitude, longitude, description, type)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (place.user_id, place.name, place.latitude, place.longitude, place.description, place.type),
+               (user_id, name, latitude, longitude, description, type, duplicate_of)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (
+                place.user_id, place.name, place.latitude, place.longitude, place.description, place.type,
+                duplicate["place_id"] if duplicate else None,
+            ),
         )
         place_id = cursor.lastrowid
 
-        db.execute(
-            "UPDATE users SET obstacles_reported = obstacles_reported + 1 WHERE id = ?",
-            (place.user_id,),
-        )
-
+        increments = {"obstacles_reported": 1}
         if place.type == "Stair":
-            db.execute(
-                "UPDATE users SET stairs_reported = stairs_reported + 1 WHERE id = ?",
-                (place.user_id,),
-            )
+            increments["stairs_reported"] = 1
         elif place.type == "EV":
-            db.execute(
-                "UPDATE users SET elevators_reported = elevators_reported + 1 WHERE id = ?",
-                (place.user_id,),
-            )
+            increments["elevators_reported"] = 1
 
-        _update_consecutive_days(db, place.user_id)
+        new_badges = record_user_activity(
+            db, place.user_id, increments, report=True, location=(place.latitude, place.longitude),
+        )
+        _record_change(db, place_id, "add")
 
-        return {"message": "Warning place added successfully", "id": place_id}
+        return {
+            "message": "Warning place added successfully",
+            "id": place_id,
+            "duplicate": duplicate,
+            "new_badges": new_badges,
+        }
     except sqlite3.OperationalError as e:
         print(f"[DB Error] add_place: {e}")
         raise HTTPException(status_code=500, detail=f"Database operational error: {e}")
@@ -123,27 +212,20 @@ def get_places_in_viewport(
     db: sqlite3.Connection = Depends(get_db),
 ) -> dict:
     try:
-        if viewport.type:
-            rows = db.execute(
-                """SELECT id, latitude, longitude, type
-                   FROM warning_places
-                   WHERE latitude >= ? AND latitude <= ? AND longitude >= ? AND longitude <= ? AND type = ?""",
-                (viewport.sw_latitude, viewport.ne_latitude, viewport.sw_longitude, viewport.ne_longitude, viewport.type),
-            ).fetchall()
-        else:
-            rows = db.execute(
-                """SELECT id, latitude, longitude, type
-                   FROM warning_places
-                   WHERE latitude >= ? AND latitude <= ? AND longitude >= ? AND longitude <= ?""",
-                (viewport.sw_latitude, viewport.ne_latitude, viewport.sw_longitude, viewport.ne_longitude),
-            ).fetchall()
+        place_snapshot.ensure(db)
+        # 결과에는 이 커서까지의 변경이 모두 들어 있음
+        cursor = place_snapshot.generation
+        rows = place_snapshot.in_bbox(
+            viewport.sw_latitude, viewport.sw_longitude, viewport.ne_latitude, viewport.ne_longitude,
+            viewport.type,
+        )
 
         grouped: dict[tuple[float, float, str], list[int]] = {}
-        for row in rows:
-            key = (row["latitude"], row["longitude"], row["type"])
+        for place_id, latitude, longitude, place_type in rows:
+            key = (latitude, longitude, place_type)
             if key not in grouped:
                 grouped[key] = []
-            grouped[key].append(row["id"])
+            grouped[key].append(place_id)
 
         places = [
             {
@@ -155,22 +237,79 @@ def get_places_in_viewport(
             for (lat, lng, place_type), ids in grouped.items()
         ]
 
+        types = [place_type for _, _, _, place_type in rows]
         stats = {
             "total": len(rows),
-            "Stuff": sum(1 for r in rows if r["type"] == "Stuff"),
-            "Stair": sum(1 for r in rows if r["type"] == "Stair"),
-            "EV": sum(1 for r in rows if r["type"] == "EV"),
+            "Stuff": types.count("Stuff"),
+            "Stair": types.count("Stair"),
+            "EV": types.count("EV"),
         }
 
         return {
             "message": "Places retrieved successfully",
             "stats": stats,
             "places": places,
+            "cursor": cursor,
         }
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to get places in viewport")
 
 
+def _parse_distance_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        distance, place_id = cursor.split(":")
+        parsed = (float(distance), int(place_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not parsed[0] >= 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return parsed
+
+
+@router.get("/nearest")
+def get_nearest_places(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=MAX_NEAREST_PAGE_SIZE),
+    type: PlaceType | None = Query(None),
+    max_radius: float | None = Query(None, gt=0, description="이 거리(m) 안에서만"),
+    cursor: str | None = Query(None, description="이전 응답의 next_cursor"),
+    db: sqlite3.Connection = Depends(get_db),
+) -> dict:
+    """
+    가까운 장애물 k개 (거리순)
+
+    - 메모리 스냅샷의 격자 색인에서 가까운 셀부터 펼치는 best-first 탐색
+    - next_cursor로 다음 페이지 (그 거리 이후부터)
+    """
+    after = _parse_distance_cursor(cursor) if cursor else None
+    try:
+        place_snapshot.ensure(db)
+        found = place_snapshot.nearest(
+            latitude, longitude, k + 1, type,
+            max_radius if max_radius is not None else math.inf, after,
+        )
+        page = found[:k]
+        distances = dict(page)
+        places = [
+            {**dict(row), "distance": round(distances[row["id"]], 1)}
+            for row in fetch_places(db, PLACE_COLUMNS, [place_id for place_id, _ in page])
+        ]
+
+        next_cursor = None
+        if len(found) > k:
+            last_id, last_distance = page[-1]
+            next_cursor = f"{last_distance!r}:{last_id}"
+
+        return {
+            "message": "Nearest places retrieved successfully",
+            "places": places,
+            "next_cursor": next_cursor,
+        }
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to get nearest places")
+
+
 @router.post("/get_place/")
 def get_warning_places(
     place: RequestListWarningPlace,
@@ -183,7 +322,7 @@ def get_warning_places(
 
     try:
         rows = db.execute(
-            """SELECT id, user_id, name, latitude, longitude, description, type, has_image, verification_count, created_at, updated_at
+            f"""SELECT {PLACE_COLUMNS}
                FROM warning_places
                WHERE latitude <= ? AND latitude >= ? AND longitude <= ? AND longitude >= ?""",
             (max_latitude, min_latitude, max_longitude, min_longitude),
@@ -202,7 +341,7 @@ def get_warning_place_by_id(
 ) -> dict:
     try:
         row = db.execute(
-            """SELECT id, user_id, name, latitude, longitude, description, type, has_image, verification_count, created_at, updated_at
+            f"""SELECT {PLACE_COLUMNS}
                FROM warning_places WHERE id = ?""",
             (place_id,),
         ).fetchone()
@@ -217,7 +356,56 @@ def get_warning_place_by_id(
         raise HTTPException(status_code=500, detail="Failed to get warning place")
 
 
-WARNING_PLACE_IMG_PATH = Path(os.getenv("WARNING_PLACE_IMG_PATH", "./warning_place_img"))
+@router.get("/changes")
+def get_place_changes(
+    cursor: int = Query(0, ge=0, description="마지막으로 받은 변경 커서"),
+    limit: int = Query(500, ge=1, le=MAX_CHANGES_PAGE_SIZE),
+    db: sqlite3.Connection = Depends(get_db),
+) -> dict:
+    """
+    변경 피드 (증분 동기화)
+
+    - cursor 이후에 추가/수정/검증된 장소의 최신 상태를 반환
+    - 응답의 cursor를 다음 요청에 그대로 넘기면 됨
+    """
+    try:
+        rows = db.execute(
+            """SELECT c.id AS change_id, c.change_type, p.*
+               FROM place_changes c
+               JOIN warning_places p ON p.id = c.place_id
+               WHERE c.id > ?
+               ORDER BY c.id
+               LIMIT ?""",
+            (cursor, limit + 1),
+        ).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        # 같은 장소가 여러 번 바뀌었으면 마지막 변경만 남김
+        latest: dict[int, dict] = {}
+        for row in rows:
+            change = dict(row)
+            latest.pop(change["id"], None)
+            latest[change["id"]] = change
+
+        return {
+            "message": "Changes retrieved successfully",
+            "cursor": rows[-1]["change_id"] if rows else cursor,
+            "has_more": has_more,
+            "changes": list(latest.values()),
+        }
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to get place changes")
+
+
+IMAGE_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _store_place_image(source: BinaryIO) -> str:
+    image_hash, _ = hash_upload(source)
+    store_renditions(source, image_hash)
+    return image_hash
 
 
 @router.post("/update_place_img/{place_id}")
@@ -234,7 +422,7 @@ async def update_warning_place_img(
             raise HTTPException(status_code=415, detail="PNG만 업로드 가능합니다 (확장자).")
 
         row = db.execute(
-            "SELECT user_id FROM warning_places WHERE id = ?",
+            "SELECT user_id, latitude, longitude FROM warning_places WHERE id = ?",
             (place_id,),
         ).fetchone()
 
@@ -243,44 +431,88 @@ async def update_warning_place_img(
 
         user_id = row["user_id"]
 
-        data = await image.read()
-        img = Image.open(io.BytesIO(data))
-        img.verify()
-
-        WARNING_PLACE_IMG_PATH.mkdir(parents=True, exist_ok=True)
-
-        filename = f"{place_id}.png"
-        save_path = WARNING_PLACE_IMG_PATH / filename
-
-        with save_path.open("wb") as f:
-            f.write(data)
+        # 디코딩/검증/렌디션 생성은 이미지 워커 풀에서 처리
+        loop = asyncio.get_running_loop()
+        image_hash = await loop.run_in_executor(image_executor, _store_place_image, image.file)
 
         db.execute(
-            "UPDATE warning_places SET has_image = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (place_id,),
+            "UPDATE warning_places SET has_image = 1, image_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (image_hash, place_id),
         )
 
-        db.execute(
-            "UPDATE users SET photos_uploaded = photos_uploaded + 1 WHERE id = ?",
-            (user_id,),
+        new_badges = record_user_activity(
+            db, user_id, {"photos_uploaded": 1}, location=(row["latitude"], row["longitude"]),
         )
+        _record_change(db, place_id, "image")
 
-        return {"message": "Warning place image updated successfully"}
+        return {"message": "Warning place image updated successfully", "new_badges": new_badges}
     except HTTPException:
         raise
-    except UnidentifiedImageError:
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+    except (UnidentifiedImageError, Image.DecompressionBombError):
         raise HTTPException(status_code=400, detail="Invalid image format")
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to update warning place image")
 
 
+def _image_etag(image_hash: str, size: str, fmt: str) -> str:
+    # 렌디션은 원본 해시로부터 결정적으로 만들어지므로 해시+렌디션 이름으로 강한 ETag 구성
+    return f'"{image_hash}-{size}.{fmt}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
 @router.get("/get_place_img/{place_id}")
-def get_warning_place_img(place_id: int):
+def get_warning_place_img(
+    place_id: int,
+    request: Request,
+    size: RenditionSize | None = Query(None, description="thumb, medium, full (WebP). 없으면 PNG"),
+    v: str | None = Query(None, description="image_hash (버전 URL, 장기 캐시)"),
+    db: sqlite3.Connection = Depends(get_db),
+):
+    fmt = "webp" if size else "png"
+    size = size or "full"
+    if_none_match = request.headers.get("if-none-match")
+
     try:
-        path = WARNING_PLACE_IMG_PATH / f"{place_id}.png"
-        if not path.is_file():
+        # 버전 URL 재검증은 DB/디스크 확인 없이 바로 304
+        if v and _etag_matches(if_none_match, _image_etag(v, size, fmt)):
+            return Response(
+                status_code=304,
+                headers={"ETag": _image_etag(v, size, fmt), "Cache-Control": IMAGE_IMMUTABLE_CACHE_CONTROL},
+            )
+
+        row = db.execute(
+            "SELECT has_image, image_hash FROM warning_places WHERE id = ?",
+            (place_id,),
+        ).fetchone()
+        if row is None or not row["has_image"]:
             raise HTTPException(status_code=404, detail="Warning place image not found")
-        return FileResponse(path, media_type="image/png")
+
+        image_hash = row["image_hash"]
+        if image_hash is None:
+            # 렌디션이 없는 예전 업로드는 PNG로 대체
+            path = WARNING_PLACE_IMG_PATH / f"{place_id}.png"
+            if not path.is_file():
+                raise HTTPException(status_code=404, detail="Warning place image not found")
+            return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, no-cache"})
+
+        etag = _image_etag(image_hash, size, fmt)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMAGE_IMMUTABLE_CACHE_CONTROL if v == image_hash else "public, no-cache",
+        }
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        return image_store.response(rendition_key(image_hash, size, fmt), f"image/{fmt}", headers)
     except HTTPException:
         raise
     except Exception:
@@ -295,7 +527,7 @@ def verify_warning_place(
 ) -> dict:
     try:
         place = db.execute(
-            "SELECT id, user_id FROM warning_places WHERE id = ?",
+            "SELECT id, user_id, latitude, longitude FROM warning_places WHERE id = ?",
             (place_id,),
         ).fetchone()
 
@@ -323,16 +555,17 @@ def verify_warning_place(
                 "UPDATE warning_places SET verification_count = verification_count + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                 (place_id,),
             )
+            _record_change(db, place_id, "verify")
 
-        db.execute(
-            "UPDATE users SET verifications = verifications + 1 WHERE id = ?",
-            (req.user_id,),
+        new_badges = record_user_activity(
+            db, req.user_id, {"verifications": 1}, location=(place["latitude"], place["longitude"]),
         )
 
         return {
             "message": "Verification submitted successfully",
             "place_id": place_id,
             "is_valid": req.is_valid,
+            "new_badges": new_badges,
         }
     except HTTPException:
         raise